@@ -21,7 +21,13 @@ from django.urls import path, include
 
 from viewer.views import (
     # Home, search
-    HomeView, search_suggestions, search_view,
+    HomeView, search_suggestions, search_suggestions_api, search_view, search_external_view,
+
+    # JSON API
+    api_list, api_detail,
+
+    # Export, import
+    CatalogExportView, CatalogImportView,
 
     # Songs
     SongsListView, SongDetailView, SongCreateView, SongUpdateView, SongDeleteView,
@@ -68,7 +74,17 @@ urlpatterns = [
 
     # Search field
     path("c/", search_suggestions, name="search_suggestions"),
+    path("api/suggestions/", search_suggestions_api, name="search_suggestions_api"),
     path('search/', search_view, name='search'),
+    path('search/external/', search_external_view, name='search_external'),
+
+    # Read-only JSON API, after api/suggestions/ which its resource pattern would match
+    path('api/<str:resource>/', api_list, name='api_list'),
+    path('api/<str:resource>/<int:pk>/', api_detail, name='api_detail'),
+
+    # Catalog export and import
+    path('export/', CatalogExportView.as_view(), name='catalog_export'),
+    path('import/', CatalogImportView.as_view(), name='catalog_import'),
 
     # Songs
     path('songs/', SongsListView.as_view(), name='songs'),
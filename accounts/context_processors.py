@@ -1,6 +1,8 @@
 from django.contrib.auth.forms import AuthenticationForm
+from django.utils.functional import SimpleLazyObject
 
 def login_form(request):
+    # Built only when a template renders the login modal, not for every render of every page
     return {
-        'login_form': AuthenticationForm(request=request)
-    }
\ No newline at end of file
+        'login_form': SimpleLazyObject(lambda: AuthenticationForm(request=request))
+    }
@@ -1,5 +1,9 @@
+from unittest import mock
+
 from django.test import TestCase
+from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth.models import User
+from django.urls import reverse
 from .models import Profile
 
 
@@ -11,3 +15,29 @@ class ProfileModelTest(TestCase):
 
         self.assertEqual(str(profile), 'testuser')
         self.assertEqual(profile.user, user)
+
+
+class LoginFormContextProcessorTest(TestCase):
+
+    def count_forms(self, url, **kwargs):
+        with mock.patch('accounts.context_processors.AuthenticationForm', wraps=AuthenticationForm) as form:
+            response = self.client.get(url, **kwargs)
+        return response, form.call_count
+
+    def test_anonymous_page_renders_one_login_modal(self):
+        response, built = self.count_forms(reverse('home'))
+        self.assertEqual(response.content.decode().count('id="loginModal"'), 1)
+        self.assertContains(response, 'name="username"')
+        self.assertEqual(built, 1)
+
+    def test_signed_in_user_gets_no_login_form(self):
+        User.objects.create_user(username='testuser', password='12345')
+        self.client.login(username='testuser', password='12345')
+        response, built = self.count_forms(reverse('home'))
+        self.assertNotContains(response, 'id="loginModal"')
+        self.assertEqual(built, 0)
+
+    def test_search_suggestions_partial_builds_no_login_form(self):
+        response, built = self.count_forms(reverse('search_suggestions'), data={'q': 'ab'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(built, 0)
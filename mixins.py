@@ -1,8 +1,117 @@
-from django.core.paginator import Paginator
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth.models import Permission
+from django.core import signing
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 
+from viewer.credits import get_song_credits
 from viewer.models import SongPerformance, Song
+from viewer.routers import reading_replica
+from viewer.viewcache import LIST_PARAMS, cache_timeout, object_version, view_cache_key
+
+
+class KeysetPage:
+    """Page of a keyset (cursor) paginated queryset, exposing the parts of Django's Page API used by templates."""
+
+    is_cursor = True
+
+    def __init__(self, object_list, order_field, has_next, has_previous):
+        self.object_list = object_list
+        self.order_field = order_field
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    def next_cursor(self):
+        if self._has_next and self.object_list:
+            return encode_cursor(self.object_list[-1], self.order_field)
+        return None
+
+    def previous_cursor(self):
+        if self._has_previous and self.object_list:
+            return encode_cursor(self.object_list[0], self.order_field)
+        return None
+
+
+CURSOR_SALT = 'mixins.keyset-pagination'
+
+
+def encode_cursor(obj, order_field):
+    # Opaque, signed token holding the (order field value, pk) of a row
+    value = getattr(obj, order_field)
+    if not isinstance(value, (str, int, float, type(None))):
+        value = str(value)
+    return signing.dumps([value, obj.pk], salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(token):
+    # Return (order field value, pk) or None for missing or tampered tokens
+    if not token:
+        return None
+    try:
+        value, pk = signing.loads(token, salt=CURSOR_SALT)
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+    return value, pk
+
+
+def keyset_paginate(queryset, order_field, descending, paginate_by, after=None, before=None):
+    """Paginate queryset on (order_field, pk) without COUNT(*) and OFFSET.
+
+    `after`/`before` are tokens from KeysetPage.next_cursor()/previous_cursor(). The order field
+    should not be nullable, rows with NULL values cannot be compared against a cursor.
+    """
+    after = decode_cursor(after)
+    before = decode_cursor(before) if after is None else None
+    backwards = before is not None
+
+    # Walking backwards is the same walk in the opposite direction, reversed at the end
+    reverse_order = descending != backwards
+    prefix = '-' if reverse_order else ''
+    lookup = 'lt' if reverse_order else 'gt'
+    queryset = queryset.order_by(f'{prefix}{order_field}', f'{prefix}pk')
+
+    cursor = before if backwards else after
+    if cursor is not None:
+        value, pk = cursor
+        queryset = queryset.filter(
+            Q(**{f'{order_field}__{lookup}': value}) |
+            Q(**{order_field: value, f'pk__{lookup}': pk})
+        )
+
+    # One extra row tells whether there is another page in the walking direction
+    rows = list(queryset[:paginate_by + 1])
+    has_more = len(rows) > paginate_by
+    rows = rows[:paginate_by]
+
+    if backwards:
+        rows.reverse()
+        return KeysetPage(rows, order_field, has_next=True, has_previous=has_more)
+    return KeysetPage(rows, order_field, has_next=has_more, has_previous=cursor is not None)
 
 
 class AlphabetOrderPaginationMixin:
@@ -11,6 +120,8 @@ class AlphabetOrderPaginationMixin:
     default_order_field = "title"  # default field used for ordering
     paginate_options = [10, 20, 50, 100]  # options for items per page
     default_paginate_by = 10  # default items per page
+    cursor_pagination = False  # page on (default_order_field, pk) with after/before tokens instead of page numbers
+    cache_models = ()  # models the page reads, when set pages are cached until one of them changes
 
     def get_ordering(self):
         # Determine ordering direction from GET parameter 'order' (asc/desc)
@@ -20,9 +131,10 @@ class AlphabetOrderPaginationMixin:
     def get_paginate_by(self, queryset):
         # Get items per page from GET parameter or fallback to default
         try:
-            return int(self.request.GET.get("paginate_by", self.default_paginate_by))
+            paginate_by = int(self.request.GET.get("paginate_by", self.default_paginate_by))
         except (TypeError, ValueError):
             return self.default_paginate_by
+        return paginate_by if paginate_by > 0 else self.default_paginate_by
 
     def get_queryset(self):
         # Apply filtering by first letter and ordering to base queryset
@@ -34,6 +146,49 @@ class AlphabetOrderPaginationMixin:
         ordering = self.get_ordering()
         return queryset.order_by(ordering)
 
+    def paginate_queryset(self, queryset, page_size):
+        if not self.cache_models:
+            return self.paginate_uncached(queryset, page_size)
+
+        # The rows of a page are the same for every user, permission dependent parts are rendered per request
+        params = {param: self.request.GET.get(param) for param in LIST_PARAMS}
+        key = view_cache_key(type(self).__name__, self.cache_models, params)
+        cached = cache.get(key)
+        if cached is not None:
+            if self.cursor_pagination:
+                return None, cached, cached.object_list, cached.has_other_pages()
+            object_list, number, count = cached
+            paginator = self.get_paginator(queryset, page_size, orphans=self.get_paginate_orphans(),
+                                           allow_empty_first_page=self.get_allow_empty())
+            paginator.count = count  # cached_property, no COUNT(*) query
+            page = Page(object_list, number, paginator)
+            return paginator, page, page.object_list, page.has_other_pages()
+
+        paginator, page, object_list, is_paginated = self.paginate_uncached(queryset, page_size)
+        object_list = page.object_list = list(object_list)
+        if reading_replica():
+            # Rows from a lagging replica would be cached under the version of a newer write
+            return paginator, page, object_list, is_paginated
+        if self.cursor_pagination:
+            cache.set(key, page, cache_timeout())
+        else:
+            cache.set(key, (object_list, page.number, paginator.count), cache_timeout())
+        return paginator, page, object_list, is_paginated
+
+    def paginate_uncached(self, queryset, page_size):
+        if not self.cursor_pagination:
+            return super().paginate_queryset(queryset, page_size)
+        # Keyset pagination, no COUNT(*) and no OFFSET scan
+        page = keyset_paginate(
+            queryset,
+            self.default_order_field,
+            descending=self.get_ordering().startswith('-'),
+            paginate_by=page_size,
+            after=self.request.GET.get("after"),
+            before=self.request.GET.get("before"),
+        )
+        return None, page, page.object_list, page.has_other_pages()
+
     def get_context_data(self, **kwargs):
         # Add pagination options and alphabet list to context for templates
         context = super().get_context_data(**kwargs)
@@ -42,12 +197,53 @@ class AlphabetOrderPaginationMixin:
         return context
 
 
+class ConditionalDetailMixin:
+    """Answer If-None-Match with 304 Not Modified after one cache lookup, before the object is read.
+
+    The ETag combines the version of the object's detail page, the versions of `etag_models`
+    (other rows the page lists), the full path and who is asking.
+    """
+
+    etag_models = ()
+
+    def get_etag(self):
+        request = self.request
+        # Flash messages are shown once, a page with pending messages is always rendered
+        if len(getattr(request, '_messages', ())):
+            return None
+        models = self.etag_models
+        if request.user.is_authenticated:
+            # Edit buttons follow the user's permissions
+            models += (Permission,)
+            user = request.user.pk
+        else:
+            user = ''
+        version = object_version(self.model, self.kwargs[self.pk_url_kwarg], models)
+        # The page embeds a token for the CSRF cookie, a new cookie is a new page
+        csrf = request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+        return hashlib.md5(f'{request.get_full_path()}:{version}:{user}:{csrf}'.encode()).hexdigest()
+
+    def get(self, request, *args, **kwargs):
+        etag = self.get_etag()
+        if etag is None:
+            return super().get(request, *args, **kwargs)
+        etag = quote_etag(etag)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+            # A page from a lagging replica may be older than the versions in the ETag
+            if not reading_replica():
+                response.headers['ETag'] = etag
+        return response
+
+
 class AlphabetOrderPaginationRelatedMixin:
     """Similar mixin but for filtering, ordering and paginating a passed queryset, returning a paginated page object."""
 
     default_order_field = "title"
     paginate_options = [10, 20, 50, 100]
     default_paginate_by = 10
+    cursor_pagination = False
 
     def get_letter(self):
         # Get filtering letter from GET parameter
@@ -61,9 +257,10 @@ class AlphabetOrderPaginationRelatedMixin:
     def get_paginate_by(self):
         # Get items per page or fallback to default
         try:
-            return int(self.request.GET.get("paginate_by", self.default_paginate_by))
+            paginate_by = int(self.request.GET.get("paginate_by", self.default_paginate_by))
         except (TypeError, ValueError):
             return self.default_paginate_by
+        return paginate_by if paginate_by > 0 else self.default_paginate_by
 
     def filter_order_paginate_queryset(self, queryset):
         # Filter queryset by letter, order it, paginate and return page object
@@ -71,10 +268,20 @@ class AlphabetOrderPaginationRelatedMixin:
         if letter:
             queryset = queryset.filter(**{f"{self.default_order_field}__istartswith": letter})
 
+        paginate_by = self.get_paginate_by()
+        if self.cursor_pagination:
+            return keyset_paginate(
+                queryset,
+                self.default_order_field,
+                descending=self.get_ordering().startswith('-'),
+                paginate_by=paginate_by,
+                after=self.request.GET.get("after"),
+                before=self.request.GET.get("before"),
+            )
+
         ordering = self.get_ordering()
         queryset = queryset.order_by(ordering)
 
-        paginate_by = self.get_paginate_by()
         paginator = Paginator(queryset, paginate_by)
 
         page_number = self.request.GET.get("page")
@@ -89,28 +296,15 @@ class AlphabetOrderPaginationRelatedMixin:
 class ContributorsByCategoryMixin:
     """Mixin to categorize contributors of a song by their role category, returning dict of categories with contributor performances."""
 
-    performance_related_fields = ("contributor", "contributor_role")
-
     def get_contributors_by_category(self, song):
-        # Fetch all performances for the song with related contributor and role
-        performances = song.performances.select_related(*self.performance_related_fields)
-
-        contributors_by_category = {}
-
-        # Group performances by contributor role category name
-        for performance in performances:
-            category = performance.contributor_role.name
-            if category not in contributors_by_category:
-                contributors_by_category[category] = []
-
-            contributors_by_category[category].append(
-                (
-                    performance,
-                    performance.contributor,
-                    [performance.contributor_role],
-                )
-            )
-        return contributors_by_category
+        # Performances come from the cached per-song credits, grouped by contributor role name
+        return {
+            role_name: [
+                (performance, performance.contributor, [performance.contributor_role])
+                for performance in performances
+            ]
+            for role_name, performances in get_song_credits(song.pk).performances_by_role_name.items()
+        }
 
     def get_context_data(self, **kwargs):
         # Add categorized contributors dict to context for template rendering
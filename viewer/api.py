@@ -0,0 +1,209 @@
+import datetime
+import hashlib
+
+from django.db.models import Prefetch
+from django.db.models.fields.files import FieldFile
+
+from mixins import decode_cursor, keyset_paginate
+from viewer.models import (
+    Album, AlbumSong, Contributor, Country, Genre, Language, MusicGroup, MusicGroupMembership, Song,
+)
+from viewer.viewcache import get_versions
+
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+# Related objects embedded per row and relation, e.g. the songs of a contributor
+MAX_INCLUDED = 100
+
+
+class ApiError(Exception):
+    """Invalid query parameters or a missing resource, answered with `status` and the list of messages."""
+
+    def __init__(self, messages, status=400):
+        super().__init__('; '.join(messages))
+        self.messages = messages
+        self.status = status
+
+
+def _json_value(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, FieldFile):
+        return value.name or None
+    return value
+
+
+class Include:
+    """A related object or list of objects embedded on request, loaded by one prefetch for the whole page.
+
+    Lists hold at most MAX_INCLUDED objects per row, a prefetch given as a Prefetch slices its own queryset.
+    """
+
+    def __init__(self, resource, prefetch, many=True, get=None, models=()):
+        self.resource = resource  # name of the resource serializing the related objects
+        self.prefetch = prefetch
+        self.many = many
+        # A sliced queryset can only be prefetched into an attribute of its own
+        self.get = get or (lambda obj: getattr(obj, f'api_{prefetch}') if many else getattr(obj, prefetch))
+        self.models = models  # through tables read besides the related model, for the ETag
+
+    def lookup(self):
+        if not self.many or not isinstance(self.prefetch, str):
+            return self.prefetch
+        related = RESOURCES[self.resource]
+        queryset = related.model.objects.order_by(related.order_field, 'pk')[:MAX_INCLUDED]
+        return Prefetch(self.prefetch, queryset=queryset, to_attr=f'api_{self.prefetch}')
+
+
+class Resource:
+    """A read-only API resource: the model fields that can be selected and the relations that can be included."""
+
+    def __init__(self, model, fields, order_field, includes=None):
+        self.model = model
+        self.fields = fields
+        self.order_field = order_field
+        self.includes = includes or {}
+
+    def serialize(self, obj, fields, includes=()):
+        data = {'id': obj.pk}
+        for name in fields:
+            data[name] = _json_value(self.model._meta.get_field(name).value_from_object(obj))
+        for name in includes:
+            include = self.includes[name]
+            related = RESOURCES[include.resource]
+            value = include.get(obj)
+            if include.many:
+                data[name] = [related.serialize(item, related.fields) for item in value]
+            else:
+                data[name] = related.serialize(value, related.fields) if value is not None else None
+        return data
+
+
+RESOURCES = {
+    'songs': Resource(
+        Song, ['title', 'duration', 'released', 'language', 'summary', 'lyrics'], 'title', {
+            'artists': Include('contributors', 'artist', models=[Song.artist.through]),
+            'music_groups': Include('music_groups', 'music_group', models=[Song.music_group.through]),
+            'genres': Include('genres', 'genre', models=[Song.genre.through]),
+            'language': Include('languages', 'language', many=False),
+            'albums': Include('albums', 'albums', models=[AlbumSong]),
+        },
+    ),
+    'albums': Resource(
+        Album, ['title', 'released', 'cover_image', 'summary'], 'title', {
+            'artists': Include('contributors', 'artist', models=[Album.artist.through]),
+            'music_groups': Include('music_groups', 'music_group', models=[Album.music_group.through]),
+            # Tracks in album order, the songs come with the same query
+            'songs': Include(
+                'songs',
+                Prefetch('albumsong_set',
+                         queryset=AlbumSong.objects.select_related('song').order_by('order', 'pk')[:MAX_INCLUDED],
+                         to_attr='api_tracks'),
+                get=lambda album: [track.song for track in album.api_tracks],
+                models=[AlbumSong],
+            ),
+        },
+    ),
+    'contributors': Resource(
+        Contributor,
+        ['first_name', 'middle_name', 'last_name', 'stage_name', 'date_of_birth', 'date_of_death', 'country', 'bio'],
+        'last_name', {
+            'country': Include('countries', 'country', many=False),
+            'songs': Include('songs', 'songs', models=[Song.artist.through]),
+            'albums': Include('albums', 'albums', models=[Album.artist.through]),
+        },
+    ),
+    'music_groups': Resource(
+        MusicGroup, ['name', 'bio', 'founded', 'disbanded', 'country'], 'name', {
+            'country': Include('countries', 'country', many=False),
+            'members': Include(
+                'contributors',
+                Prefetch('members',
+                         queryset=MusicGroupMembership.objects.select_related('member').order_by('pk')[:MAX_INCLUDED],
+                         to_attr='api_members'),
+                get=lambda group: [membership.member for membership in group.api_members],
+                models=[MusicGroupMembership],
+            ),
+            'songs': Include('songs', 'songs', models=[Song.music_group.through]),
+            'albums': Include('albums', 'albums', models=[Album.music_group.through]),
+        },
+    ),
+    # Lookup tables have no includes, their song lists are unbounded
+    'genres': Resource(Genre, ['name'], 'name'),
+    'countries': Resource(Country, ['name'], 'name'),
+    'languages': Resource(Language, ['name'], 'name'),
+}
+
+
+class ApiQuery:
+    """Parsed fields, include, limit and cursor parameters of a request for one resource."""
+
+    def __init__(self, resource, params):
+        self.resource = resource
+        errors = []
+        self.fields = self.names(params.get('fields'), resource.fields, 'field', errors) or resource.fields
+        self.includes = self.names(params.get('include'), list(resource.includes), 'include', errors)
+        try:
+            self.limit = int(params.get('limit', DEFAULT_LIMIT))
+            if not 1 <= self.limit <= MAX_LIMIT:
+                raise ValueError
+        except ValueError:
+            errors.append(f"limit must be a number from 1 to {MAX_LIMIT}.")
+        self.after = params.get('after')
+        self.before = params.get('before')
+        for name in ('after', 'before'):
+            if params.get(name) and decode_cursor(params[name]) is None:
+                errors.append(f"{name} is not a cursor from a next or previous link.")
+        if errors:
+            raise ApiError(errors)
+
+    @staticmethod
+    def names(value, allowed, label, errors):
+        names = [name.strip() for name in (value or '').split(',') if name.strip()]
+        unknown = [name for name in names if name not in allowed]
+        if unknown:
+            errors.append(f"Unknown {label} {', '.join(unknown)}, choose from {', '.join(allowed) or 'none'}.")
+        return list(dict.fromkeys(names))
+
+    def queryset(self):
+        model = self.resource.model
+        # Only the selected columns, plus the foreign keys an include follows and the cursor field
+        columns = set(self.fields) | {self.resource.order_field}
+        for name in self.includes:
+            include = self.resource.includes[name]
+            if not include.many:
+                columns.add(include.prefetch)
+        queryset = model.objects.only(*columns)
+        prefetches = [self.resource.includes[name].lookup() for name in self.includes]
+        return queryset.prefetch_related(*prefetches) if prefetches else queryset
+
+    def models(self):
+        """Every model the response reads, their versions make the ETag."""
+        models = [self.resource.model]
+        for name in self.includes:
+            include = self.resource.includes[name]
+            models += [RESOURCES[include.resource].model, *include.models]
+        return models
+
+    def page(self):
+        return keyset_paginate(
+            self.queryset(), self.resource.order_field, descending=False, paginate_by=self.limit,
+            after=self.after, before=self.before,
+        )
+
+    def serialize(self, obj):
+        return self.resource.serialize(obj, self.fields, self.includes)
+
+
+def get_resource(name):
+    resource = RESOURCES.get(name)
+    if resource is None:
+        raise ApiError([f"Unknown resource {name}, choose from {', '.join(RESOURCES)}."], status=404)
+    return resource
+
+
+def api_etag(query, path, query_string):
+    """Weak validator from the request and the versions of the models it reads, no row is read to compute it."""
+    versions = '.'.join(str(version) for version in get_versions(query.models()))
+    return hashlib.md5(f'{path}?{query_string}:{versions}'.encode()).hexdigest()
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ViewerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'viewer'
+
+    def ready(self):
+        # Register model signal handlers
+        from viewer import signals  # noqa: F401
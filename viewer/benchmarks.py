@@ -0,0 +1,359 @@
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+import tracemalloc
+import urllib.error
+import urllib.request
+from contextlib import ExitStack, contextmanager
+from queue import Empty
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import OperationalError, connections, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from MusicLibrary.databases import SQLITE_PROFILES, sqlite_options
+
+from viewer.middleware import QueryRecorder
+from viewer.models import Album, Contributor, Country, Genre, Language, MusicGroup, Song
+from viewer.synthetic import WORDS
+
+
+LIST_VIEWS = ['home', 'songs', 'albums', 'contributors', 'music_groups', 'genres', 'countries', 'languages',
+              'contributor_roles', 'music_group_roles']
+DETAIL_VIEWS = {'song': Song, 'album': Album, 'contributor': Contributor, 'music_group': MusicGroup,
+                'genre': Genre, 'country': Country, 'language': Language}
+SEARCH_VIEWS = ['search', 'search_suggestions', 'search_suggestions_api']
+GROUPS = ('list', 'detail', 'search')
+# Seconds a mixed workload worker may take to set up and report besides its run
+WORKER_GRACE_SECONDS = 60
+
+
+def percentile(values, share):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(share * len(ordered)) - 1))]
+
+
+class Target:
+    """One benchmarked view, each request gets a fresh URL, detail pages and searches vary per request."""
+
+    def __init__(self, name, group, make_url):
+        self.name = name
+        self.group = group
+        self.make_url = make_url
+
+
+def build_targets(groups=GROUPS, sample=500, seed=0):
+    rng = random.Random(seed)
+    targets = []
+    if 'list' in groups:
+        targets += [Target(name, 'list', lambda name=name: reverse(name)) for name in LIST_VIEWS]
+    if 'detail' in groups:
+        for name, model in DETAIL_VIEWS.items():
+            pks = list(model.objects.order_by('?').values_list('pk', flat=True)[:sample])
+            if pks:
+                targets.append(Target(name, 'detail', lambda name=name, pks=pks: reverse(name, args=[rng.choice(pks)])))
+    if 'search' in groups:
+        for name in SEARCH_VIEWS:
+            targets.append(Target(name, 'search', lambda name=name: f"{reverse(name)}?q={rng.choice(WORDS)[:4]}"))
+    return targets
+
+
+class ClientRunner:
+    """Requests through the Django test client, in process, so queries and memory can be measured."""
+
+    measures_memory = True
+
+    def __init__(self, username=None):
+        host = next((host for host in settings.ALLOWED_HOSTS if host != '*' and not host.startswith('.')),
+                    'localhost')
+        # Failing views are counted as errors instead of stopping the run
+        self.client = Client(raise_request_exception=False, HTTP_HOST=host)
+        if username:
+            self.client.force_login(get_user_model().objects.get_by_natural_key(username))
+
+    def request(self, url):
+        recorder = QueryRecorder()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        return response.status_code, recorder.count
+
+
+class ServerRunner:
+    """Requests to a running server over HTTP, queries are read from its X-Query-Count header."""
+
+    measures_memory = False
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, url):
+        try:
+            with urllib.request.urlopen(self.base_url + url) as response:
+                response.read()
+                status, queries = response.status, response.headers.get('X-Query-Count')
+        except urllib.error.HTTPError as error:
+            status, queries = error.code, error.headers.get('X-Query-Count')
+        return status, int(queries) if queries is not None else None
+
+
+def measure(runner, target, iterations, warmup):
+    for _ in range(warmup):
+        runner.request(target.make_url())
+
+    latencies, queries, errors = [], [], 0
+    for _ in range(iterations):
+        url = target.make_url()
+        started = time.perf_counter()
+        status, count = runner.request(url)
+        latencies.append((time.perf_counter() - started) * 1000)
+        if count is not None:
+            queries.append(count)
+        if status >= 400:
+            errors += 1
+
+    result = {
+        'group': target.group,
+        'requests': iterations,
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 0.5), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'mean_ms': round(statistics.fmean(latencies), 2),
+        'max_ms': round(max(latencies), 2),
+        'queries_mean': round(statistics.fmean(queries), 1) if queries else None,
+        'queries_max': max(queries) if queries else None,
+        'peak_memory_kib': None,
+    }
+    if runner.measures_memory:
+        # Measured on one extra request, tracing allocations slows down the timed ones
+        tracemalloc.start()
+        try:
+            runner.request(target.make_url())
+            result['peak_memory_kib'] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def run_benchmark(runner, targets, iterations=50, warmup=3, progress=None):
+    """Benchmark every target, returns a JSON serializable report."""
+    results = {}
+    for target in targets:
+        results[target.name] = measure(runner, target, iterations, warmup)
+        if progress:
+            progress(target.name, results[target.name])
+    return {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connections['default'].vendor,
+            'cache': settings.CACHES['default']['BACKEND'].rsplit('.', 1)[-1],
+            'songs': Song.objects.count(),
+            'albums': Album.objects.count(),
+            'contributors': Contributor.objects.count(),
+            'iterations': iterations,
+        },
+        'results': results,
+    }
+
+
+def compare(report, baseline, metrics=('p50_ms', 'p95_ms', 'queries_mean')):
+    """Relative change of each metric against a baseline report, per view present in both."""
+    changes = {}
+    for name, result in report['results'].items():
+        before = baseline.get('results', {}).get(name)
+        if not before:
+            continue
+        changes[name] = {
+            metric: round((result[metric] - before[metric]) / before[metric] * 100, 1)
+            for metric in metrics
+            if result.get(metric) is not None and before.get(metric)
+        }
+    return changes
+
+
+def load_report(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save_report(report, path):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2)
+        file.write('\n')
+
+
+def _mixed_worker(queue, profile, duration, write_share, seed, song_ids):
+    """One forked worker: reads pages and updates songs for `duration` seconds, puts its timings on the queue.
+
+    The result is put even when the worker fails, with the error as its last item.
+    """
+    connection = connections['default']
+    options = {key: value for key, value in connection.settings_dict['OPTIONS'].items()
+               if key not in ('init_command', 'transaction_mode')}
+    connection.settings_dict['OPTIONS'] = {**options, **sqlite_options(profile)}
+    rng = random.Random(seed)
+    reads, writes, errors = [], [], 0
+    failure = None
+    try:
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}):
+            runner = ClientRunner()
+            targets = build_targets(('list', 'detail'), seed=seed)
+            deadline = time.perf_counter() + duration
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                if rng.random() < write_share:
+                    try:
+                        with transaction.atomic():
+                            song = Song.objects.get(pk=rng.choice(song_ids))
+                            song.duration = rng.randint(60, 600)
+                            song.save(update_fields=['duration'])
+                    except OperationalError:
+                        # "database is locked" once busy_timeout is over
+                        errors += 1
+                        continue
+                    writes.append((time.perf_counter() - started) * 1000)
+                else:
+                    status, _ = runner.request(rng.choice(targets).make_url())
+                    if status >= 400:
+                        errors += 1
+                        continue
+                    reads.append((time.perf_counter() - started) * 1000)
+    except BaseException as error:
+        failure = f'{type(error).__name__}: {error}'
+        raise
+    finally:
+        connection.close()
+        queue.put((reads, writes, errors, failure))
+
+
+def _collect_results(queue, processes, timeout):
+    """Results put by the workers, without waiting on workers that exited without one, e.g. killed."""
+    results = []
+    deadline = time.monotonic() + timeout
+    while len(results) < len(processes) and time.monotonic() < deadline:
+        try:
+            results.append(queue.get(timeout=1))
+        except Empty:
+            if all(process.exitcode is not None for process in processes) and queue.empty():
+                break
+    return results
+
+
+def _journal_mode(mode=None):
+    with connections['default'].cursor() as cursor:
+        cursor.execute(f'PRAGMA journal_mode={mode}' if mode else 'PRAGMA journal_mode')
+        return cursor.fetchone()[0]
+
+
+def run_mixed_workload(profile, workers, duration=10, write_share=0.2, seed=0):
+    """Throughput of `workers` processes mixing page reads and song updates on the SQLite file of 'default'.
+
+    Every worker opens its own connection with the PRAGMAs of `profile`. The journal mode is stored in
+    the database file, so it is switched here before the workers start, a connection cannot leave WAL
+    while others use it. Needs the fork start method, the workers inherit the configured Django.
+    The workers write to the database, run it inside database_copy(). Raises RuntimeError when a
+    worker fails or does not report.
+    """
+    song_ids = list(Song.objects.values_list('pk', flat=True))
+    if not song_ids:
+        raise ValueError("The database has no songs, run generate_catalog first.")
+    _journal_mode(SQLITE_PROFILES[profile]['journal_mode'])
+    # Forked workers must not share the parent's connection
+    connections.close_all()
+
+    context = multiprocessing.get_context('fork')
+    queue = context.Queue()
+    processes = [
+        context.Process(target=_mixed_worker, args=(queue, profile, duration, write_share, seed + number, song_ids))
+        for number in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    results = _collect_results(queue, processes, duration + WORKER_GRACE_SECONDS)
+    for process in processes:
+        process.join(timeout=WORKER_GRACE_SECONDS)
+        if process.is_alive():
+            process.terminate()
+            process.join()
+
+    failures = [result[3] for result in results if result[3]]
+    if failures or len(results) < workers:
+        failed = len(failures) + workers - len(results)
+        exit_codes = ', '.join(str(process.exitcode) for process in processes)
+        reasons = '; '.join(failures) or "no result"
+        raise RuntimeError(f"{failed} of {workers} workers failed ({reasons}), exit codes {exit_codes}.")
+
+    reads = [latency for result in results for latency in result[0]]
+    writes = [latency for result in results for latency in result[1]]
+    return {
+        'profile': profile,
+        'workers': workers,
+        # Each worker runs for `duration` once set up
+        'reads_per_s': round(len(reads) / duration, 1),
+        'writes_per_s': round(len(writes) / duration, 1),
+        'read_p95_ms': round(percentile(reads, 0.95), 2) if reads else None,
+        'write_p95_ms': round(percentile(writes, 0.95), 2) if writes else None,
+        'errors': sum(result[2] for result in results),
+    }
+
+
+@contextmanager
+def database_copy(alias='default'):
+    """Point `alias` at a temporary copy of its SQLite file inside the block, the file itself is left untouched."""
+    connection = connections[alias]
+    original = connection.settings_dict['NAME']
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'benchmark.sqlite3')
+        connection.ensure_connection()
+        target = sqlite3.connect(path)
+        try:
+            connection.connection.backup(target)
+        finally:
+            target.close()
+        connection.close()
+        connection.settings_dict['NAME'] = path
+        try:
+            yield path
+        finally:
+            connection.close()
+            connection.settings_dict['NAME'] = original
+
+
+def run_sqlite_benchmark(profiles, worker_counts, duration=10, write_share=0.2, seed=0, progress=None):
+    """run_mixed_workload for every profile and worker count, on a copy of the database file."""
+    results = []
+    with database_copy():
+        for profile in profiles:
+            for workers in worker_counts:
+                results.append(run_mixed_workload(profile, workers, duration, write_share, seed))
+                if progress:
+                    progress(results[-1])
+        songs = Song.objects.count()
+    return {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'sqlite': connections['default'].Database.sqlite_version,
+            'songs': songs,
+            'duration_s': duration,
+            'write_share': write_share,
+        },
+        'results': results,
+    }
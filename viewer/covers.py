@@ -0,0 +1,151 @@
+import posixpath
+import random
+import threading
+import time
+
+from django.conf import settings
+
+from viewer.models import Album
+from viewer.thumbnails import FORMATS, SIZES, thumbnail_name
+
+
+class CoverIndex:
+    """In-process index of albums whose cover image file exists on disk.
+
+    The home page samples from it instead of running ORDER BY RANDOM() and stat-ing every cover,
+    and cover URLs pick the derivatives it found, so pages never probe the storage. Entries are
+    updated by Album signals and the whole index is rescanned periodically, so covers copied into
+    MEDIA_ROOT outside Django show up without a restart.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._verified = _IdList()
+        self._missing = _IdList()  # cover_image is set but the file is not on disk
+        self._thumbnails = {}  # album pk -> (size, format) pairs of the derivatives on disk
+        self._scanned_at = None
+
+    def rescan_interval(self):
+        return getattr(settings, 'COVER_INDEX_RESCAN_SECONDS', 300)
+
+    def invalidate(self):
+        # Force a full rescan on the next access
+        with self._lock:
+            self._scanned_at = None
+
+    def rescan(self):
+        verified, missing, thumbnails = _IdList(), _IdList(), {}
+        albums = Album.objects.exclude(cover_image='').exclude(cover_image__isnull=True).only('pk', 'cover_image')
+        # One directory listing per cover directory instead of a stat per file
+        listings = {}
+        for album in albums.iterator():
+            storage, name = album.cover_image.storage, album.cover_image.name
+            directory = posixpath.dirname(name)
+            if directory not in listings:
+                listings[directory] = _list_files(storage, directory)
+            files = listings[directory]
+            exists = storage.exists if files is None else (lambda name: posixpath.basename(name) in files)
+            if exists(name):
+                verified.add(album.pk)
+                thumbnails[album.pk] = _thumbnails(name, exists)
+            else:
+                missing.add(album.pk)
+        with self._lock:
+            self._verified, self._missing, self._thumbnails = verified, missing, thumbnails
+            self._scanned_at = time.monotonic()
+
+    def _ensure_fresh(self):
+        scanned_at = self._scanned_at
+        if scanned_at is None or time.monotonic() - scanned_at > self.rescan_interval():
+            self.rescan()
+
+    def update(self, album):
+        # Called on Album save and after its derivatives are written, only the saved album is checked on disk
+        cover = album.cover_image
+        exists = cover and cover.storage.exists(cover.name)
+        thumbnails = _thumbnails(cover.name, cover.storage.exists) if exists else frozenset()
+        with self._lock:
+            self._verified.discard(album.pk)
+            self._missing.discard(album.pk)
+            self._thumbnails.pop(album.pk, None)
+            if exists:
+                self._verified.add(album.pk)
+                self._thumbnails[album.pk] = thumbnails
+            elif cover:
+                self._missing.add(album.pk)
+
+    def remove(self, album_pk):
+        with self._lock:
+            self._verified.discard(album_pk)
+            self._missing.discard(album_pk)
+            self._thumbnails.pop(album_pk, None)
+
+    def thumbnails(self, album_pk):
+        """(size, format) pairs of the derivatives of the album's cover found on disk."""
+        self._ensure_fresh()
+        return self._thumbnails.get(album_pk, frozenset())
+
+    def sample(self, count):
+        """Return (verified_ids, missing_ids) with at most `count` ids in total, verified covers first."""
+        self._ensure_fresh()
+        with self._lock:
+            verified = self._verified.sample(count)
+            missing = self._missing.sample(count - len(verified))
+        return verified, missing
+
+    def __contains__(self, album_pk):
+        self._ensure_fresh()
+        return album_pk in self._verified
+
+
+class _IdList:
+    """List of unique ids with O(1) add, discard and random sampling."""
+
+    def __init__(self):
+        self._items = []
+        self._positions = {}
+
+    def add(self, item):
+        if item not in self._positions:
+            self._positions[item] = len(self._items)
+            self._items.append(item)
+
+    def discard(self, item):
+        position = self._positions.pop(item, None)
+        if position is None:
+            return
+        last = self._items.pop()
+        if position < len(self._items):
+            # Move the last item into the freed slot
+            self._items[position] = last
+            self._positions[last] = position
+
+    def sample(self, count):
+        if count <= 0:
+            return []
+        return random.sample(self._items, min(count, len(self._items)))
+
+    def __contains__(self, item):
+        return item in self._positions
+
+    def __len__(self):
+        return len(self._items)
+
+
+def _list_files(storage, directory):
+    """Names of the files in a storage directory, None when the storage cannot list it."""
+    try:
+        return set(storage.listdir(directory)[1])
+    except FileNotFoundError:
+        return set()
+    except NotImplementedError:
+        return None
+
+
+def _thumbnails(name, exists):
+    return frozenset(
+        (size, fmt) for size in SIZES for fmt in FORMATS if exists(thumbnail_name(name, size, fmt))
+    )
+
+
+cover_index = CoverIndex()
@@ -0,0 +1,79 @@
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+
+from viewer.models import SongPerformance
+
+
+CACHE_TIMEOUT = 60 * 60
+# Bumped when a contributor, music group or role changes, those are stored inside the cached credits
+VERSION_KEY = 'song-credits:version'
+
+
+class SongCredits:
+    """All performances of one song, grouped once for every page that shows song credits."""
+
+    def __init__(self, performances):
+        self.performances_by_category = OrderedDict()  # category -> contributor performances
+        self.music_group_performances = []
+        self.contributors_by_category = {}  # category -> [(contributor, [role names])]
+        self.groups_by_role = {}  # role name -> [music groups], each group listed once
+        self.performances_by_role_name = {}  # role name -> contributor performances
+
+        contributor_roles = {}  # (category, contributor id) -> role names, shared with contributors_by_category
+        seen_groups = set()
+        for performance in performances:
+            if performance.contributor_id:
+                role = performance.contributor_role
+                category = role.category if role else 'other'
+                self.performances_by_category.setdefault(category, []).append(performance)
+                if role:
+                    self.performances_by_role_name.setdefault(role.name, []).append(performance)
+                    key = (role.category, performance.contributor_id)
+                    roles = contributor_roles.get(key)
+                    if roles is None:
+                        roles = contributor_roles[key] = []
+                        self.contributors_by_category.setdefault(role.category, []).append(
+                            (performance.contributor, roles)
+                        )
+                    if role.name not in roles:
+                        roles.append(role.name)
+            elif performance.music_group_id:
+                self.music_group_performances.append(performance)
+                role = performance.music_group_role
+                if role:
+                    groups = self.groups_by_role.setdefault(role.name, [])
+                    if performance.music_group_id not in seen_groups:
+                        groups.append(performance.music_group)
+                        seen_groups.add(performance.music_group_id)
+
+
+def _cache_key(song_id):
+    # A lost version key restarts from the current time, never from a version already used
+    return f'song-credits:{cache.get_or_set(VERSION_KEY, time.time_ns, timeout=None)}:{song_id}'
+
+
+def get_song_credits(song_id):
+    """Return cached SongCredits of the song, loading all its performances in one query on a miss."""
+    key = _cache_key(song_id)
+    credits = cache.get(key)
+    if credits is None:
+        performances = SongPerformance.objects.filter(song_id=song_id).select_related(
+            'contributor', 'contributor_role', 'music_group', 'music_group_role'
+        )
+        credits = SongCredits(performances)
+        cache.set(key, credits, CACHE_TIMEOUT)
+    return credits
+
+
+def invalidate_song_credits(song_id):
+    cache.delete(_cache_key(song_id))
+
+
+def invalidate_all_song_credits():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # The version key was evicted or never set
+        cache.set(VERSION_KEY, time.time_ns(), timeout=None)
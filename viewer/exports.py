@@ -0,0 +1,180 @@
+import csv
+import io
+import json
+
+from django.db.models import Prefetch
+
+from viewer.models import (
+    AlbumSong, Album, Contributor, ContributorPreviousName, ContributorRole, Country, Genre, Language, MusicGroup,
+    MusicGroupMembership, MusicGroupRole, Song, SongPerformance,
+)
+
+
+def _ids(related):
+    # Prefetched relations, no query per row
+    return [obj.pk for obj in related.all()]
+
+
+def _date(value):
+    return value.isoformat() if value else None
+
+
+def _lookup(model, *fields):
+    """Export of a lookup table referenced by id from the other kinds."""
+    return (
+        model,
+        lambda: model.objects.order_by('pk'),
+        lambda obj: {'id': obj.pk, **{field: getattr(obj, field) for field in fields}},
+        ['id', *fields],
+    )
+
+
+# Export kind: model, queryset, row function, CSV columns. Every queryset is read with
+# .iterator(chunk_size), prefetches run once per chunk. Kinds are listed before the kinds
+# referencing them, a JSONL export of every kind loads in file order.
+EXPORTS = {
+    'genres': _lookup(Genre, 'name'),
+    'countries': _lookup(Country, 'name'),
+    'languages': _lookup(Language, 'name'),
+    'contributor_roles': _lookup(ContributorRole, 'name', 'category'),
+    'music_group_roles': _lookup(MusicGroupRole, 'name'),
+    'songs': (
+        Song,
+        lambda: Song.objects.order_by('pk').prefetch_related('artist', 'music_group', 'genre'),
+        lambda song: {
+            'id': song.pk,
+            'title': song.title,
+            'duration': song.duration,
+            'released': _date(song.released),
+            'language_id': song.language_id,
+            'genre_ids': _ids(song.genre),
+            'artist_ids': _ids(song.artist),
+            'music_group_ids': _ids(song.music_group),
+            'summary': song.summary,
+            'lyrics': song.lyrics,
+        },
+        ['id', 'title', 'duration', 'released', 'language_id', 'genre_ids', 'artist_ids', 'music_group_ids',
+         'summary', 'lyrics'],
+    ),
+    'albums': (
+        Album,
+        lambda: Album.objects.order_by('pk').prefetch_related(
+            'artist', 'music_group',
+            Prefetch('albumsong_set', queryset=AlbumSong.objects.order_by('order', 'pk'), to_attr='tracks'),
+        ),
+        lambda album: {
+            'id': album.pk,
+            'title': album.title,
+            'released': _date(album.released),
+            'cover_image': album.cover_image.name or None,
+            'artist_ids': _ids(album.artist),
+            'music_group_ids': _ids(album.music_group),
+            'tracklist': [track.song_id for track in album.tracks],
+            'summary': album.summary,
+        },
+        ['id', 'title', 'released', 'cover_image', 'artist_ids', 'music_group_ids', 'tracklist', 'summary'],
+    ),
+    'contributors': (
+        Contributor,
+        lambda: Contributor.objects.order_by('pk'),
+        lambda contributor: {
+            'id': contributor.pk,
+            'first_name': contributor.first_name,
+            'middle_name': contributor.middle_name,
+            'last_name': contributor.last_name,
+            'stage_name': contributor.stage_name,
+            'date_of_birth': _date(contributor.date_of_birth),
+            'date_of_death': _date(contributor.date_of_death),
+            'country_id': contributor.country_id,
+            'bio': contributor.bio,
+        },
+        ['id', 'first_name', 'middle_name', 'last_name', 'stage_name', 'date_of_birth', 'date_of_death',
+         'country_id', 'bio'],
+    ),
+    'previous_names': (
+        ContributorPreviousName,
+        lambda: ContributorPreviousName.objects.order_by('pk'),
+        lambda name: {
+            'id': name.pk,
+            'contributor_id': name.contributor_id,
+            'first_name': name.first_name,
+            'middle_name': name.middle_name,
+            'last_name': name.last_name,
+        },
+        ['id', 'contributor_id', 'first_name', 'middle_name', 'last_name'],
+    ),
+    'music_groups': (
+        MusicGroup,
+        lambda: MusicGroup.objects.order_by('pk'),
+        lambda group: {
+            'id': group.pk,
+            'name': group.name,
+            'founded': _date(group.founded),
+            'disbanded': _date(group.disbanded),
+            'country_id': group.country_id,
+            'bio': group.bio,
+        },
+        ['id', 'name', 'founded', 'disbanded', 'country_id', 'bio'],
+    ),
+    'memberships': (
+        MusicGroupMembership,
+        lambda: MusicGroupMembership.objects.order_by('pk').prefetch_related('member_role'),
+        lambda membership: {
+            'id': membership.pk,
+            'member_id': membership.member_id,
+            'music_group_id': membership.music_group_id,
+            'member_role_ids': _ids(membership.member_role),
+            'from_date': _date(membership.from_date),
+            'to_date': _date(membership.to_date),
+        },
+        ['id', 'member_id', 'music_group_id', 'member_role_ids', 'from_date', 'to_date'],
+    ),
+    'performances': (
+        SongPerformance,
+        lambda: SongPerformance.objects.order_by('pk'),
+        lambda performance: {
+            'id': performance.pk,
+            'song_id': performance.song_id,
+            'contributor_id': performance.contributor_id,
+            'contributor_role_id': performance.contributor_role_id,
+            'music_group_id': performance.music_group_id,
+            'music_group_role_id': performance.music_group_role_id,
+        },
+        ['id', 'song_id', 'contributor_id', 'contributor_role_id', 'music_group_id', 'music_group_role_id'],
+    ),
+}
+FORMATS = ('jsonl', 'csv')
+
+
+def iter_rows(kind, chunk_size=2000):
+    _, queryset, row, _ = EXPORTS[kind]
+    for obj in queryset().iterator(chunk_size=chunk_size):
+        yield row(obj)
+
+
+def iter_jsonl(kinds, chunk_size=2000):
+    """Yield one JSON line per object, every line carries its export kind under "type"."""
+    for kind in kinds:
+        for row in iter_rows(kind, chunk_size):
+            yield json.dumps({'type': kind, **row}, ensure_ascii=False) + '\n'
+
+
+def iter_csv(kind, chunk_size=2000):
+    """Yield CSV lines of one export kind, lists of ids are joined with ';'."""
+    columns = EXPORTS[kind][3]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def line(values):
+        writer.writerow(values)
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return value
+
+    yield line(columns)
+    for row in iter_rows(kind, chunk_size):
+        yield line([
+            ';'.join(map(str, row[column])) if isinstance(row[column], list) else row[column]
+            for column in columns
+        ])
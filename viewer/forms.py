@@ -12,6 +12,73 @@ from viewer.models import Genre, Country, Contributor, MusicGroup, Album, Song,
     ContributorRole, SongPerformance
 
 
+# Normalization and validation rules shared by the model forms and the bulk catalog import (viewer.imports)
+def normalize_title(title):
+    if title.isupper():
+        return title.capitalize()  # Capitalize if all uppercase
+    # Capitalize each word properly
+    return re.sub(' +', ' ', title).strip().title()
+
+
+def normalize_name_word(value, label):
+    if not value:
+        return value
+    value = value.strip().title()
+    # Validate field is single word with letters/digits only (no spaces)
+    if not re.fullmatch(r'^[\w\d]+$', value):
+        raise ValidationError(f"{label} must be a single word and can include letters and digits only.")
+    return value
+
+
+def normalize_song_title(title):
+    title = (title or '').strip()
+    if not title:
+        raise ValidationError("Song title is required.")
+    if len(title) < 2:
+        raise ValidationError("Title must be at least 2 characters long.")
+    if len(title) > 100:
+        raise ValidationError("Title is too long (max 100 characters).")
+    return normalize_title(title)
+
+
+def validate_song_duration(duration):
+    if duration is not None:
+        if duration <= 0:
+            raise ValidationError("Duration must be a positive number.")
+        if duration > 60 * 60 * 10:  # Max 10 hours in seconds
+            raise ValidationError("Song duration is too long.")
+    return duration
+
+
+def validate_song_released(released):
+    if released:
+        if released > now().date():
+            raise ValidationError("Release date cannot be in the future.")
+        if released.year < 1800:
+            raise ValidationError("Release date is too old.")
+    return released
+
+
+def normalize_album_title(title):
+    if not title:
+        raise ValidationError("Album title is required.")
+    title = title.strip()
+    if len(title) < 2:
+        raise ValidationError("Album title must be at least 2 characters long.")
+    return normalize_title(title)
+
+
+def validate_album_released(released):
+    if released:
+        # Validate release date not in future
+        if released > date.today():
+            raise ValidationError("Release date cannot be in the future.")
+        # Reject dates before first recorded albums
+        if released.year < 1880:
+            raise ValidationError("Albums before 1880 are not supported.")
+    return released
+
+
 class GenreModelForm(ModelForm):
     # Form for creating/editing Genre
     class Meta:
@@ -81,13 +148,7 @@ class ContributorModelForm(ModelForm):
         }
 
     def clean_name_field(self, field_value, field_label):
-        if not field_value:
-            return field_value
-        field_value = field_value.strip().title()
-        # Validate field is single word with letters/digits only (no spaces)
-        if not re.fullmatch(r'^[\w\d]+$', field_value):
-            raise ValidationError(f"{field_label} must be a single word and can include letters and digits only.")
-        return field_value
+        return normalize_name_word(field_value, field_label)
 
     def clean_first_name(self):
         return self.clean_name_field(self.cleaned_data.get('first_name'), "First name")
@@ -228,10 +289,19 @@ class AlbumModelForm(ModelForm):
         widget=DateInput(attrs={'type': 'date', 'class': 'form-control'}),
         label="Release date"
     )
+    # Declared outside the model fields, the tracklist is written by sync_album_tracklist, not save_m2m()
+    songs = ModelMultipleChoiceField(
+        queryset=Song.objects.all(),
+        required=False,
+        widget=SelectMultiple(attrs={'class': 'form-control'}),
+        label="Songs"
+    )
+    field_order = ['title', 'artist', 'music_group', 'songs']
 
     class Meta:
         model = Album
         fields = '__all__'
+        exclude = ['songs']
 
         labels = {
             'title': 'Album title',
@@ -258,31 +328,21 @@ class AlbumModelForm(ModelForm):
         for visible in self.visible_fields():
             if not isinstance(visible.field.widget, FileInput):
                 visible.field.widget.attrs['class'] = 'form-control'
+        if self.instance.pk and 'songs' not in self.initial:
+            self.initial['songs'] = list(self.instance.songs.values_list('pk', flat=True))
+
+    def clean_songs(self):
+        # Checked before the album is saved
+        songs = self.cleaned_data.get('songs')
+        if not songs:
+            raise ValidationError("At least one song must be selected.")
+        return songs
 
     def clean_title(self):
-        title = self.cleaned_data.get('title', '')
-        if not title:
-            raise ValidationError("Album title is required.")
-        title = title.strip()
-        if len(title) < 2:
-            raise ValidationError("Album title must be at least 2 characters long.")
-        if title.isupper():
-            title = title.capitalize()
-        else:
-            # Capitalize each word properly
-            title = re.sub(' +', ' ', title).strip().title()
-        return title
+        return normalize_album_title(self.cleaned_data.get('title', ''))
 
     def clean_released(self):
-        released = self.cleaned_data.get('released')
-        if released:
-            # Validate release date not in future
-            if released > date.today():
-                raise ValidationError("Release date cannot be in the future.")
-            # Reject dates before first recorded albums
-            if released.year < 1880:
-                raise ValidationError("Albums before 1880 are not supported.")
-        return released
+        return validate_album_released(self.cleaned_data.get('released'))
 
     def clean_summary(self):
         summary = self.cleaned_data.get('summary', '')
@@ -311,7 +371,6 @@ class AlbumModelForm(ModelForm):
         title = cleaned_data.get('title')
         artists = cleaned_data.get('artist')
         groups = cleaned_data.get('music_group')
-        songs = cleaned_data.get('songs')
         released = cleaned_data.get('released')
 
         errors = []
@@ -320,10 +379,6 @@ class AlbumModelForm(ModelForm):
         if not artists and not groups:
             errors.append(ValidationError("At least one artist or music group must be selected."))
 
-        # Require at least one song in album
-        if not songs or len(songs) == 0:
-            errors.append(ValidationError("At least one song must be added to the album."))
-
         # Disallow album title 'Untitled'
         if title and (title.lower() == "untitled"):
             errors.append(ValidationError("Album title cannot be 'Untitled'."))
@@ -381,37 +436,13 @@ class SongModelForm(ModelForm):
         }
 
     def clean_title(self):
-        title = self.cleaned_data.get('title', '').strip()
-        if not title:
-            raise ValidationError("Song title is required.")
-        if len(title) < 2:
-            raise ValidationError("Title must be at least 2 characters long.")
-        if len(title) > 100:
-            raise ValidationError("Title is too long (max 100 characters).")
-        if title.isupper():
-            title = title.capitalize()  # Capitalize if all uppercase
-        else:
-            # Capitalize each sentence word properly
-            title = re.sub(' +', ' ', title).strip().title()
-        return title
+        return normalize_song_title(self.cleaned_data.get('title', ''))
 
     def clean_duration(self):
-        duration = self.cleaned_data.get('duration')
-        if duration is not None:
-            if duration <= 0:
-                raise ValidationError("Duration must be a positive number.")
-            if duration > 60 * 60 * 10:  # Max 10 hours in seconds
-                raise ValidationError("Song duration is too long.")
-        return duration
+        return validate_song_duration(self.cleaned_data.get('duration'))
 
     def clean_released(self):
-        released = self.cleaned_data.get('released')
-        if released:
-            if released > now().date():
-                raise ValidationError("Release date cannot be in the future.")
-            if released.year < 1800:
-                raise ValidationError("Release date is too old.")
-        return released
+        return validate_song_released(self.cleaned_data.get('released'))
 
     def clean_summary(self):
         summary = self.cleaned_data.get('summary', '').strip()
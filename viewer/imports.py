@@ -0,0 +1,468 @@
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.utils.dateparse import parse_date
+
+from viewer.credits import invalidate_song_credits
+from viewer.forms import (
+    normalize_album_title, normalize_name_word, normalize_song_title, validate_album_released,
+    validate_song_duration, validate_song_released,
+)
+from viewer.models import (
+    Album, AlbumSong, Contributor, ContributorRole, Country, Genre, Language, MusicGroup, MusicGroupRole, Song,
+    SongPerformance,
+)
+from viewer.search import search_index
+from viewer.listings import refresh_album_listings, refresh_song_listings
+from viewer.summaries import deferred_album_summaries, refresh_album_summaries
+from viewer.typeahead import typeahead_index
+from viewer.viewcache import bump_object_versions, bump_versions, invalidate_after_commit
+
+
+SECTIONS = ('contributors', 'music_groups', 'songs', 'albums', 'credits')
+# Fields of each section that must be a string or a list when present, checked before any lookup
+FIELD_TYPES = {
+    'contributors': {'first_name': str, 'middle_name': str, 'last_name': str, 'stage_name': str, 'country': str},
+    'music_groups': {'name': str, 'country': str},
+    'songs': {
+        'title': str, 'summary': str, 'lyrics': str, 'language': str, 'genres': list, 'artists': list,
+        'music_groups': list,
+    },
+    'albums': {'title': str, 'summary': str, 'artists': list, 'music_groups': list, 'songs': list},
+    'credits': {'role': str},
+}
+TYPE_NAMES = {str: "a string", list: "a list"}
+
+
+class CatalogImportError(Exception):
+    """Raised with every validation error of a batch, nothing of the batch is written."""
+
+    def __init__(self, errors):
+        super().__init__(f"The catalog batch has {len(errors)} errors.")
+        self.errors = errors
+
+
+def _messages(error):
+    return '; '.join(error.messages)
+
+
+def _pk(target):
+    # A reference is either the primary key of an existing row or a new instance saved by bulk_create
+    return target if isinstance(target, int) else target.pk
+
+
+def _key(target):
+    # Unsaved instances are not hashable, compare them by identity
+    return target if isinstance(target, int) else ('new', id(target))
+
+
+def _links(field, pairs):
+    """Rows of the auto-created through table of a many-to-many field."""
+    through = field.remote_field.through
+    source = field.m2m_field_name() + '_id'
+    target = field.m2m_reverse_field_name() + '_id'
+    return through, [through(**{source: _pk(obj), target: _pk(other)}) for obj, other in pairs]
+
+
+class CatalogBatch:
+    """A batch of new contributors, music groups, songs, albums and song credits.
+
+    Rows of the batch reference each other by their "ref" string, existing rows by primary key.
+    Languages, genres, countries and roles are looked up by case-insensitive name. Every lookup
+    and duplicate check runs once per batch with an IN query, never once per row.
+    """
+
+    def __init__(self, data, using='default'):
+        self.data = data
+        self.using = using
+        self.errors = []
+        self.contributors = []
+        self.music_groups = []
+        self.songs = []
+        self.song_artists = []  # (song, contributor) pairs
+        self.song_music_groups = []
+        self.song_genres = []
+        self.albums = []
+        self.album_artists = []
+        self.album_music_groups = []
+        self.tracks = []  # (album, song, order)
+        self.credits = []  # (song, contributor, contributor role id, music group, music group role id)
+        self.performances = []
+        self.refs = {Contributor: {}, MusicGroup: {}, Song: {}}
+
+    def error(self, section, index, message, field=None):
+        self.errors.append({'section': section, 'index': index, 'field': field, 'message': message})
+
+    def rows(self, section):
+        return self.data.get(section) or []
+
+    # Set-based lookups
+    def names(self, model, values):
+        """Map lowercase names to primary keys, one query for the whole batch."""
+        wanted = {value.strip().lower() for value in values if isinstance(value, str) and value.strip()}
+        if not wanted:
+            return {}
+        rows = model.objects.using(self.using).annotate(lower_name=Lower('name')).filter(lower_name__in=wanted)
+        return dict(rows.values_list('lower_name', 'pk'))
+
+    def existing_pks(self, model, values):
+        ids = {value for value in values if isinstance(value, int) and not isinstance(value, bool)}
+        if not ids:
+            return set()
+        return set(model.objects.using(self.using).filter(pk__in=ids).values_list('pk', flat=True))
+
+    def lowercase_values(self, model, field, values):
+        """Lowercase values of `field` that already exist, for duplicate checks."""
+        if not values:
+            return set()
+        rows = model.objects.using(self.using).annotate(lower_value=Lower(field)).filter(lower_value__in=values)
+        return set(rows.values_list('lower_value', flat=True))
+
+    def resolve(self, section, index, field, value, model, existing):
+        if isinstance(value, str) and value in self.refs[model]:
+            return self.refs[model][value]
+        if isinstance(value, int) and value in existing:
+            return value
+        self.error(section, index, f"Unknown {model._meta.verbose_name} reference {value!r}.", field)
+        return None
+
+    def resolve_list(self, section, index, field, values, model, existing):
+        if not isinstance(values, list):
+            self.error(section, index, "Expected a list.", field)
+            return []
+        resolved = [self.resolve(section, index, field, value, model, existing) for value in values]
+        return list({_key(target): target for target in resolved if target is not None}.values())
+
+    def date(self, section, index, field, value, validator=None):
+        if value in (None, ''):
+            return None
+        try:
+            parsed = parse_date(value) if isinstance(value, str) else None
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            self.error(section, index, "Enter a valid date (YYYY-MM-DD).", field)
+            return None
+        if validator:
+            try:
+                validator(parsed)
+            except ValidationError as error:
+                self.error(section, index, _messages(error), field)
+        return parsed
+
+    def add_ref(self, section, index, row, model, instance):
+        ref = row.get('ref')
+        if ref is None:
+            return
+        if not isinstance(ref, str) or not ref:
+            self.error(section, index, "A ref must be a non-empty string.", 'ref')
+        elif ref in self.refs[model]:
+            self.error(section, index, f"Duplicate ref {ref!r}.", 'ref')
+        else:
+            self.refs[model][ref] = instance
+
+    # Sections
+    def validate(self):
+        if not isinstance(self.data, dict):
+            raise CatalogImportError([{'section': None, 'index': None, 'field': None,
+                                       'message': "Expected a JSON object."}])
+        for section in SECTIONS:
+            rows = self.data.get(section)
+            if rows is not None and (not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows)):
+                self.error(section, None, "Expected a list of objects.")
+        if self.errors:
+            raise CatalogImportError(self.errors)
+        for section in SECTIONS:
+            for index, row in enumerate(self.rows(section)):
+                for field, expected in FIELD_TYPES[section].items():
+                    if row.get(field) is not None and not isinstance(row[field], expected):
+                        self.error(section, index, f"Expected {TYPE_NAMES[expected]}.", field)
+        if self.errors:
+            raise CatalogImportError(self.errors)
+
+        self.countries = self.names(
+            Country, [row.get('country') for section in ('contributors', 'music_groups') for row in self.rows(section)]
+        )
+        self.validate_contributors()
+        self.validate_music_groups()
+        self.validate_songs()
+        self.validate_albums()
+        self.validate_credits()
+        if self.errors:
+            raise CatalogImportError(self.errors)
+
+    def country(self, section, index, row):
+        name = row.get('country')
+        if not name:
+            return None
+        country_id = self.countries.get(str(name).strip().lower())
+        if country_id is None:
+            self.error(section, index, f"Unknown country {name!r}.", 'country')
+        return country_id
+
+    def validate_contributors(self):
+        rows = self.rows('contributors')
+        stage_names = {
+            str(row['stage_name']).strip().lower() for row in rows if row.get('stage_name')
+        }
+        taken = self.lowercase_values(Contributor, 'stage_name', stage_names)
+        for index, row in enumerate(rows):
+            names = {}
+            for field, label in (('first_name', "First name"), ('middle_name', "Middle name"),
+                                 ('last_name', "Last name")):
+                try:
+                    names[field] = normalize_name_word(row.get(field) or None, label)
+                except ValidationError as error:
+                    self.error('contributors', index, _messages(error), field)
+            for field, label in (('first_name', "First name"), ('last_name', "Last name")):
+                if not row.get(field):
+                    self.error('contributors', index, f"{label} is required.", field)
+
+            stage_name = str(row.get('stage_name') or '').strip().title() or None
+            if stage_name:
+                if stage_name.lower() in taken:
+                    self.error('contributors', index, "This stage name already exists.", 'stage_name')
+                taken.add(stage_name.lower())
+
+            contributor = Contributor(
+                first_name=names.get('first_name'), middle_name=names.get('middle_name'),
+                last_name=names.get('last_name'), stage_name=stage_name,
+                date_of_birth=self.date('contributors', index, 'date_of_birth', row.get('date_of_birth')),
+                date_of_death=self.date('contributors', index, 'date_of_death', row.get('date_of_death')),
+                country_id=self.country('contributors', index, row),
+            )
+            self.contributors.append(contributor)
+            self.add_ref('contributors', index, row, Contributor, contributor)
+
+    def validate_music_groups(self):
+        rows = self.rows('music_groups')
+        taken = self.lowercase_values(
+            MusicGroup, 'name', {str(row['name']).strip().lower() for row in rows if row.get('name')}
+        )
+        for index, row in enumerate(rows):
+            name = str(row.get('name') or '').strip().title()
+            if not name:
+                self.error('music_groups', index, "Music group name is required.", 'name')
+            elif name.lower() in taken:
+                self.error('music_groups', index, "This group already exists.", 'name')
+            taken.add(name.lower())
+
+            group = MusicGroup(
+                name=name,
+                founded=self.date('music_groups', index, 'founded', row.get('founded')),
+                disbanded=self.date('music_groups', index, 'disbanded', row.get('disbanded')),
+                country_id=self.country('music_groups', index, row),
+            )
+            self.music_groups.append(group)
+            self.add_ref('music_groups', index, row, MusicGroup, group)
+
+    def validate_songs(self):
+        rows = self.rows('songs')
+        languages = self.names(Language, [row.get('language') for row in rows])
+        genres = self.names(Genre, [name for row in rows for name in row.get('genres') or [] if isinstance(name, str)])
+        artists = self.existing_pks(Contributor, [value for row in rows for value in row.get('artists') or []])
+        groups = self.existing_pks(MusicGroup, [value for row in rows for value in row.get('music_groups') or []])
+
+        for index, row in enumerate(rows):
+            song = Song(summary=row.get('summary') or None, lyrics=row.get('lyrics') or None)
+            try:
+                song.title = normalize_song_title(row.get('title'))
+            except ValidationError as error:
+                self.error('songs', index, _messages(error), 'title')
+            duration = row.get('duration')
+            if duration is not None and (not isinstance(duration, int) or isinstance(duration, bool)):
+                self.error('songs', index, "Duration must be a whole number of seconds.", 'duration')
+            else:
+                try:
+                    song.duration = validate_song_duration(duration)
+                except ValidationError as error:
+                    self.error('songs', index, _messages(error), 'duration')
+            song.released = self.date('songs', index, 'released', row.get('released'), validate_song_released)
+            if row.get('language'):
+                song.language_id = languages.get(str(row['language']).strip().lower())
+                if song.language_id is None:
+                    self.error('songs', index, f"Unknown language {row['language']!r}.", 'language')
+
+            song_genres = []
+            for name in row.get('genres') or []:
+                genre_id = genres.get(name.strip().lower()) if isinstance(name, str) else None
+                if genre_id is None:
+                    self.error('songs', index, f"Unknown genre {name!r}.", 'genres')
+                elif genre_id not in song_genres:
+                    song_genres.append(genre_id)
+            song_artists = self.resolve_list('songs', index, 'artists', row.get('artists') or [], Contributor, artists)
+            song_groups = self.resolve_list(
+                'songs', index, 'music_groups', row.get('music_groups') or [], MusicGroup, groups
+            )
+
+            # Same limits as SongModelForm
+            if len(song_artists) > 10:
+                self.error('songs', index, "You cannot select more than 10 artists.", 'artists')
+            if len(song_groups) > 5:
+                self.error('songs', index, "You cannot select more than 5 music groups.", 'music_groups')
+            if len(song_genres) > 5:
+                self.error('songs', index, "You cannot select more than 5 genres.", 'genres')
+            if not row.get('artists') and not row.get('music_groups'):
+                self.error('songs', index, "You must select at least one artist or one music group.")
+
+            self.songs.append(song)
+            self.song_artists += [(song, artist) for artist in song_artists]
+            self.song_music_groups += [(song, group) for group in song_groups]
+            self.song_genres += [(song, genre_id) for genre_id in song_genres]
+            self.add_ref('songs', index, row, Song, song)
+
+    def validate_albums(self):
+        rows = self.rows('albums')
+        artists = self.existing_pks(Contributor, [value for row in rows for value in row.get('artists') or []])
+        groups = self.existing_pks(MusicGroup, [value for row in rows for value in row.get('music_groups') or []])
+        songs = self.existing_pks(Song, [value for row in rows for value in row.get('songs') or []])
+
+        for index, row in enumerate(rows):
+            album = Album(summary=row.get('summary') or None)
+            try:
+                album.title = normalize_album_title(row.get('title'))
+            except ValidationError as error:
+                self.error('albums', index, _messages(error), 'title')
+            album.released = self.date('albums', index, 'released', row.get('released'), validate_album_released)
+
+            album_artists = self.resolve_list('albums', index, 'artists', row.get('artists') or [], Contributor, artists)
+            album_groups = self.resolve_list(
+                'albums', index, 'music_groups', row.get('music_groups') or [], MusicGroup, groups
+            )
+            tracklist = self.resolve_list('albums', index, 'songs', row.get('songs') or [], Song, songs)
+            if not row.get('songs'):
+                self.error('albums', index, "At least one song must be selected.", 'songs')
+            if not row.get('artists') and not row.get('music_groups'):
+                self.error('albums', index, "At least one artist or music group must be selected.")
+
+            self.albums.append(album)
+            self.album_artists += [(album, artist) for artist in album_artists]
+            self.album_music_groups += [(album, group) for group in album_groups]
+            self.tracks += [(album, song, order) for order, song in enumerate(tracklist, start=1)]
+
+    def validate_credits(self):
+        rows = self.rows('credits')
+        songs = self.existing_pks(Song, [row.get('song') for row in rows])
+        contributors = self.existing_pks(Contributor, [row.get('contributor') for row in rows])
+        groups = self.existing_pks(MusicGroup, [row.get('music_group') for row in rows])
+        contributor_roles = self.names(ContributorRole, [row.get('role') for row in rows if row.get('contributor')])
+        group_roles = self.names(MusicGroupRole, [row.get('role') for row in rows if row.get('music_group')])
+
+        # Credits already stored for existing songs, one query for the batch
+        seen = set(
+            SongPerformance.objects.using(self.using).filter(song_id__in=songs).values_list(
+                'song_id', 'contributor_id', 'contributor_role_id', 'music_group_id', 'music_group_role_id'
+            )
+        ) if songs else set()
+
+        for index, row in enumerate(rows):
+            if bool(row.get('contributor')) == bool(row.get('music_group')):
+                self.error('credits', index, "Either contributor or music group must be set.")
+                continue
+            song = self.resolve('credits', index, 'song', row.get('song'), Song, songs)
+            role_name = str(row.get('role') or '').strip()
+            if row.get('contributor'):
+                performer = self.resolve('credits', index, 'contributor', row['contributor'], Contributor, contributors)
+                role_id = contributor_roles.get(role_name.lower())
+            else:
+                performer = self.resolve('credits', index, 'music_group', row['music_group'], MusicGroup, groups)
+                role_id = group_roles.get(role_name.lower())
+            if role_id is None:
+                self.error('credits', index, f"Unknown role {role_name!r}.", 'role')
+            if song is None or performer is None or role_id is None:
+                continue
+
+            if row.get('contributor'):
+                credit = (song, performer, role_id, None, None)
+            else:
+                credit = (song, None, None, performer, role_id)
+            key = tuple(None if value is None else _key(value) for value in credit)
+            if key in seen:
+                self.error('credits', index, "This credit already exists.")
+                continue
+            seen.add(key)
+            self.credits.append(credit)
+
+    # Writing
+    def _objects(self, model):
+        return model.objects.using(self.using)
+
+    def save(self, chunk_size=500):
+        """Write the validated batch with bulk inserts in one transaction, returns counts per section."""
+        with transaction.atomic(using=self.using), deferred_album_summaries():
+            self._objects(Contributor).bulk_create(self.contributors, batch_size=chunk_size)
+            self._objects(MusicGroup).bulk_create(self.music_groups, batch_size=chunk_size)
+            self._objects(Song).bulk_create(self.songs, batch_size=chunk_size)
+            self._objects(Album).bulk_create(self.albums, batch_size=chunk_size)
+            for field, pairs in ((Song.artist.field, self.song_artists),
+                                 (Song.music_group.field, self.song_music_groups),
+                                 (Song.genre.field, self.song_genres),
+                                 (Album.artist.field, self.album_artists),
+                                 (Album.music_group.field, self.album_music_groups)):
+                through, links = _links(field, pairs)
+                self._objects(through).bulk_create(links, batch_size=chunk_size)
+            self._objects(AlbumSong).bulk_create(
+                [AlbumSong(album_id=album.pk, song_id=_pk(song), order=order) for album, song, order in self.tracks],
+                batch_size=chunk_size,
+            )
+            self.performances = [
+                SongPerformance(
+                    song_id=_pk(song),
+                    contributor_id=contributor and _pk(contributor), contributor_role_id=contributor_role_id,
+                    music_group_id=group and _pk(group), music_group_role_id=group_role_id,
+                )
+                for song, contributor, contributor_role_id, group, group_role_id in self.credits
+            ]
+            self._objects(SongPerformance).bulk_create(self.performances, batch_size=chunk_size)
+            self.refresh_derived_data()
+
+        return {
+            'contributors': len(self.contributors),
+            'music_groups': len(self.music_groups),
+            'songs': len(self.songs),
+            'albums': len(self.albums),
+            'credits': len(self.performances),
+        }
+
+    def refresh_derived_data(self):
+        # bulk_create sends no model signals, refresh what the signals in viewer.signals maintain
+        search_index.update_many(self.contributors + self.music_groups + self.songs + self.albums, self.using)
+        credited_song_ids = {performance.song_id for performance in self.performances}
+        album_ids = {album.pk for album in self.albums}
+        album_ids.update(
+            AlbumSong.objects.using(self.using).filter(song_id__in=credited_song_ids).values_list('album_id', flat=True)
+        )
+        refresh_album_summaries(album_ids, self.using)
+        refresh_song_listings(
+            [song.pk for song in self.songs]
+            + [_pk(song) for song, _ in self.song_artists + self.song_music_groups]
+            + [_pk(song) for _, song, _ in self.tracks],
+            using=self.using,
+        )
+        refresh_album_listings((album.pk for album in self.albums), using=self.using)
+
+        def invalidate_credits():
+            for song_id in credited_song_ids:
+                invalidate_song_credits(song_id)
+
+        invalidate_after_commit(invalidate_credits, self.using)
+        transaction.on_commit(typeahead_index.invalidate, using=self.using)
+        bump_versions(
+            Contributor, MusicGroup, Song, Album, AlbumSong, SongPerformance, Song.artist.through,
+            Song.music_group.through, Song.genre.through, Album.artist.through, Album.music_group.through,
+            using=self.using,
+        )
+        # Existing rows referenced by primary key now show up in new songs, albums and credits
+        linked = [(Contributor, artist) for _, artist in self.song_artists + self.album_artists]
+        linked += [(MusicGroup, group) for _, group in self.song_music_groups + self.album_music_groups]
+        linked += [(Song, song) for _, song, _ in self.tracks]
+        for song, contributor, _, group, _ in self.credits:
+            linked += [(Song, song), (Contributor, contributor), (MusicGroup, group)]
+        bump_object_versions(((model, target) for model, target in linked if isinstance(target, int)), self.using)
+
+
+def import_catalog(data, using='default', chunk_size=500):
+    """Validate a whole catalog batch, then write it. Raises CatalogImportError listing every invalid row."""
+    batch = CatalogBatch(data, using)
+    batch.validate()
+    return batch.save(chunk_size)
@@ -0,0 +1,176 @@
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS
+
+from viewer.models import Album, AlbumListing, AlbumSong, Contributor, MusicGroup, Song, SongListing
+from viewer.viewcache import bump_versions
+
+
+CHUNK_SIZE = 500
+SONG_LISTING_FIELDS = ['artists', 'music_groups', 'albums', 'album_count']
+ALBUM_LISTING_FIELDS = ['creator']
+
+
+def _chunks(ids):
+    ids = sorted(set(ids))
+    for start in range(0, len(ids), CHUNK_SIZE):
+        yield ids[start:start + CHUNK_SIZE]
+
+
+def _ordering(relation, model):
+    """Default ordering of a model followed through a relation, the order its related managers return."""
+    return [
+        f'-{relation}__{field[1:]}' if field.startswith('-') else f'{relation}__{field}'
+        for field in model._meta.ordering
+    ]
+
+
+def _names(links, owner, relation, model, name=str):
+    """Names of the related objects per owner id, in the related model's default order."""
+    names = defaultdict(list)
+    for link in links.select_related(relation).order_by(*_ordering(relation, model), 'pk'):
+        names[getattr(link, owner)].append(name(getattr(link, relation)))
+    return names
+
+
+def creator_label(artists, music_groups):
+    if artists and music_groups:
+        return f"{artists} / {music_groups}"
+    return artists or music_groups or "Unknown"
+
+
+def _build_song_listings(song_ids, using=DEFAULT_DB_ALIAS):
+    artists = _names(
+        Song.artist.through.objects.using(using).filter(song_id__in=song_ids), 'song_id', 'contributor', Contributor,
+    )
+    groups = _names(
+        Song.music_group.through.objects.using(using).filter(song_id__in=song_ids), 'song_id', 'musicgroup', MusicGroup,
+        lambda group: group.name,
+    )
+    albums = _names(
+        AlbumSong.objects.using(using).filter(song_id__in=song_ids), 'song_id', 'album', Album, lambda album: album.title,
+    )
+    return {
+        song_id: SongListing(
+            song_id=song_id, artists=', '.join(artists[song_id]), music_groups=', '.join(groups[song_id]),
+            albums=', '.join(albums[song_id]), album_count=len(albums[song_id]),
+        )
+        for song_id in song_ids
+    }
+
+
+def _build_album_listings(album_ids, using=DEFAULT_DB_ALIAS):
+    artists = _names(
+        Album.artist.through.objects.using(using).filter(album_id__in=album_ids), 'album_id', 'contributor', Contributor,
+    )
+    groups = _names(
+        Album.music_group.through.objects.using(using).filter(album_id__in=album_ids), 'album_id', 'musicgroup', MusicGroup,
+        lambda group: group.name,
+    )
+    return {
+        album_id: AlbumListing(
+            album_id=album_id, creator=creator_label(', '.join(artists[album_id]), ', '.join(groups[album_id])),
+        )
+        for album_id in album_ids
+    }
+
+
+def build_song_listing(song_id):
+    """Credit strings of one song computed from its links, not stored."""
+    return _build_song_listings([song_id])[song_id]
+
+
+def build_album_listing(album_id):
+    """Creator string of one album computed from its links, not stored."""
+    return _build_album_listings([album_id])[album_id]
+
+
+def _refresh(model, owner_model, owner, build, fields, ids, create, using):
+    refreshed = {}
+    changed = False
+    for chunk in _chunks(ids):
+        stored = {getattr(row, owner): row for row in model.objects.using(using).filter(**{f'{owner}__in': chunk})}
+        if create:
+            missing = set(chunk) - set(stored)
+            if missing:
+                # Owners deleted meanwhile get no listing
+                missing -= missing - set(owner_model.objects.using(using).filter(pk__in=missing).values_list('pk', flat=True))
+            chunk = [owner_id for owner_id in chunk if owner_id in stored or owner_id in missing]
+        else:
+            chunk = list(stored)
+        if not chunk:
+            continue
+
+        creates, updates = [], []
+        for owner_id, listing in build(chunk, using).items():
+            row = stored.get(owner_id)
+            if row is None:
+                creates.append(listing)
+            elif any(getattr(row, field) != getattr(listing, field) for field in fields):
+                for field in fields:
+                    setattr(row, field, getattr(listing, field))
+                updates.append(row)
+            refreshed[owner_id] = listing if row is None else row
+        if creates:
+            # A concurrent request may have stored the same listing first, both are equal
+            model.objects.using(using).bulk_create(creates, ignore_conflicts=True)
+        if updates:
+            model.objects.using(using).bulk_update(updates, fields)
+        changed = changed or bool(creates or updates)
+    if changed:
+        # Neither bulk statement sends signals, cached pages listing the rows are invalidated here
+        bump_versions(model, using=using)
+    return refreshed
+
+
+_deferred = threading.local()
+
+
+@contextmanager
+def deferred_listings():
+    """Collect updates of stored listings inside the block and refresh each song and album once when it exits."""
+    if getattr(_deferred, 'ids', None) is not None:
+        # Nested block, the outermost one refreshes
+        yield
+        return
+    _deferred.ids = {SongListing: set(), AlbumListing: set()}
+    try:
+        yield
+        ids = _deferred.ids
+    finally:
+        _deferred.ids = None
+    refresh_song_listings(ids[SongListing], create=False)
+    refresh_album_listings(ids[AlbumListing], create=False)
+
+
+def refresh_song_listings(song_ids, create=True, using=DEFAULT_DB_ALIAS):
+    """Recompute the stored credit strings of the given songs, a few queries per 500 songs.
+
+    Returns the listings by song id. With `create=False` only listings already stored are
+    updated, and inside deferred_listings() the update waits for the end of the block. Listings
+    are created by the signals, catalog imports and the rebuild_listings command, never by a page read.
+    """
+    pending = getattr(_deferred, 'ids', None)
+    if pending is not None and not create:
+        pending[SongListing].update(song_ids)
+        return {}
+    return _refresh(SongListing, Song, 'song_id', _build_song_listings, SONG_LISTING_FIELDS, song_ids, create, using)
+
+
+def refresh_album_listings(album_ids, create=True, using=DEFAULT_DB_ALIAS):
+    """Recompute the stored creator strings of the given albums, see refresh_song_listings."""
+    pending = getattr(_deferred, 'ids', None)
+    if pending is not None and not create:
+        pending[AlbumListing].update(album_ids)
+        return {}
+    return _refresh(
+        AlbumListing, Album, 'album_id', _build_album_listings, ALBUM_LISTING_FIELDS, album_ids, create, using,
+    )
+
+
+def rebuild_listings(using=DEFAULT_DB_ALIAS):
+    """Store the listings of every song and album, for bulk loads and loaddata that bypass the signals."""
+    refresh_song_listings(Song.objects.using(using).values_list('pk', flat=True), using=using)
+    refresh_album_listings(Album.objects.using(using).values_list('pk', flat=True), using=using)
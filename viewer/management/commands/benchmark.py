@@ -0,0 +1,74 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from viewer.benchmarks import (
+    GROUPS, ClientRunner, ServerRunner, build_targets, compare, load_report, run_benchmark, save_report,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure p50/p95 latency, queries per request and peak memory of the list, detail and search views. "
+        "Run it against a catalog from generate_catalog; --output saves a baseline, --compare reports changes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50, help="Timed requests per view.")
+        parser.add_argument('--warmup', type=int, default=3, help="Untimed requests per view before timing.")
+        parser.add_argument('--group', action='append', choices=GROUPS,
+                            help="Benchmark only these view groups, repeatable. Default: all.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--user', help="Username to log in as, default anonymous.")
+        parser.add_argument('--server', help="Base URL of a running server instead of the in-process test client.")
+        parser.add_argument('--no-cache', action='store_true', help="Disable the cache to measure full view cost.")
+        parser.add_argument('--output', help="Save the report as JSON.")
+        parser.add_argument('--compare', help="Baseline JSON report to compare with.")
+        parser.add_argument('--max-regression', type=float,
+                            help="Fail when p95 latency of a view grows by more percent than this.")
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError("--iterations must be at least 1.")
+        baseline = None
+        if options['compare']:
+            try:
+                baseline = load_report(options['compare'])
+            except (OSError, ValueError) as error:
+                raise CommandError(f"Cannot read baseline '{options['compare']}': {error}")
+
+        if options['server']:
+            runner = ServerRunner(options['server'])
+        else:
+            runner = ClientRunner(options['user'])
+        targets = build_targets(options['group'] or GROUPS, seed=options['seed'])
+
+        self.stdout.write(
+            f"{'view':<24}{'p50 ms':>9}{'p95 ms':>9}{'queries':>9}{'mem KiB':>10}{'errors':>8}"
+        )
+
+        def progress(name, result):
+            queries = '-' if result['queries_mean'] is None else result['queries_mean']
+            memory = '-' if result['peak_memory_kib'] is None else result['peak_memory_kib']
+            self.stdout.write(
+                f"{name:<24}{result['p50_ms']:>9}{result['p95_ms']:>9}{queries:>9}{memory:>10}{result['errors']:>8}"
+            )
+
+        if options['no_cache'] and not options['server']:
+            with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}):
+                report = run_benchmark(runner, targets, options['iterations'], options['warmup'], progress)
+        else:
+            report = run_benchmark(runner, targets, options['iterations'], options['warmup'], progress)
+
+        if options['output']:
+            save_report(report, options['output'])
+            self.stdout.write(f"Report saved to {options['output']}.")
+
+        if baseline is not None:
+            regressions = []
+            self.stdout.write(f"Change against {options['compare']}:")
+            for name, change in compare(report, baseline).items():
+                self.stdout.write(f"  {name:<22}" + ', '.join(f"{metric} {value:+.1f}%" for metric, value in change.items()))
+                if options['max_regression'] is not None and change.get('p95_ms', 0) > options['max_regression']:
+                    regressions.append(name)
+            if regressions:
+                raise CommandError(f"p95 latency regressed over {options['max_regression']}%: {', '.join(regressions)}")
@@ -0,0 +1,54 @@
+import multiprocessing
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from MusicLibrary.databases import SQLITE_PROFILES
+from viewer.benchmarks import run_sqlite_benchmark, save_report
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure reads and writes per second of several worker processes sharing the SQLite database, "
+        "once per connection profile. The workers update song durations in a temporary copy of the database file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help="Worker process counts.")
+        parser.add_argument('--duration', type=float, default=10, help="Seconds each run lasts.")
+        parser.add_argument('--write-share', type=float, default=0.2, help="Share of operations that are writes.")
+        parser.add_argument('--profile', action='append', choices=list(SQLITE_PROFILES),
+                            help="Connection profiles to compare, repeatable. Default: all.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help="Save the report as JSON.")
+
+    def handle(self, *args, **options):
+        connection = connections['default']
+        if connection.vendor != 'sqlite' or connection.is_in_memory_db():
+            raise CommandError("The default database must be a SQLite file.")
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise CommandError("The workers need the fork start method, which this platform lacks.")
+        if min(options['workers']) < 1 or options['duration'] <= 0 or not 0 <= options['write_share'] <= 1:
+            raise CommandError("--workers must be at least 1, --duration positive and --write-share between 0 and 1.")
+
+        self.stdout.write(
+            f"{'profile':<10}{'workers':>8}{'reads/s':>10}{'writes/s':>10}"
+            f"{'read p95':>10}{'write p95':>11}{'errors':>8}"
+        )
+
+        def progress(result):
+            self.stdout.write(
+                f"{result['profile']:<10}{result['workers']:>8}{result['reads_per_s']:>10}{result['writes_per_s']:>10}"
+                f"{str(result['read_p95_ms']):>10}{str(result['write_p95_ms']):>11}{result['errors']:>8}"
+            )
+
+        try:
+            report = run_sqlite_benchmark(
+                options['profile'] or list(SQLITE_PROFILES), options['workers'], options['duration'],
+                options['write_share'], options['seed'], progress,
+            )
+        except (ValueError, RuntimeError) as error:
+            raise CommandError(error)
+        if options['output']:
+            save_report(report, options['output'])
+            self.stdout.write(f"Report saved to {options['output']}.")
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from viewer.exports import EXPORTS, FORMATS, iter_csv, iter_jsonl
+
+
+class Command(BaseCommand):
+    help = "Stream the catalog as JSONL (all kinds in one file) or CSV (one kind) with bounded memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS, default='jsonl')
+        parser.add_argument(
+            '--kind', action='append', choices=list(EXPORTS),
+            help="Export kind, can be repeated for JSONL. Defaults to every kind for JSONL.",
+        )
+        parser.add_argument('--output', '-o', default='-', help="Output file, '-' for standard output.")
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        kinds = options['kind'] or list(EXPORTS)
+        if options['format'] == 'csv':
+            if len(kinds) != 1:
+                raise CommandError("CSV export needs exactly one --kind.")
+            lines = iter_csv(kinds[0], options['chunk_size'])
+        else:
+            lines = iter_jsonl(kinds, options['chunk_size'])
+
+        if options['output'] == '-':
+            output = self.stdout
+            for line in lines:
+                output.write(line, ending='')
+            return
+        count = 0
+        with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+            for line in lines:
+                output.write(line)
+                count += 1
+        self.stderr.write(f"Wrote {count} lines to {options['output']}.")
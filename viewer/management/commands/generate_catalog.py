@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from viewer.imports import CatalogImportError
+from viewer.synthetic import generate_catalog
+
+
+class Command(BaseCommand):
+    help = (
+        "Create a synthetic catalog for load tests and benchmarks. A few contributors, groups and genres "
+        "get most of the songs (--skew), the same --seed gives the same catalog."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--songs', type=int, default=10000)
+        parser.add_argument('--albums', type=int, help="Default: one album per 10 songs.")
+        parser.add_argument('--contributors', type=int, help="Default: one contributor per 5 songs.")
+        parser.add_argument('--music-groups', type=int, help="Default: one music group per 20 songs.")
+        parser.add_argument('--credits-per-song', type=int, default=3, help="Average contributor credits per song.")
+        parser.add_argument('--skew', type=float, default=1.1, help="Zipf exponent of the popularity distribution.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=2000, help="Songs per import transaction.")
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        for option in ('songs', 'batch_size', 'chunk_size'):
+            if options[option] < 1:
+                raise CommandError(f"--{option.replace('_', '-')} must be at least 1.")
+
+        started = time.perf_counter()
+
+        def progress(done, total):
+            self.stdout.write(f"{done}/{total} songs, {time.perf_counter() - started:.1f}s")
+
+        try:
+            created = generate_catalog(
+                options['songs'], albums=options['albums'], contributors=options['contributors'],
+                music_groups=options['music_groups'], credits_per_song=options['credits_per_song'],
+                skew=options['skew'], seed=options['seed'], using=options['database'],
+                batch_size=options['batch_size'], chunk_size=options['chunk_size'], progress=progress,
+            )
+        except CatalogImportError as error:
+            raise CommandError(f"{error} First: {error.errors[0]['message']}")
+
+        self.stdout.write(self.style.SUCCESS(
+            "Generated " + ', '.join(f"{count} {section}" for section, count in created.items())
+            + f" in {time.perf_counter() - started:.1f}s."
+        ))
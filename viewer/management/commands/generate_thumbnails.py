@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from viewer.models import Album
+from viewer.thumbnails import generate_thumbnails
+
+
+class Command(BaseCommand):
+    help = "Generate grid, detail and retina WebP/JPEG derivatives of album covers."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Regenerate derivatives that are up to date.")
+
+    def handle(self, *args, **options):
+        albums = Album.objects.exclude(cover_image='').exclude(cover_image__isnull=True).only('pk', 'cover_image')
+        covers = written = 0
+        for album in albums.iterator():
+            count = generate_thumbnails(album.cover_image, force=options['force'])
+            covers += 1 if count else 0
+            written += count
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} derivatives for {covers} covers."))
@@ -0,0 +1,42 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from viewer.imports import CatalogImportError, import_catalog
+
+
+class Command(BaseCommand):
+    help = (
+        "Create contributors, music groups, songs, albums and credits from a JSON batch. "
+        "The whole batch is validated first and written with bulk inserts, or not at all."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('batch', help="JSON file with contributors, music_groups, songs, albums and credits.")
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size must be at least 1.")
+        try:
+            with open(options['batch'], encoding='utf-8') as file:
+                data = json.load(file)
+        except OSError as error:
+            raise CommandError(f"Cannot read '{options['batch']}': {error}")
+        except json.JSONDecodeError as error:
+            raise CommandError(f"Invalid JSON: {error}")
+
+        try:
+            created = import_catalog(data, using=options['database'], chunk_size=options['chunk_size'])
+        except CatalogImportError as error:
+            for item in error.errors:
+                location = '.'.join(str(part) for part in (item['section'], item['index'], item['field'])
+                                    if part is not None)
+                self.stderr.write(f"{location}: {item['message']}")
+            raise CommandError(str(error))
+
+        self.stdout.write(self.style.SUCCESS(
+            "Imported " + ', '.join(f"{count} {section}" for section, count in created.items()) + "."
+        ))
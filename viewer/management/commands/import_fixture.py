@@ -0,0 +1,160 @@
+import gzip
+import os
+import time
+
+from django.core import serializers
+from django.core.serializers.base import DeserializationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from viewer.covers import cover_index
+from viewer.credits import invalidate_all_song_credits
+from viewer.listings import rebuild_listings
+from viewer.models import Album
+from viewer.search import search_index
+from viewer.summaries import build_album_summaries
+from viewer.typeahead import typeahead_index
+from viewer.utils import iter_json_array
+from viewer.viewcache import bump_versions, invalidate_all_fragments
+
+
+class Command(BaseCommand):
+    help = (
+        "Load a dumpdata JSON fixture (optionally .gz) in a streaming fashion with bulk inserts. "
+        "Rows with an existing primary key are updated, M2M links are added."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('fixture', nargs='?', default='files/fixtures.json')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--progress-every', type=int, default=10000, help="Report progress every N objects.")
+
+    def handle(self, *args, **options):
+        path = options['fixture']
+        if not os.path.isfile(path):
+            raise CommandError(f"Fixture '{path}' does not exist.")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        self.using = options['database']
+        self.batch_size = options['batch_size']
+        self.rows = {}  # model -> instances waiting for bulk_create
+        self.links = {}  # auto-created M2M through model -> link instances
+        self.loaded = {}  # model -> number of saved objects
+        connection = connections[self.using]
+
+        started = time.perf_counter()
+        opener = gzip.open if path.endswith('.gz') else open
+        total_size = os.path.getsize(path)
+        count = 0
+        with opener(path, 'rt', encoding='utf-8') as file, transaction.atomic(using=self.using):
+            # Rows may reference rows later in the file, constraints are checked once at the end
+            with connection.constraint_checks_disabled():
+                try:
+                    for item in iter_json_array(file):
+                        self.add(item)
+                        count += 1
+                        if count % options['progress_every'] == 0:
+                            self.report_progress(count, file, total_size, started)
+                except DeserializationError as error:
+                    raise CommandError(f"Item {count} of '{path}' cannot be loaded: {error}")
+                except ValueError as error:
+                    raise CommandError(f"Invalid JSON after item {count} of '{path}': {error}")
+                self.flush_all()
+            touched = list(self.loaded) + list(self.links_models())
+            connection.check_constraints(table_names=[model._meta.db_table for model in touched])
+            self.reset_sequences(connection)
+
+        self.stdout.write(f"Loaded {count} objects in {time.perf_counter() - started:.1f}s:")
+        for model, loaded in self.loaded.items():
+            self.stdout.write(f"  {model._meta.label}: {loaded}")
+        self.rebuild_derived_data()
+        self.stdout.write(self.style.SUCCESS("Import finished."))
+
+    def add(self, item):
+        if not isinstance(item, dict) or 'model' not in item:
+            raise DeserializationError("Expected an object with a \"model\" key.")
+        # The python deserializer converts field values and foreign keys exactly like loaddata
+        deserialized = next(serializers.deserialize('python', [item], using=self.using, ignorenonexistent=True), None)
+        if deserialized is None:
+            # A model that no longer exists, skipped like loaddata --ignorenonexistent does
+            return
+        instance = deserialized.object
+        model = type(instance)
+        self.rows.setdefault(model, []).append(instance)
+
+        for field_name, target_pks in (deserialized.m2m_data or {}).items():
+            field = model._meta.get_field(field_name)
+            through = field.remote_field.through
+            source = field.m2m_field_name() + '_id'
+            target = field.m2m_reverse_field_name() + '_id'
+            links = self.links.setdefault(through, [])
+            links.extend(through(**{source: instance.pk, target: target_pk}) for target_pk in target_pks)
+            if len(links) >= self.batch_size:
+                self.flush_links(through)
+
+        if len(self.rows[model]) >= self.batch_size:
+            self.flush_rows(model)
+
+    def flush_rows(self, model):
+        rows = self.rows.pop(model, [])
+        if not rows:
+            return
+        pk_name = model._meta.pk.name
+        update_fields = [field.name for field in model._meta.concrete_fields if not field.primary_key]
+        if update_fields:
+            model.objects.using(self.using).bulk_create(
+                rows, update_conflicts=True, unique_fields=[pk_name], update_fields=update_fields,
+            )
+        else:
+            model.objects.using(self.using).bulk_create(rows, ignore_conflicts=True)
+        self.loaded[model] = self.loaded.get(model, 0) + len(rows)
+
+    def flush_links(self, through):
+        links = self.links.pop(through, [])
+        if links:
+            through.objects.using(self.using).bulk_create(links, ignore_conflicts=True)
+
+    def links_models(self):
+        return {field.remote_field.through for model in self.loaded for field in model._meta.many_to_many}
+
+    def flush_all(self):
+        # Remaining rows in dependency order, then the M2M links
+        app_list = {}
+        for model in self.rows:
+            app_list.setdefault(model._meta.app_config, []).append(model)
+        for model in serializers.sort_dependencies(app_list.items()):
+            self.flush_rows(model)
+        for through in list(self.links):
+            self.flush_links(through)
+
+    def reset_sequences(self, connection):
+        # Explicit primary keys do not advance PostgreSQL sequences
+        statements = connection.ops.sequence_reset_sql(no_style(), list(self.loaded))
+        if statements:
+            with connection.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
+
+    def report_progress(self, count, file, total_size, started):
+        message = f"{count} objects"
+        raw = getattr(file, 'buffer', None)
+        # Position in the compressed or plain file, a rough share of the work done
+        position = getattr(getattr(raw, 'fileobj', raw), 'tell', lambda: None)()
+        if position and total_size:
+            message += f" ({position / total_size:.0%})"
+        self.stdout.write(f"{message}, {time.perf_counter() - started:.1f}s")
+
+    def rebuild_derived_data(self):
+        # bulk_create sends no model signals, refresh everything the signals normally maintain
+        search_index.rebuild(self.using)
+        build_album_summaries(Album.objects.using(self.using).values_list('pk', flat=True), self.using)
+        rebuild_listings(self.using)
+        typeahead_index.invalidate()
+        cover_index.invalidate()
+        invalidate_all_song_credits()
+        bump_versions(*self.loaded, *self.links_models())
+        invalidate_all_fragments()
+        self.stdout.write("Rebuilt the search index, album summaries and listings.")
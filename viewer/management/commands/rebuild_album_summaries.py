@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from viewer.models import Album
+from viewer.summaries import build_album_summaries
+
+
+class Command(BaseCommand):
+    help = "Rebuild precomputed album summaries, e.g. after loading fixtures."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        using = options['database']
+        summaries = build_album_summaries(Album.objects.using(using).values_list('pk', flat=True), using)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(summaries)} album summaries."))
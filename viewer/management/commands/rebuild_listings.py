@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from viewer.listings import rebuild_listings
+
+
+class Command(BaseCommand):
+    help = "Store the credit strings of list pages for every song and album, e.g. after loaddata."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        rebuild_listings(options['database'])
+        self.stdout.write(self.style.SUCCESS("Rebuilt the song and album listings."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from viewer.search import search_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index, e.g. after bulk imports that bypass model signals."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        search_index.rebuild(options['database'])
+        self.stdout.write(self.style.SUCCESS("Rebuilt the search index."))
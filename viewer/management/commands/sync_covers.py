@@ -0,0 +1,144 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Linux FICLONE ioctl, shares the data blocks of the source on copy-on-write filesystems (btrfs, XFS)
+FICLONE = 0x40049409
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_up_to_date(source, source_stat, target, compare):
+    try:
+        target_stat = os.stat(target)
+    except FileNotFoundError:
+        return False
+    if (source_stat.st_dev, source_stat.st_ino) == (target_stat.st_dev, target_stat.st_ino):
+        return True  # hardlinked by an earlier run
+    if source_stat.st_size != target_stat.st_size:
+        return False
+    if compare == 'hash':
+        return file_digest(source) == file_digest(target)
+    # copy2 keeps the modification time, so equal size and mtime means the file was synced
+    return int(source_stat.st_mtime) == int(target_stat.st_mtime)
+
+
+def reflink(source, target):
+    import fcntl
+
+    with open(source, 'rb') as src, open(target, 'wb') as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    shutil.copystat(source, target)
+
+
+def place_file(source, target, mode):
+    """Write `target` next to its final name first, so readers never see a half-copied cover."""
+    directory = os.path.dirname(target)
+    os.makedirs(directory, exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=directory, prefix='.sync-')
+    os.close(fd)
+    try:
+        if mode == 'hardlink':
+            os.unlink(temporary)
+            try:
+                os.link(source, temporary)
+            except OSError:
+                # Different filesystem, fall back to a copy
+                shutil.copy2(source, temporary)
+                mode = 'copy'
+        elif mode == 'reflink':
+            try:
+                reflink(source, temporary)
+            except (OSError, ImportError):
+                shutil.copy2(source, temporary)
+                mode = 'copy'
+        else:
+            shutil.copy2(source, temporary)
+        os.replace(temporary, target)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.unlink(temporary)
+        raise
+    return mode
+
+
+class Command(BaseCommand):
+    help = (
+        "Sync album covers from static/images/album_covers into MEDIA_ROOT/album_covers. "
+        "Only new or changed files are copied, in parallel."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default=os.path.join(settings.BASE_DIR, 'static', 'images', 'album_covers'))
+        parser.add_argument('--target', default=os.path.join(settings.MEDIA_ROOT, 'album_covers'))
+        parser.add_argument(
+            '--compare', choices=['mtime', 'hash'], default='mtime',
+            help="Detect changes by size and modification time (default) or by SHA-256 of the content.",
+        )
+        parser.add_argument(
+            '--mode', choices=['copy', 'hardlink', 'reflink'], default='copy',
+            help="Copy files, hardlink them or clone them on copy-on-write filesystems.",
+        )
+        parser.add_argument('--workers', type=int, default=min(32, (os.cpu_count() or 1) * 4))
+
+    def sync_file(self, relative_path, options):
+        source = os.path.join(options['source'], relative_path)
+        target = os.path.join(options['target'], relative_path)
+        source_stat = os.stat(source)
+        if is_up_to_date(source, source_stat, target, options['compare']):
+            return 'skipped', relative_path, 0
+        mode = place_file(source, target, options['mode'])
+        return mode, relative_path, source_stat.st_size
+
+    def handle(self, *args, **options):
+        source = options['source']
+        if not os.path.isdir(source):
+            raise CommandError(f"Source directory '{source}' does not exist.")
+        if options['workers'] < 1:
+            raise CommandError("--workers must be at least 1.")
+
+        relative_paths = [
+            os.path.relpath(os.path.join(root, name), source)
+            for root, _, names in os.walk(source)
+            for name in names
+        ]
+
+        started = time.perf_counter()
+        counts = {'copy': 0, 'hardlink': 0, 'reflink': 0, 'skipped': 0, 'failed': 0}
+        transferred = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            futures = [executor.submit(self.sync_file, path, options) for path in relative_paths]
+            for path, future in zip(relative_paths, futures):
+                try:
+                    result, _, size = future.result()
+                except OSError as error:
+                    counts['failed'] += 1
+                    self.stderr.write(f"Failed: {path} ({error})")
+                    continue
+                counts[result] += 1
+                transferred += size
+                if options['verbosity'] > 1 and result != 'skipped':
+                    self.stdout.write(f"{result}: {path}")
+
+        elapsed = time.perf_counter() - started
+        summary = (
+            f"{len(relative_paths)} covers: {counts['copy']} copied, {counts['hardlink']} hardlinked, "
+            f"{counts['reflink']} reflinked, {counts['skipped']} up to date, {counts['failed']} failed "
+            f"({transferred / 1024 / 1024:.1f} MB in {elapsed:.2f}s)."
+        )
+        if counts['failed']:
+            raise CommandError(summary)
+        self.stdout.write(self.style.SUCCESS(summary))
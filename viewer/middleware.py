@@ -0,0 +1,121 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from viewer.routers import is_read_only_view, reset_replica, use_replica
+
+
+logger = logging.getLogger(__name__)
+
+# Placeholder lists of IN (...) and bulk VALUES differ by size only, they count as the same statement
+_PLACEHOLDERS = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+
+
+def fingerprint(sql):
+    """SQL statement with its parameters removed, equal for the repeated queries of an N+1 loop."""
+    return _PLACEHOLDERS.sub('(...)', ' '.join(sql.split()))
+
+
+class QueryRecorder:
+    """Database execute wrapper collecting the statements and time spent in the database."""
+
+    def __init__(self):
+        self.statements = []
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.statements.append(sql)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def duplicates(self):
+        """Fingerprints executed more than once, most repeated first."""
+        counts = Counter(fingerprint(sql) for sql in self.statements)
+        return [(sql, count) for sql, count in counts.most_common() if count > 1]
+
+
+class QueryBudgetMiddleware:
+    """Records query count, database time and repeated queries of every request.
+
+    The numbers are sent in the X-Query-Count and Server-Timing headers, the latter is shown by
+    the network panel of browser developer tools. Requests over QUERY_BUDGET queries are logged
+    together with their repeated statements. Active with DEBUG or QUERY_INSTRUMENTATION.
+    """
+
+    def __init__(self, get_response):
+        if not (settings.DEBUG or getattr(settings, 'QUERY_INSTRUMENTATION', False)):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.budget = getattr(settings, 'QUERY_BUDGET', 50)
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            # Template responses are rendered by now, streaming responses only count the view part
+            response = self.get_response(request)
+
+        response['X-Query-Count'] = str(recorder.count)
+        response['Server-Timing'] = f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries"'
+        if recorder.count > self.budget:
+            repeated = '; '.join(f'{count}x {sql}' for sql, count in recorder.duplicates()[:5])
+            logger.warning(
+                '%s %s ran %d queries (budget %d) in %.1f ms. Repeated: %s',
+                request.method, request.path, recorder.count, self.budget, recorder.duration * 1000,
+                repeated or 'none',
+            )
+        return response
+
+
+PRIMARY_COOKIE = 'read_primary'
+
+
+class ReplicaRoutingMiddleware:
+    """Sends the catalog reads of GET and HEAD requests to list and detail pages to DATABASE_REPLICA.
+
+    Create, update and delete views, other View classes, function views and every write use the
+    primary, see viewer.routers. After a write the browser reads from the primary for
+    REPLICA_PIN_SECONDS, the pages it is redirected to show the change before the replica has it.
+    Active when DATABASE_REPLICA_URL is set.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'DATABASE_REPLICA', ''):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = use_replica(False)
+        try:
+            # Template responses are rendered before the routing is reset
+            response = self.get_response(request)
+        finally:
+            reset_replica(token)
+        if request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE') and response.status_code < 400:
+            response.set_cookie(
+                PRIMARY_COOKIE, '1', max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 5),
+                secure=settings.SESSION_COOKIE_SECURE, httponly=True, samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            request.method in ('GET', 'HEAD')
+            and PRIMARY_COOKIE not in request.COOKIES
+            and is_read_only_view(getattr(view_func, 'view_class', None))
+        ):
+            use_replica()
@@ -1,6 +1,7 @@
 from django.core.exceptions import ValidationError
 from django.db.models import Model, CharField, DateField, ForeignKey, TextField, SET_NULL, \
-    ManyToManyField, CASCADE, PositiveIntegerField, CheckConstraint, Q, Sum, ImageField, UniqueConstraint
+    ManyToManyField, CASCADE, PositiveIntegerField, CheckConstraint, Q, Sum, ImageField, UniqueConstraint, \
+    OneToOneField, JSONField
 
 from viewer.utils import format_seconds
 
@@ -242,48 +243,15 @@ class Song(Model):
         """
         Vrací dict: kategorie => list of (contributor, [role1, role2, ...])
         """
-        performances = self.performances.select_related('contributor', 'contributor_role')
-        contributors = {}
-
-        for perf in performances:
-            if perf.contributor and perf.contributor_role:
-                category = perf.contributor_role.category
-                role_name = perf.contributor_role.name
-                contributor = perf.contributor
-
-                if category not in contributors:
-                    contributors[category] = []
-
-                # Zkusíme najít, jestli už je contributor v seznamu
-                for i, (existing_contributor, roles) in enumerate(contributors[category]):
-                    if existing_contributor == contributor:
-                        if role_name not in roles:
-                            roles.append(role_name)
-                        break
-                else:
-                    # Pokud tam ještě není, přidáme ho
-                    contributors[category].append((contributor, [role_name]))
-
-        return contributors
+        from viewer.credits import get_song_credits
+        return get_song_credits(self.pk).contributors_by_category
 
     def groups_by_role(self):
         """
         Vrátí dict: role => list of music groups bez duplicit
         """
-        performances = self.performances.select_related('music_group', 'music_group_role')
-        groups = {}
-
-        seen = set()
-        for perf in performances:
-            if perf.music_group and perf.music_group_role:
-                role = perf.music_group_role.name
-                if role not in groups:
-                    groups[role] = []
-                if perf.music_group.id not in seen:
-                    groups[role].append(perf.music_group)
-                    seen.add(perf.music_group.id)
-
-        return groups
+        from viewer.credits import get_song_credits
+        return get_song_credits(self.pk).groups_by_role
 
     def first_album(self):
         return self.albums.first()
@@ -294,22 +262,33 @@ class Song(Model):
     def music_groups(self):
         return self.music_group.all()
 
+    def get_listing(self):
+        """Stored credit strings of the song, computed without storing them when missing.
+
+        Select `listing` to read them with the song.
+        """
+        try:
+            return self.listing
+        except SongListing.DoesNotExist:
+            from viewer.listings import build_song_listing
+            self.listing = build_song_listing(self.pk)
+            return self.listing
+
     @property
     def artists_list(self):
-        return ", ".join(str(artist) for artist in self.artist.all())
+        return self.get_listing().artists
 
     @property
     def music_groups_list(self):
-        return ", ".join(group.name for group in self.music_group.all())
+        return self.get_listing().music_groups
 
     @property
     def album_label(self):
-        count = self.albums.count()
-        return "Album" if count == 1 else "Albums"
+        return "Album" if self.get_listing().album_count == 1 else "Albums"
 
     @property
     def albums_list(self):
-        return ", ".join(album.title for album in self.albums.all())
+        return self.get_listing().albums
 
     @property
     def format_seconds(self):
@@ -383,8 +362,8 @@ class AlbumSong(Model):
         db_table = 'viewer_album_song'
         constraints = [
             UniqueConstraint(fields=['album', 'song'], name='unique_album_song'),
-            # Causing errors when changing AlbumSong Order in ContributorDetailView!
-            # UniqueConstraint(fields=['album', 'order'], name='unique_album_order'),
+            # Reorders must go through apply_track_orders(), which updates in two phases
+            UniqueConstraint(fields=['album', 'order'], name='unique_album_order'),
             CheckConstraint(check=Q(order__gte=1), name='order_gte_1'),
         ]
 
@@ -473,19 +452,77 @@ class Album(Model):
                     seen.add(perf.music_group.id)
         return groups
 
-    def display_creator(self):
-        artist_names = ', '.join(str(artist) for artist in self.artist.all())
-        group_names = ', '.join(group.name for group in self.music_group.all())
+    def get_listing(self):
+        """Stored creator string of the album, computed without storing it when missing.
 
-        if artist_names and group_names:
-            creators = f"{artist_names} / {group_names}"
-        else:
-            creators = artist_names or group_names or "Unknown"
+        Select `listing` to read it with the album.
+        """
+        try:
+            return self.listing
+        except AlbumListing.DoesNotExist:
+            from viewer.listings import build_album_listing
+            self.listing = build_album_listing(self.pk)
+            return self.listing
 
-        return f"{creators}"
+    def display_creator(self):
+        return self.get_listing().creator
 
     def __str__(self):
         return self.title
 
     def __repr__(self):
         return f"Album(title={self.title})"
+
+
+class AlbumSummary(Model):
+    """Precomputed per-album aggregates, kept up to date by signals in viewer/signals.py."""
+    album = OneToOneField(Album, on_delete=CASCADE, related_name='aggregates')
+    total_duration = PositiveIntegerField(null=True, blank=True)
+    genre_ids = JSONField(default=list, blank=True)
+    language_ids = JSONField(default=list, blank=True)
+    # [[category, [[contributor_id, [role names]], ...]], ...] - lists keep the order on every backend
+    contributors_by_category = JSONField(default=list, blank=True)
+    # [[music group role name, [music_group_id, ...]], ...]
+    groups_by_role = JSONField(default=list, blank=True)
+
+    class Meta:
+        db_table = 'viewer_album_summary'
+
+    def __str__(self):
+        return f"Summary of {self.album_id}"
+
+    def __repr__(self):
+        return f"AlbumSummary(album={self.album_id})"
+
+
+class SongListing(Model):
+    """Credit strings shown next to a song in lists, kept up to date by signals in viewer/signals.py."""
+    song = OneToOneField(Song, on_delete=CASCADE, related_name='listing')
+    artists = TextField(blank=True, default='')
+    music_groups = TextField(blank=True, default='')
+    albums = TextField(blank=True, default='')
+    album_count = PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'viewer_song_listing'
+
+    def __str__(self):
+        return f"Listing of {self.song_id}"
+
+    def __repr__(self):
+        return f"SongListing(song={self.song_id})"
+
+
+class AlbumListing(Model):
+    """Creator string shown next to an album in lists, kept up to date by signals in viewer/signals.py."""
+    album = OneToOneField(Album, on_delete=CASCADE, related_name='listing')
+    creator = TextField(blank=True, default='')
+
+    class Meta:
+        db_table = 'viewer_album_listing'
+
+    def __str__(self):
+        return f"Listing of {self.album_id}"
+
+    def __repr__(self):
+        return f"AlbumListing(album={self.album_id})"
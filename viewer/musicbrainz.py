@@ -0,0 +1,115 @@
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class TTLCache:
+    """Small thread-safe LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, maxsize=512, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class MusicBrainzClient:
+    """Client for the MusicBrainz recording search.
+
+    The base URL comes from settings.MUSICBRAINZ_BASE_URL, so a local fake server can stand in
+    for musicbrainz.org in tests and benchmarks. Another implementation can be plugged in
+    with settings.MUSICBRAINZ_CLIENT.
+    """
+
+    def __init__(self, base_url, timeout=5, user_agent="MusicLibrary/1.0 ( your-email@example.com )"):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.user_agent = user_agent
+
+    def search_recordings(self, query, limit=10):
+        # Raises requests.RequestException on network or HTTP errors
+        response = requests.get(
+            f"{self.base_url}/recording",
+            params={"query": query, "fmt": "json", "limit": limit},
+            headers={"User-Agent": self.user_agent},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        data = response.json()
+        return [
+            {
+                "title": rec.get("title"),
+                "artist": rec["artist-credit"][0]["name"] if rec.get("artist-credit") else "Unknown"
+            }
+            for rec in data.get("recordings", [])
+        ]
+
+
+cache = TTLCache(
+    maxsize=getattr(settings, 'MUSICBRAINZ_CACHE_SIZE', 512),
+    ttl=getattr(settings, 'MUSICBRAINZ_CACHE_TTL', 3600),
+)
+
+
+def normalize_query(query):
+    # Cache key: case and whitespace differences do not change MusicBrainz results
+    return ' '.join(query.lower().split())
+
+
+def get_client():
+    client_class = import_string(getattr(settings, 'MUSICBRAINZ_CLIENT', 'viewer.musicbrainz.MusicBrainzClient'))
+    return client_class(
+        base_url=getattr(settings, 'MUSICBRAINZ_BASE_URL', 'https://musicbrainz.org/ws/2'),
+        timeout=getattr(settings, 'MUSICBRAINZ_TIMEOUT', 5),
+    )
+
+
+def cached_external_songs(query):
+    """Return cached MusicBrainz results for the query, or None when they have to be fetched."""
+    return cache.get(normalize_query(query))
+
+
+def lookup_external_songs(query):
+    """Return MusicBrainz results for the query, fetching and caching them on a cache miss."""
+    key = normalize_query(query)
+    if not key:
+        return []
+    songs = cache.get(key)
+    if songs is None:
+        try:
+            songs = get_client().search_recordings(key)
+        except (requests.RequestException, ValueError, KeyError, IndexError):
+            # External API errors are not cached, the next search tries again
+            return []
+        cache.set(key, songs)
+    return songs
@@ -0,0 +1,84 @@
+import contextvars
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.views.generic import TemplateView
+from django.views.generic.detail import BaseDetailView
+from django.views.generic.edit import DeletionMixin, ModelFormMixin, ProcessFormView
+from django.views.generic.list import BaseListView
+
+
+# Pages that only read the catalog, forms and deletes read what they are about to change from the primary
+READ_ONLY_VIEWS = (BaseListView, BaseDetailView, TemplateView)
+WRITE_VIEWS = (ModelFormMixin, DeletionMixin, ProcessFormView)
+# Sessions and users are read from the primary, a replica lagging behind a login would sign the user out
+REPLICA_APPS = {'viewer'}
+
+_replica_reads = contextvars.ContextVar('replica_reads', default=False)
+
+
+def is_read_only_view(view_class):
+    """True for list and detail pages, False for create, update and delete views and plain View classes."""
+    return (
+        view_class is not None
+        and issubclass(view_class, READ_ONLY_VIEWS)
+        and not issubclass(view_class, WRITE_VIEWS)
+    )
+
+
+def use_replica(enabled=True):
+    """Send the catalog reads of the current request or task to the replica, returns a token for reset_replica."""
+    return _replica_reads.set(enabled)
+
+
+def reset_replica(token):
+    _replica_reads.reset(token)
+
+
+def reading_replica():
+    """True while the catalog reads of the current request or task go to the replica.
+
+    A page read from the replica may lag behind the last write, it is not stored in the view
+    and fragment caches and carries no ETag, so the lag does not outlive the request.
+    """
+    return bool(settings.DATABASE_REPLICA) and _replica_reads.get()
+
+
+@contextmanager
+def replica_reads():
+    token = use_replica()
+    try:
+        yield
+    finally:
+        reset_replica(token)
+
+
+class PrimaryReplicaRouter:
+    """Reads inside replica_reads() go to settings.DATABASE_REPLICA, all writes and other reads to the primary.
+
+    ReplicaRoutingMiddleware enables replica reads for the read-only views. Without a replica
+    configured every query goes to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        replica = settings.DATABASE_REPLICA
+        if replica and _replica_reads.get() and model._meta.app_label in REPLICA_APPS:
+            return replica
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Objects loaded from the replica are saved to the primary
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, settings.DATABASE_REPLICA}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema by replication
+        if db == settings.DATABASE_REPLICA:
+            return False
+        return None
@@ -0,0 +1,243 @@
+import re
+
+from django.db import connections, router
+from django.db.models import Q
+
+from viewer.models import Album, Contributor, MusicGroup, Song
+
+
+INDEX_TABLE = 'viewer_search_index'
+
+# Each indexed object gets the row id `pk * len(KINDS) + kind number`, so an object is replaced
+# or removed by its row id without scanning the index
+KINDS = {
+    'song': (0, Song, lambda song: song.title),
+    'album': (1, Album, lambda album: album.title),
+    'contributor': (2, Contributor, lambda c: ' '.join(
+        name for name in (c.stage_name, c.first_name, c.middle_name, c.last_name) if name
+    )),
+    'music_group': (3, MusicGroup, lambda group: group.name),
+}
+KIND_BY_MODEL = {model: kind for kind, (_, model, _) in KINDS.items()}
+
+# Old behavior for database backends without a full-text index
+FALLBACK_LOOKUPS = {
+    'song': lambda q: Q(title__icontains=q),
+    'album': lambda q: Q(title__icontains=q),
+    'contributor': lambda q: Q(stage_name__icontains=q) | Q(first_name__icontains=q) | Q(last_name__icontains=q),
+    'music_group': lambda q: Q(name__icontains=q),
+}
+
+
+def _row_id(kind, pk):
+    return pk * len(KINDS) + KINDS[kind][0]
+
+
+def _terms(query):
+    return re.findall(r'\w+', query.lower())
+
+
+class SQLiteBackend:
+    """FTS5 virtual table, prefix indexes keep the typeahead prefix queries fast."""
+
+    def create(self, cursor):
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {INDEX_TABLE} USING fts5("
+            f"text, prefix='2 3', tokenize='unicode61 remove_diacritics 2')"
+        )
+
+    def upsert(self, cursor, rows):
+        cursor.executemany(f"INSERT OR REPLACE INTO {INDEX_TABLE} (rowid, text) VALUES (%s, %s)", rows)
+
+    def delete(self, cursor, row_id):
+        cursor.execute(f"DELETE FROM {INDEX_TABLE} WHERE rowid = %s", [row_id])
+
+    def clear(self, cursor):
+        cursor.execute(f"DELETE FROM {INDEX_TABLE}")
+
+    def search(self, cursor, terms, kind_number, limit):
+        # Every term is a quoted prefix query, terms are combined with AND
+        match = ' '.join(f'"{term}"*' for term in terms)
+        sql = f"SELECT rowid FROM {INDEX_TABLE} WHERE {INDEX_TABLE} MATCH %s"
+        params = [match]
+        if kind_number is not None:
+            sql += f" AND rowid %% {len(KINDS)} = %s"
+            params.append(kind_number)
+        sql += f" ORDER BY bm25({INDEX_TABLE})"
+        if limit is not None:
+            sql += " LIMIT %s"
+            params.append(limit)
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+class PostgreSQLBackend:
+    """Plain table with a GIN indexed tsvector column."""
+
+    def create(self, cursor):
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {INDEX_TABLE} ("
+            f"id bigint PRIMARY KEY, text text NOT NULL, document tsvector NOT NULL)"
+        )
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {INDEX_TABLE}_document ON {INDEX_TABLE} USING GIN (document)"
+        )
+
+    def upsert(self, cursor, rows):
+        cursor.executemany(
+            f"INSERT INTO {INDEX_TABLE} (id, text, document) VALUES (%s, %s, to_tsvector('simple', %s)) "
+            f"ON CONFLICT (id) DO UPDATE SET text = EXCLUDED.text, document = EXCLUDED.document",
+            [(row_id, text, text) for row_id, text in rows],
+        )
+
+    def delete(self, cursor, row_id):
+        cursor.execute(f"DELETE FROM {INDEX_TABLE} WHERE id = %s", [row_id])
+
+    def clear(self, cursor):
+        cursor.execute(f"TRUNCATE {INDEX_TABLE}")
+
+    def search(self, cursor, terms, kind_number, limit):
+        sql = (
+            f"SELECT id FROM {INDEX_TABLE}, to_tsquery('simple', %s) query "
+            f"WHERE document @@ query"
+        )
+        params = [' & '.join(f'{term}:*' for term in terms)]
+        if kind_number is not None:
+            sql += f" AND id %% {len(KINDS)} = %s"
+            params.append(kind_number)
+        sql += " ORDER BY ts_rank(document, query) DESC, id"
+        if limit is not None:
+            sql += " LIMIT %s"
+            params.append(limit)
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+BACKENDS = {
+    'sqlite': SQLiteBackend(),
+    'postgresql': PostgreSQLBackend(),
+}
+
+
+class SearchIndex:
+    """Full-text index over song and album titles, contributor names and music group names.
+
+    The table is created outside the ORM (post_migrate or on first use) and kept up to date
+    by the signals in viewer.signals. Database backends without a full-text engine fall back
+    to icontains lookups.
+    """
+
+    def __init__(self):
+        self._installed = set()
+
+    def _backend(self, using):
+        return BACKENDS.get(connections[using].vendor)
+
+    def _ensure(self, using):
+        connection = connections[using]
+        key = (using, connection.settings_dict['NAME'])
+        if key in self._installed:
+            return
+        if INDEX_TABLE in connection.introspection.table_names():
+            self._installed.add(key)
+        else:
+            self.install(using)
+
+    def install(self, using='default'):
+        """Create the index table if it is missing and fill it from the database.
+
+        An existing table is kept as it is, the signals keep it up to date and
+        rebuild_search_index refills it.
+        """
+        backend = self._backend(using)
+        if backend is None:
+            return
+        created = INDEX_TABLE not in connections[using].introspection.table_names()
+        self._create(backend, using)
+        if created:
+            self._fill(backend, using)
+
+    def rebuild(self, using='default', chunk_size=2000):
+        """Create the index table if it is missing and refill it from the database."""
+        backend = self._backend(using)
+        if backend is None:
+            return
+        self._create(backend, using)
+        self._fill(backend, using, chunk_size)
+
+    def _create(self, backend, using):
+        connection = connections[using]
+        with connection.cursor() as cursor:
+            backend.create(cursor)
+        self._installed.add((using, connection.settings_dict['NAME']))
+
+    def _fill(self, backend, using, chunk_size=2000):
+        with connections[using].cursor() as cursor:
+            backend.clear(cursor)
+            for kind, (_, model, text) in KINDS.items():
+                rows = []
+                for obj in model.objects.using(using).iterator(chunk_size=chunk_size):
+                    rows.append((_row_id(kind, obj.pk), text(obj)))
+                    if len(rows) >= chunk_size:
+                        backend.upsert(cursor, rows)
+                        rows = []
+                if rows:
+                    backend.upsert(cursor, rows)
+
+    def update(self, obj):
+        kind = KIND_BY_MODEL[type(obj)]
+        using = obj._state.db or router.db_for_write(type(obj))
+        backend = self._backend(using)
+        if backend is None:
+            return
+        self._ensure(using)
+        with connections[using].cursor() as cursor:
+            backend.upsert(cursor, [(_row_id(kind, obj.pk), KINDS[kind][2](obj))])
+
+    def update_many(self, objs, using='default', chunk_size=2000):
+        """Index objects written with bulk_create, which sends no post_save signal."""
+        backend = self._backend(using)
+        if backend is None:
+            return
+        self._ensure(using)
+        rows = []
+        for obj in objs:
+            kind = KIND_BY_MODEL[type(obj)]
+            rows.append((_row_id(kind, obj.pk), KINDS[kind][2](obj)))
+        with connections[using].cursor() as cursor:
+            for start in range(0, len(rows), chunk_size):
+                backend.upsert(cursor, rows[start:start + chunk_size])
+
+    def remove(self, model, pk, using='default'):
+        backend = self._backend(using)
+        if backend is None:
+            return
+        self._ensure(using)
+        with connections[using].cursor() as cursor:
+            backend.delete(cursor, _row_id(KIND_BY_MODEL[model], pk))
+
+    def search_ids(self, query, kind, limit=None, using=None):
+        """Return primary keys of the given kind matching all query terms as prefixes, best match first."""
+        model = KINDS[kind][1]
+        using = using or router.db_for_read(model)
+        terms = _terms(query)
+        if not terms:
+            return []
+        backend = self._backend(using)
+        if backend is None:
+            pks = model.objects.using(using).filter(FALLBACK_LOOKUPS[kind](query)).values_list('pk', flat=True)
+            return list(pks[:limit] if limit is not None else pks)
+        self._ensure(using)
+        with connections[using].cursor() as cursor:
+            row_ids = backend.search(cursor, terms, KINDS[kind][0], limit)
+        return [row_id // len(KINDS) for row_id in row_ids]
+
+    def search(self, query, kind, limit=None, using=None):
+        """Return model instances of the given kind in rank order."""
+        model = KINDS[kind][1]
+        pks = self.search_ids(query, kind, limit=limit, using=using)
+        objects = model.objects.using(using or router.db_for_read(model)).in_bulk(pks)
+        return [objects[pk] for pk in pks if pk in objects]
+
+
+search_index = SearchIndex()
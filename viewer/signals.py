@@ -0,0 +1,391 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, post_migrate, pre_delete, m2m_changed
+from django.dispatch import receiver
+
+from viewer.models import (
+    Album, AlbumSong, Contributor, ContributorRole, Country, Genre, Language, MusicGroup, MusicGroupMembership,
+    MusicGroupRole, Song, SongPerformance,
+)
+from viewer.covers import cover_index
+from viewer.credits import invalidate_all_song_credits, invalidate_song_credits
+from viewer.listings import refresh_album_listings, refresh_song_listings
+from viewer.search import search_index
+from viewer.summaries import refresh_album_summaries
+from viewer.thumbnails import generate_thumbnails
+from viewer.typeahead import typeahead_index
+from viewer.viewcache import bump_object_versions, bump_versions, invalidate_after_commit
+
+
+def _album_ids_for_songs(song_ids):
+    return AlbumSong.objects.filter(song_id__in=song_ids).values_list('album_id', flat=True)
+
+
+def _skip(kwargs):
+    # Fixture loading (raw saves) leaves summaries to be built lazily on first access
+    if kwargs.get('raw'):
+        return True
+    origin = kwargs.get('origin')
+    # Rows removed by cascade from a deleted album must not recreate its summary
+    if isinstance(origin, Album):
+        return True
+    return getattr(origin, 'model', None) is Album
+
+
+# Album summaries
+@receiver([post_save, post_delete], sender=AlbumSong)
+def album_song_changed(sender, instance, **kwargs):
+    if _skip(kwargs):
+        return
+    refresh_album_summaries([instance.album_id])
+
+
+@receiver(post_save, sender=Song)
+def song_saved(sender, instance, created, **kwargs):
+    if _skip(kwargs):
+        return
+    # Duration or language may have changed, a new song cannot be on any album yet
+    if not created:
+        refresh_album_summaries(_album_ids_for_songs([instance.pk]))
+
+
+@receiver(m2m_changed, sender=Song.genre.through)
+def song_genres_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        # Genre cleared from the genre side, remember its songs before the links are gone
+        instance._cleared_song_ids = list(instance.song_set.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        song_ids = [instance.pk]
+    elif action == 'post_clear':
+        song_ids = getattr(instance, '_cleared_song_ids', [])
+    else:
+        song_ids = pk_set
+    refresh_album_summaries(_album_ids_for_songs(song_ids))
+
+
+@receiver([post_save, post_delete], sender=SongPerformance)
+def song_performance_changed(sender, instance, **kwargs):
+    if _skip(kwargs):
+        return
+    refresh_album_summaries(_album_ids_for_songs([instance.song_id]))
+
+
+@receiver(post_save, sender=ContributorRole)
+def contributor_role_saved(sender, instance, created, **kwargs):
+    # Role names and categories are stored in the summaries
+    if not created and not _skip(kwargs):
+        song_ids = SongPerformance.objects.filter(contributor_role=instance).values_list('song_id', flat=True)
+        refresh_album_summaries(_album_ids_for_songs(song_ids))
+
+
+@receiver(post_save, sender=MusicGroupRole)
+def music_group_role_saved(sender, instance, created, **kwargs):
+    if not created and not _skip(kwargs):
+        song_ids = SongPerformance.objects.filter(music_group_role=instance).values_list('song_id', flat=True)
+        refresh_album_summaries(_album_ids_for_songs(song_ids))
+
+
+# Credit strings of list pages, only stored listings are updated, missing ones are computed on read
+SONG_LISTING_LINKS = (Song.artist.through, Song.music_group.through)
+ALBUM_LISTING_LINKS = (Album.artist.through, Album.music_group.through)
+
+
+@receiver(post_save, sender=Song)
+def song_listing_saved(sender, instance, created, **kwargs):
+    if created and not kwargs.get('raw'):
+        refresh_song_listings([instance.pk])
+
+
+@receiver(post_save, sender=Album)
+def album_listing_saved(sender, instance, created, **kwargs):
+    if kwargs.get('raw'):
+        return
+    if created:
+        refresh_album_listings([instance.pk])
+    else:
+        # Title and release date are in the album strings of its songs
+        refresh_song_listings(AlbumSong.objects.filter(album=instance).values_list('song_id', flat=True), create=False)
+
+
+# Links naming a contributor or music group in song and album listings
+LISTED_NAME_LINKS = {
+    Contributor: ('contributor_id', Song.artist.through, Album.artist.through),
+    MusicGroup: ('musicgroup_id', Song.music_group.through, Album.music_group.through),
+}
+
+
+def _listed_owner_ids(instance):
+    field, song_links, album_links = LISTED_NAME_LINKS[type(instance)]
+    song_ids = list(song_links.objects.filter(**{field: instance.pk}).values_list('song_id', flat=True))
+    album_ids = list(album_links.objects.filter(**{field: instance.pk}).values_list('album_id', flat=True))
+    return song_ids, album_ids
+
+
+@receiver(post_save, sender=Contributor)
+@receiver(post_save, sender=MusicGroup)
+def listed_name_saved(sender, instance, created, **kwargs):
+    if created or kwargs.get('raw'):
+        return
+    song_ids, album_ids = _listed_owner_ids(instance)
+    refresh_song_listings(song_ids, create=False)
+    refresh_album_listings(album_ids, create=False)
+
+
+@receiver(pre_delete, sender=Contributor)
+@receiver(pre_delete, sender=MusicGroup)
+def listed_name_deleting(sender, instance, **kwargs):
+    # Links of auto-created through tables are removed without signals, remember their owners
+    instance._listed_owner_ids = _listed_owner_ids(instance)
+
+
+@receiver(post_delete, sender=Contributor)
+@receiver(post_delete, sender=MusicGroup)
+def listed_name_deleted(sender, instance, **kwargs):
+    song_ids, album_ids = getattr(instance, '_listed_owner_ids', ([], []))
+    refresh_song_listings(song_ids, create=False)
+    refresh_album_listings(album_ids, create=False)
+
+
+@receiver([post_save, post_delete], sender=AlbumSong)
+def listing_track_changed(sender, instance, **kwargs):
+    if not kwargs.get('raw'):
+        refresh_song_listings([instance.song_id], create=False)
+
+
+@receiver(m2m_changed)
+def listing_links_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if sender in SONG_LISTING_LINKS:
+        refresh = refresh_song_listings
+    elif sender in ALBUM_LISTING_LINKS:
+        refresh = refresh_album_listings
+    else:
+        return
+    if reverse and action == 'pre_clear':
+        # Cleared from the contributor or music group side, the owners are only known before
+        owner = 'song_id' if sender in SONG_LISTING_LINKS else 'album_id'
+        related = next(field.attname for field in sender._meta.concrete_fields if field.related_model is type(instance))
+        links = sender.objects.filter(**{related: instance.pk})
+        instance._cleared_owner_ids = list(links.values_list(owner, flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if not reverse:
+            owner_ids = [instance.pk]
+        elif action == 'post_clear':
+            owner_ids = getattr(instance, '_cleared_owner_ids', [])
+        else:
+            owner_ids = pk_set
+        refresh(owner_ids, create=False)
+
+
+# Home page cover index
+@receiver(post_save, sender=Album)
+def album_saved(sender, instance, using, **kwargs):
+    if kwargs.get('raw'):
+        cover_index.invalidate()
+        return
+    cover_index.update(instance)
+    # Derivatives of a new upload are resized after commit, outside the transaction, nothing is
+    # written when they are up to date
+    transaction.on_commit(lambda: _cover_saved(instance), using=using)
+
+
+def _cover_saved(album):
+    if generate_thumbnails(album.cover_image):
+        cover_index.update(album)
+
+
+@receiver(post_delete, sender=Album)
+def album_deleted(sender, instance, **kwargs):
+    cover_index.remove(instance.pk)
+
+
+# Full-text search index
+@receiver(post_migrate)
+def create_search_index(sender, app_config, using, **kwargs):
+    if app_config.label == 'viewer':
+        search_index.install(using)
+
+
+@receiver(post_save, sender=Song)
+@receiver(post_save, sender=Album)
+@receiver(post_save, sender=Contributor)
+@receiver(post_save, sender=MusicGroup)
+def searchable_saved(sender, instance, **kwargs):
+    # Only the object's own columns are indexed, so raw fixture saves are indexed too
+    search_index.update(instance)
+
+
+@receiver(post_delete, sender=Song)
+@receiver(post_delete, sender=Album)
+@receiver(post_delete, sender=Contributor)
+@receiver(post_delete, sender=MusicGroup)
+def searchable_deleted(sender, instance, using, **kwargs):
+    search_index.remove(sender, instance.pk, using)
+
+
+# Typeahead suggestions, the in-memory index must not see rows of rolled back transactions
+TYPEAHEAD_MODELS = [Song, Album, Contributor, MusicGroup, Genre, Country, Language]
+
+
+@receiver(post_save)
+def suggestion_saved(sender, instance, using, **kwargs):
+    if sender in TYPEAHEAD_MODELS:
+        transaction.on_commit(lambda: typeahead_index.update(instance), using=using)
+
+
+@receiver(post_delete)
+def suggestion_deleted(sender, instance, using, **kwargs):
+    if sender in TYPEAHEAD_MODELS:
+        pk = instance.pk
+        transaction.on_commit(lambda: typeahead_index.remove(sender, pk), using=using)
+
+
+# Per-song credits cache
+@receiver([post_save, post_delete], sender=SongPerformance)
+def song_credits_changed(sender, instance, using, **kwargs):
+    song_id = instance.song_id
+    invalidate_after_commit(lambda: invalidate_song_credits(song_id), using)
+
+
+@receiver(post_save, sender=Song)
+def song_credits_created(sender, instance, created, using, **kwargs):
+    # A new song may reuse the primary key of a deleted one
+    if created:
+        song_id = instance.pk
+        invalidate_after_commit(lambda: invalidate_song_credits(song_id), using)
+
+
+@receiver([post_save, post_delete], sender=Contributor)
+@receiver([post_save, post_delete], sender=MusicGroup)
+@receiver([post_save, post_delete], sender=ContributorRole)
+@receiver([post_save, post_delete], sender=MusicGroupRole)
+def credited_object_changed(sender, using, **kwargs):
+    # Names and roles are stored inside the cached credits of every song they appear on
+    invalidate_after_commit(invalidate_all_song_credits, using)
+
+
+# Cached list pages, versioned per model
+@receiver([post_save, post_delete])
+def cached_model_changed(sender, using, **kwargs):
+    if sender._meta.app_label == 'viewer':
+        bump_versions(sender, using=using)
+
+
+@receiver(m2m_changed)
+def cached_links_changed(sender, action, using, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear') and sender._meta.app_label == 'viewer':
+        bump_versions(sender, using=using)
+
+
+# Conditional detail pages of signed in users depend on their permissions
+PERMISSION_USER_FIELDS = {'is_active', 'is_staff', 'is_superuser'}
+
+
+@receiver([post_save, post_delete])
+def permissions_changed(sender, using, **kwargs):
+    if sender is get_user_model():
+        # A new user has no pages yet, and logging in only saves last_login
+        update_fields = kwargs.get('update_fields')
+        if kwargs.get('created') or (update_fields is not None and not PERMISSION_USER_FIELDS & update_fields):
+            return
+    elif sender not in (Group, Permission):
+        return
+    bump_versions(Permission, using=using)
+
+
+@receiver(m2m_changed)
+def permission_links_changed(sender, action, using, **kwargs):
+    User = get_user_model()
+    if action in ('post_add', 'post_remove', 'post_clear') and sender in (
+        User.groups.through, User.user_permissions.through, Group.permissions.through,
+    ):
+        bump_versions(Permission, using=using)
+
+
+# Detail page fragments, versioned per song, album, contributor and music group
+FRAGMENT_MODELS = (Song, Album, Contributor, MusicGroup)
+
+
+def _fragment_objects(instance):
+    """The instance itself and the objects its foreign keys point to, e.g. the song and contributor of a credit."""
+    model = type(instance)
+    objects = [(model, instance.pk)] if model in FRAGMENT_MODELS else []
+    for field in model._meta.concrete_fields:
+        if field.is_relation and field.related_model in FRAGMENT_MODELS:
+            value = getattr(instance, field.attname)
+            if value is not None:
+                objects.append((field.related_model, value))
+    if model is SongPerformance:
+        # Album pages list the credits of their songs
+        objects += [(Album, album_id) for album_id in _album_ids_for_songs([instance.song_id])]
+    return objects
+
+
+def _fragment_neighbors(instance):
+    """Detail pages naming a song, album, contributor or music group, refreshed when it is renamed."""
+    pk = instance.pk
+    links = {
+        Song: [
+            (Album, AlbumSong.objects.filter(song_id=pk), 'album_id'),
+            (Contributor, Song.artist.through.objects.filter(song_id=pk), 'contributor_id'),
+            (MusicGroup, Song.music_group.through.objects.filter(song_id=pk), 'musicgroup_id'),
+            (Contributor, SongPerformance.objects.filter(song_id=pk, contributor__isnull=False), 'contributor_id'),
+            (MusicGroup, SongPerformance.objects.filter(song_id=pk, music_group__isnull=False), 'music_group_id'),
+        ],
+        Album: [
+            (Song, AlbumSong.objects.filter(album_id=pk), 'song_id'),
+            (Contributor, Album.artist.through.objects.filter(album_id=pk), 'contributor_id'),
+            (MusicGroup, Album.music_group.through.objects.filter(album_id=pk), 'musicgroup_id'),
+        ],
+        Contributor: [
+            (Song, Song.artist.through.objects.filter(contributor_id=pk), 'song_id'),
+            (Song, SongPerformance.objects.filter(contributor_id=pk), 'song_id'),
+            (Album, Album.artist.through.objects.filter(contributor_id=pk), 'album_id'),
+            (Album, AlbumSong.objects.filter(song__performances__contributor_id=pk), 'album_id'),
+            (MusicGroup, MusicGroupMembership.objects.filter(member_id=pk), 'music_group_id'),
+        ],
+        MusicGroup: [
+            (Song, Song.music_group.through.objects.filter(musicgroup_id=pk), 'song_id'),
+            (Song, SongPerformance.objects.filter(music_group_id=pk), 'song_id'),
+            (Album, Album.music_group.through.objects.filter(musicgroup_id=pk), 'album_id'),
+            (Album, AlbumSong.objects.filter(song__performances__music_group_id=pk), 'album_id'),
+            (Contributor, MusicGroupMembership.objects.filter(music_group_id=pk), 'member_id'),
+        ],
+    }
+    for model, queryset, field in links[type(instance)]:
+        for related_pk in queryset.values_list(field, flat=True).distinct():
+            yield model, related_pk
+
+
+@receiver([post_save, post_delete])
+def fragment_object_changed(sender, instance, using, **kwargs):
+    if sender._meta.app_label != 'viewer':
+        return
+    objects = _fragment_objects(instance)
+    # A new object is on no other page yet, rows removed with a deleted object send their own signals
+    if sender in FRAGMENT_MODELS and kwargs.get('created') is False and not kwargs.get('raw'):
+        objects += _fragment_neighbors(instance)
+    bump_object_versions(objects, using)
+
+
+@receiver(m2m_changed)
+def fragment_links_changed(sender, instance, action, reverse, model, pk_set, using, **kwargs):
+    if sender._meta.app_label != 'viewer':
+        return
+    if action == 'pre_clear' and model in FRAGMENT_MODELS:
+        # The other side of cleared links is only known before they are removed
+        source, target = (
+            next(field.attname for field in sender._meta.concrete_fields if field.related_model is related)
+            for related in (type(instance), model)
+        )
+        linked = sender.objects.using(using).filter(**{source: instance.pk}).values_list(target, flat=True)
+        bump_object_versions(((model, pk) for pk in linked), using)
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    objects = _fragment_objects(instance)
+    if model in FRAGMENT_MODELS and pk_set:
+        objects += [(model, pk) for pk in pk_set]
+    bump_object_versions(objects, using)
@@ -0,0 +1,205 @@
+import heapq
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS
+
+from viewer.models import (
+    Album, AlbumSong, AlbumSummary, Contributor, Genre, Language, MusicGroup, Song, SongPerformance,
+)
+from viewer.utils import format_seconds
+from viewer.viewcache import bump_versions
+
+
+CHUNK_SIZE = 500
+SUMMARY_FIELDS = ['total_duration', 'genre_ids', 'language_ids', 'contributors_by_category', 'groups_by_role']
+
+
+def _summary_values(tracks, genre_links, languages, performances):
+    """Field values of one summary from the album's (song, duration) tracks and its songs' rows."""
+    durations = [duration for _, duration in tracks if duration is not None]
+    total = sum(durations) if durations else None
+
+    # Single pass over all performances of the album, keeping the order of the first appearance
+    contributors = {}
+    groups = {}
+    seen_groups = set()
+    for _, contributor_id, category, role_name, group_id, group_role in performances:
+        if contributor_id and role_name:
+            roles = contributors.setdefault(category, {}).setdefault(contributor_id, set())
+            roles.add(role_name)
+        elif group_id and group_role:
+            groups.setdefault(group_role, [])
+            if group_id not in seen_groups:
+                groups[group_role].append(group_id)
+                seen_groups.add(group_id)
+
+    return {
+        'total_duration': total,
+        'genre_ids': sorted(set(genre_links)),
+        'language_ids': sorted(set(languages)),
+        'contributors_by_category': [
+            [category, [[contributor_id, sorted(roles)] for contributor_id, roles in contribs.items()]]
+            for category, contribs in contributors.items()
+        ],
+        'groups_by_role': [[role, group_ids] for role, group_ids in groups.items()],
+    }
+
+
+def _build_chunk(album_ids, using):
+    album_ids = set(Album.objects.using(using).filter(pk__in=album_ids).values_list('pk', flat=True))
+    if not album_ids:
+        return {}
+    tracks = AlbumSong.objects.using(using).filter(album_id__in=album_ids)
+    song_ids = tracks.values('song_id')
+
+    tracks_by_album = defaultdict(list)
+    songs_by_album = defaultdict(set)
+    for album_id, song_id, duration in tracks.values_list('album_id', 'song_id', 'song__duration'):
+        tracks_by_album[album_id].append((song_id, duration))
+        songs_by_album[album_id].add(song_id)
+    genres_by_song = defaultdict(list)
+    for song_id, genre_id in Song.genre.through.objects.using(using).filter(song_id__in=song_ids).values_list(
+        'song_id', 'genre_id',
+    ):
+        genres_by_song[song_id].append(genre_id)
+    language_by_song = dict(
+        Song.objects.using(using).filter(pk__in=song_ids, language__isnull=False).values_list('pk', 'language_id')
+    )
+    # Numbered in the default order, an album merges the performances of its songs back into it
+    performances_by_song = defaultdict(list)
+    performances = SongPerformance.objects.using(using).filter(song_id__in=song_ids).values_list(
+        'song_id', 'contributor_id', 'contributor_role__category', 'contributor_role__name',
+        'music_group_id', 'music_group_role__name',
+    )
+    for number, row in enumerate(performances):
+        performances_by_song[row[0]].append((number, row))
+
+    stored = {summary.album_id: summary for summary in AlbumSummary.objects.using(using).filter(album_id__in=album_ids)}
+    summaries, creates, updates = {}, [], []
+    for album_id in album_ids:
+        songs = songs_by_album[album_id]
+        values = _summary_values(
+            tracks_by_album[album_id],
+            [genre_id for song_id in songs for genre_id in genres_by_song[song_id]],
+            [language_by_song[song_id] for song_id in songs if song_id in language_by_song],
+            [row for _, row in heapq.merge(*(performances_by_song[song_id] for song_id in songs))],
+        )
+        summary = stored.get(album_id)
+        if summary is None:
+            summary = AlbumSummary(album_id=album_id, **values)
+            creates.append(summary)
+        else:
+            for field, value in values.items():
+                setattr(summary, field, value)
+            updates.append(summary)
+        summaries[album_id] = summary
+    if creates:
+        # A concurrent request may have stored the same summary first
+        AlbumSummary.objects.using(using).bulk_create(creates, ignore_conflicts=True)
+    if updates:
+        AlbumSummary.objects.using(using).bulk_update(updates, SUMMARY_FIELDS)
+    return summaries
+
+
+def build_album_summaries(album_ids, using=DEFAULT_DB_ALIAS):
+    """Recompute and store the AlbumSummary rows of the given albums, a few queries per 500 albums.
+
+    Returns the summaries by album id, albums that no longer exist are skipped.
+    """
+    album_ids = sorted(set(album_ids))
+    summaries = {}
+    for start in range(0, len(album_ids), CHUNK_SIZE):
+        summaries.update(_build_chunk(album_ids[start:start + CHUNK_SIZE], using))
+    if summaries:
+        # Neither bulk statement sends signals
+        bump_versions(AlbumSummary, using=using)
+    return summaries
+
+
+def build_album_summary(album_id, using=DEFAULT_DB_ALIAS):
+    """Recompute and store the AlbumSummary row for one album, returns the saved summary."""
+    return build_album_summaries([album_id], using)[album_id]
+
+
+_deferred = threading.local()
+
+
+@contextmanager
+def deferred_album_summaries():
+    """Collect summary refreshes inside the block and rebuild each album once when it exits."""
+    if getattr(_deferred, 'album_ids', None) is not None:
+        # Nested block, the outermost one rebuilds
+        yield
+        return
+    # Album ids per database alias
+    _deferred.album_ids = defaultdict(set)
+    try:
+        yield
+        album_ids = _deferred.album_ids
+    finally:
+        _deferred.album_ids = None
+    for using, ids in album_ids.items():
+        refresh_album_summaries(ids, using)
+
+
+def refresh_album_summaries(album_ids, using=DEFAULT_DB_ALIAS):
+    """Rebuild summaries of the given albums, silently skipping albums that no longer exist."""
+    pending = getattr(_deferred, 'album_ids', None)
+    if pending is not None:
+        pending[using].update(album_ids)
+        return
+    build_album_summaries(album_ids, using)
+
+
+def get_album_summary(album):
+    """Return the stored summary of the album, building it on first access."""
+    try:
+        return AlbumSummary.objects.get(album=album)
+    except AlbumSummary.DoesNotExist:
+        return build_album_summary(album.pk)
+
+
+# Keys of album_summary_context, for building it lazily
+ALBUM_SUMMARY_KEYS = (
+    'total_duration', 'genres', 'genre_label', 'languages', 'language_label', 'contributors_by_category',
+    'groups_by_role',
+)
+
+
+def album_summary_context(summary):
+    """Resolve the ids stored in a summary into model instances for the album template."""
+    contributor_ids = {
+        contributor_id
+        for _, contribs in summary.contributors_by_category
+        for contributor_id, _ in contribs
+    }
+    group_ids = {group_id for _, role_group_ids in summary.groups_by_role for group_id in role_group_ids}
+
+    genres = list(Genre.objects.filter(pk__in=summary.genre_ids).order_by('name'))
+    languages = list(Language.objects.filter(pk__in=summary.language_ids).order_by('name'))
+    contributors = Contributor.objects.in_bulk(contributor_ids) if contributor_ids else {}
+    groups = MusicGroup.objects.in_bulk(group_ids) if group_ids else {}
+
+    contributors_by_category = {}
+    for category, contribs in summary.contributors_by_category:
+        contributors_by_category[category] = [
+            (contributors[contributor_id], roles)
+            for contributor_id, roles in contribs
+            if contributor_id in contributors
+        ]
+
+    groups_by_role = {}
+    for role, role_group_ids in summary.groups_by_role:
+        groups_by_role[role] = [groups[group_id] for group_id in role_group_ids if group_id in groups]
+
+    return {
+        'total_duration': format_seconds(summary.total_duration) if summary.total_duration else None,
+        'genres': genres,
+        'genre_label': "Genre" if len(genres) == 1 else "Genres",
+        'languages': languages,
+        'language_label': "Language" if len(languages) == 1 else "Languages",
+        'contributors_by_category': contributors_by_category,
+        'groups_by_role': groups_by_role,
+    }
@@ -0,0 +1,188 @@
+import datetime
+import itertools
+import random
+
+from viewer.imports import CatalogBatch
+from viewer.models import Contributor, ContributorRole, Country, Genre, Language, MusicGroup, MusicGroupRole
+
+
+COUNTRIES = ['Czechia', 'Slovakia', 'United Kingdom', 'United States', 'Germany', 'France', 'Sweden', 'Japan',
+             'Canada', 'Australia', 'Brazil', 'Poland', 'Italy', 'Spain', 'Ireland', 'Norway']
+LANGUAGES = ['English', 'Czech', 'Slovak', 'German', 'French', 'Spanish', 'Swedish', 'Japanese', 'Polish', 'Italian']
+GENRES = ['Rock', 'Pop', 'Jazz', 'Blues', 'Folk', 'Metal', 'Punk', 'Hip Hop', 'Electronic', 'Classical', 'Country',
+          'Reggae', 'Soul', 'Funk', 'Indie', 'Alternative', 'Ambient', 'Techno', 'House', 'Disco']
+CONTRIBUTOR_ROLES = [('Singer', 'performer'), ('Guitarist', 'performer'), ('Bassist', 'performer'),
+                     ('Drummer', 'performer'), ('Keyboardist', 'performer'), ('Songwriter', 'writer'),
+                     ('Lyricist', 'writer'), ('Composer', 'writer'), ('Producer', 'producer'),
+                     ('Mixing Engineer', 'producer'), ('Publisher', 'publisher')]
+MUSIC_GROUP_ROLES = ['Band', 'Backing Band', 'Orchestra', 'Choir']
+
+FIRST_NAMES = ['Adam', 'Anna', 'David', 'Eva', 'Jakub', 'Jana', 'John', 'Karel', 'Lucie', 'Martin', 'Mary',
+               'Michael', 'Petra', 'Paul', 'Sarah', 'Tomas', 'Zuzana', 'George', 'Emma', 'Oliver']
+LAST_NAMES = ['Novak', 'Svoboda', 'Dvorak', 'Cerny', 'Smith', 'Jones', 'Brown', 'Taylor', 'Wilson', 'Evans',
+              'Horak', 'Marek', 'Walker', 'White', 'Green', 'Hall', 'Wood', 'Kral', 'Benes', 'Fiala']
+WORDS = ['love', 'night', 'heart', 'fire', 'summer', 'rain', 'river', 'city', 'dream', 'light', 'shadow', 'road',
+         'home', 'ocean', 'star', 'stone', 'wild', 'blue', 'golden', 'silent', 'broken', 'electric', 'midnight',
+         'morning', 'winter', 'echo', 'mirror', 'paper', 'glass', 'thunder', 'velvet', 'crystal', 'neon', 'ghost',
+         'island', 'garden', 'highway', 'desert', 'storm', 'sugar']
+
+
+class Skewed:
+    """Zipf-like choice over a sequence, the first items are picked far more often than the tail.
+
+    A few contributors, groups and genres get most of the credits, like in a real catalog.
+    """
+
+    def __init__(self, rng, items, exponent):
+        self.rng = rng
+        self.items = list(items)
+        self.weights = list(itertools.accumulate(1 / (rank + 1) ** exponent for rank in range(len(self.items))))
+
+    def pick(self, count=1):
+        if not self.items:
+            return []
+        picked = self.rng.choices(self.items, cum_weights=self.weights, k=count)
+        return list(dict.fromkeys(picked))  # drop repeats, keep order
+
+
+def ensure_lookups(using='default'):
+    """Create the countries, languages, genres and roles the generated rows refer to by name."""
+    for model, names in ((Country, COUNTRIES), (Language, LANGUAGES), (Genre, GENRES),
+                         (MusicGroupRole, MUSIC_GROUP_ROLES)):
+        existing = set(model.objects.using(using).filter(name__in=names).values_list('name', flat=True))
+        model.objects.using(using).bulk_create([model(name=name) for name in names if name not in existing])
+    existing = set(ContributorRole.objects.using(using).values_list('name', flat=True))
+    ContributorRole.objects.using(using).bulk_create([
+        ContributorRole(name=name, category=category) for name, category in CONTRIBUTOR_ROLES if name not in existing
+    ])
+
+
+class CatalogGenerator:
+    """Writes a synthetic catalog through the bulk catalog importer, so derived data is refreshed as for
+    any other import. Counts, skew and seed are configurable, the same seed gives the same catalog."""
+
+    def __init__(self, songs=1000, albums=None, contributors=None, music_groups=None, credits_per_song=3,
+                 skew=1.1, seed=0, using='default', batch_size=2000, chunk_size=500):
+        self.songs = songs
+        self.albums = songs // 10 if albums is None else albums
+        self.contributors = max(songs // 5, 1) if contributors is None else contributors
+        self.music_groups = max(songs // 20, 1) if music_groups is None else music_groups
+        self.credits_per_song = credits_per_song
+        self.skew = skew
+        self.rng = random.Random(seed)
+        self.using = using
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.created = {}
+
+    def words(self, low, high):
+        return ' '.join(self.rng.choice(WORDS) for _ in range(self.rng.randint(low, high)))
+
+    def date(self, first_year, last_year):
+        start = datetime.date(first_year, 1, 1)
+        days = (datetime.date(last_year, 12, 31) - start).days
+        return (start + datetime.timedelta(days=self.rng.randint(0, days))).isoformat()
+
+    def save(self, data):
+        batch = CatalogBatch(data, self.using)
+        batch.validate()
+        for section, count in batch.save(self.chunk_size).items():
+            self.created[section] = self.created.get(section, 0) + count
+        return batch
+
+    def generate(self, progress=None):
+        ensure_lookups(self.using)
+        # Numbered after the existing rows, stage names and group names stay unique across repeated runs
+        contributor_offset = Contributor.objects.using(self.using).count()
+        group_offset = MusicGroup.objects.using(self.using).count()
+
+        contributor_ids = []
+        for start in range(0, self.contributors, self.batch_size):
+            rows = [self.contributor_row(contributor_offset + index)
+                    for index in range(start, min(start + self.batch_size, self.contributors))]
+            contributor_ids += [contributor.pk for contributor in self.save({'contributors': rows}).contributors]
+        group_ids = []
+        for start in range(0, self.music_groups, self.batch_size):
+            rows = [self.music_group_row(group_offset + index)
+                    for index in range(start, min(start + self.batch_size, self.music_groups))]
+            group_ids += [group.pk for group in self.save({'music_groups': rows}).music_groups]
+
+        # Shuffled before ranking, so the popular rows are spread over the primary key range
+        self.rng.shuffle(contributor_ids)
+        self.rng.shuffle(group_ids)
+        self.artists = Skewed(self.rng, contributor_ids, self.skew)
+        self.groups = Skewed(self.rng, group_ids, self.skew)
+        self.genres = Skewed(self.rng, GENRES, self.skew)
+        self.languages = Skewed(self.rng, LANGUAGES, self.skew * 2)
+
+        albums_left = self.albums
+        for start in range(0, self.songs, self.batch_size):
+            count = min(self.batch_size, self.songs - start)
+            # Albums are spread evenly over the song batches, their tracks come from the same batch
+            album_count = albums_left if start + count >= self.songs else round(self.albums * count / self.songs)
+            albums_left -= album_count
+            self.save(self.song_batch(count, album_count))
+            if progress:
+                progress(start + count, self.songs)
+        return self.created
+
+    def contributor_row(self, number):
+        return {
+            'first_name': self.rng.choice(FIRST_NAMES),
+            'last_name': self.rng.choice(LAST_NAMES),
+            'stage_name': f"{self.words(1, 2)} {number}" if self.rng.random() < 0.3 else None,
+            'country': self.rng.choice(COUNTRIES),
+            'date_of_birth': self.date(1930, 2005),
+        }
+
+    def music_group_row(self, number):
+        return {
+            'name': f"The {self.words(1, 2)} {number}",
+            'country': self.rng.choice(COUNTRIES),
+            'founded': self.date(1960, 2020),
+        }
+
+    def song_batch(self, count, album_count):
+        songs, credits = [], []
+        for index in range(count):
+            ref = f"s{index}"
+            artists = self.artists.pick(2 if self.rng.random() < 0.2 else 1)
+            groups = self.groups.pick() if self.rng.random() < 0.3 or not artists else []
+            songs.append({
+                'ref': ref,
+                'title': self.words(1, 4),
+                'duration': min(max(int(self.rng.gauss(220, 60)), 30), 1200),
+                'released': self.date(1960, 2024),
+                'language': self.languages.pick()[0],
+                'genres': self.genres.pick(self.rng.randint(1, 3)),
+                'artists': artists,
+                'music_groups': groups,
+            })
+            credited = set()
+            credit_count = self.rng.randint(1, max(2 * self.credits_per_song - 1, 1)) if self.artists.items else 0
+            for _ in range(credit_count):
+                contributor = self.artists.pick()[0]
+                role = self.rng.choice(CONTRIBUTOR_ROLES)[0]
+                if (contributor, role) not in credited:
+                    credited.add((contributor, role))
+                    credits.append({'song': ref, 'contributor': contributor, 'role': role})
+            for group in groups:
+                credits.append({'song': ref, 'music_group': group, 'role': self.rng.choice(MUSIC_GROUP_ROLES)})
+
+        albums = []
+        for _ in range(album_count):
+            tracks = self.rng.sample(songs, min(self.rng.randint(6, 14), len(songs)))
+            albums.append({
+                'title': self.words(1, 3),
+                'released': self.date(1960, 2024),
+                'songs': [song['ref'] for song in tracks],
+                'artists': tracks[0]['artists'],
+                'music_groups': tracks[0]['music_groups'],
+            })
+        return {'songs': songs, 'albums': albums, 'credits': credits}
+
+
+def generate_catalog(songs=1000, **options):
+    """Create a synthetic catalog, returns the number of created rows per section."""
+    progress = options.pop('progress', None)
+    return CatalogGenerator(songs, **options).generate(progress)
@@ -0,0 +1,51 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from viewer.covers import cover_index
+from viewer.thumbnails import thumbnail_url
+
+register = template.Library()
+
+# Derivative used for 2x displays
+RETINA_SIZE = {'grid': 'retina', 'detail': 'retina'}
+
+
+def _available(image_file):
+    # The cover index knows which derivatives are on disk, rendering never touches the storage
+    return cover_index.thumbnails(image_file.instance.pk) if image_file else frozenset()
+
+
+@register.filter
+def cover_url(image_file, size='grid'):
+    """{{ album.cover_image|cover_url:"grid" }} - WebP derivative URL, the original when none exists."""
+    return thumbnail_url(image_file, size, available=_available(image_file))
+
+
+@register.simple_tag
+def cover_picture(image_file, size='detail', **attrs):
+    """{% cover_picture album.cover_image "detail" alt="..." class="..." %}
+
+    Renders a <picture> with WebP and JPEG derivatives and 2x sources, or a plain <img> of the
+    original when the derivatives were not generated yet.
+    """
+    if not image_file:
+        return ''
+    available = _available(image_file)
+    if (size, 'jpeg') not in available:
+        return format_html('<img src="{}"{}>', image_file.url, flatatt(attrs))
+
+    def srcset(fmt):
+        sources = [f"{thumbnail_url(image_file, size, fmt, available)} 1x"]
+        retina = RETINA_SIZE.get(size)
+        if (retina, fmt) in available:
+            sources.append(f"{thumbnail_url(image_file, retina, fmt, available)} 2x")
+        return ', '.join(sources)
+
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}"><img src="{}" srcset="{}"{}></picture>',
+        srcset('webp'),
+        thumbnail_url(image_file, size, 'jpeg', available),
+        srcset('jpeg'),
+        flatatt(attrs),
+    )
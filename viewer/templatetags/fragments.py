@@ -0,0 +1,18 @@
+from django import template
+
+from viewer import viewcache
+from viewer.routers import reading_replica
+
+register = template.Library()
+
+
+@register.filter
+def fragment_version(obj):
+    """{% cache 3600 "album-credits" album.pk album|fragment_version %} - changes when the object or its credits do."""
+    return viewcache.fragment_version(obj)
+
+
+@register.filter
+def fragment_timeout(timeout):
+    """{% cache 3600|fragment_timeout ... %} - 0 on replica reads, cached fragments are used but none stored."""
+    return 0 if reading_replica() else timeout
@@ -0,0 +1,246 @@
+import gzip
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+from collections import Counter
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from viewer.benchmarks import _collect_results
+from viewer.models import Album, AlbumListing, AlbumSummary, Song, SongListing, SongPerformance
+from viewer.search import search_index
+
+
+class SyncCoversCommandTest(SimpleTestCase):
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        self.target = os.path.join(tempfile.mkdtemp(), "album_covers")
+        self.addCleanup(shutil.rmtree, self.source)
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.target))
+        for name in ("one.jpg", "two.jpg"):
+            with open(os.path.join(self.source, name), "wb") as cover:
+                cover.write(name.encode())
+
+    def sync(self, *args):
+        out = StringIO()
+        call_command("sync_covers", "--source", self.source, "--target", self.target, *args, stdout=out)
+        return out.getvalue()
+
+    def test_only_changed_files_are_copied(self):
+        self.assertIn("2 copied, 0 hardlinked, 0 reflinked, 0 up to date", self.sync())
+        self.assertIn("0 copied, 0 hardlinked, 0 reflinked, 2 up to date", self.sync())
+
+        with open(os.path.join(self.source, "two.jpg"), "wb") as cover:
+            cover.write(b"changed cover")
+        self.assertIn("1 copied, 0 hardlinked, 0 reflinked, 1 up to date", self.sync("--compare", "hash"))
+        with open(os.path.join(self.target, "two.jpg"), "rb") as cover:
+            self.assertEqual(cover.read(), b"changed cover")
+
+    def test_hardlink_mode(self):
+        self.assertIn("2 hardlinked", self.sync("--mode", "hardlink"))
+        self.assertTrue(os.path.samefile(os.path.join(self.source, "one.jpg"), os.path.join(self.target, "one.jpg")))
+        self.assertIn("2 up to date", self.sync("--mode", "hardlink"))
+
+
+class ImportFixtureCommandTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write_fixture(self, objects, name="fixture.json"):
+        path = os.path.join(self.directory, name)
+        opener = gzip.open if name.endswith(".gz") else open
+        with opener(path, "wt", encoding="utf-8") as file:
+            json.dump(objects, file)
+        return path
+
+    def test_forward_references_and_m2m(self):
+        # Dependent rows come before the rows they reference
+        path = self.write_fixture([
+            {"model": "viewer.albumsong", "pk": 1, "fields": {"album": 1, "song": 1, "order": 1}},
+            {"model": "viewer.album", "pk": 1, "fields": {"title": "Hybrid Theory", "artist": [], "music_group": []}},
+            {"model": "viewer.song", "pk": 1, "fields": {
+                "title": "Papercut", "artist": [], "music_group": [], "genre": [1], "language": 1, "duration": 185,
+            }},
+            {"model": "viewer.language", "pk": 1, "fields": {"name": "English"}},
+            {"model": "viewer.genre", "pk": 1, "fields": {"name": "nu metal"}},
+        ], name="fixture.json.gz")
+        out = StringIO()
+        call_command("import_fixture", path, "--batch-size", "1", "--progress-every", "2", stdout=out)
+
+        song = Song.objects.get(pk=1)
+        self.assertEqual(list(song.genre.values_list("name", flat=True)), ["nu metal"])
+        self.assertEqual(song.language.name, "English")
+        self.assertEqual(Album.objects.get(pk=1).aggregates.total_duration, 185)
+        self.assertEqual(search_index.search("paper", "song"), [song])
+        self.assertIn("Loaded 5 objects", out.getvalue())
+        self.assertIn("4 objects", out.getvalue())
+
+    def test_invalid_items_name_their_index(self):
+        song = {"model": "viewer.song", "pk": 1, "fields": {"title": "Papercut"}}
+        for invalid in ({"model": "viewer.song", "pk": 2, "fields": {"duration": "long"}}, 5):
+            with self.subTest(item=invalid), self.assertRaisesMessage(CommandError, "Item 1 of"):
+                call_command("import_fixture", self.write_fixture([song, invalid]), stdout=StringIO())
+
+        path = os.path.join(self.directory, "broken.json")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write('[{"model": "viewer.genre", "pk": 1, "fields": {"name": "rock"}}, {"model": ')
+        with self.assertRaisesMessage(CommandError, "Invalid JSON after item 1 of"):
+            call_command("import_fixture", path, stdout=StringIO())
+        self.assertFalse(Song.objects.exists())
+
+    def test_repository_fixture(self):
+        with open("files/fixtures.json", encoding="utf-8") as file:
+            expected = Counter(item["model"] for item in json.load(file))
+        call_command("import_fixture", "files/fixtures.json", stdout=StringIO())
+        self.assertEqual(Song.objects.count(), expected["viewer.song"])
+        self.assertEqual(SongPerformance.objects.count(), expected["viewer.songperformance"])
+
+        # Loading again updates the rows in place
+        call_command("import_fixture", "files/fixtures.json", stdout=StringIO())
+        self.assertEqual(Song.objects.count(), expected["viewer.song"])
+        self.assertEqual(AlbumSummary.objects.count(), expected["viewer.album"])
+
+    def test_album_summaries_rebuilt_in_batches(self):
+        call_command("import_fixture", "files/fixtures.json", stdout=StringIO())
+        with CaptureQueriesContext(connection) as queries:
+            call_command("rebuild_album_summaries", stdout=StringIO())
+        self.assertLess(len(queries), Album.objects.count())
+
+
+class ExportCatalogCommandTest(TestCase):
+    def test_jsonl_to_file(self):
+        song = Song.objects.create(title="Papercut")
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "catalog.jsonl")
+        call_command("export_catalog", "--kind", "songs", "--output", path, stderr=StringIO())
+        with open(path, encoding="utf-8") as file:
+            rows = [json.loads(line) for line in file]
+        self.assertEqual([(row["type"], row["id"], row["title"]) for row in rows], [("songs", song.pk, "Papercut")])
+
+
+class ImportCatalogCommandTest(TestCase):
+    def write_batch(self, batch):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "batch.json")
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(batch, file)
+        return path
+
+    def test_imports_batch(self):
+        path = self.write_batch({
+            "music_groups": [{"ref": "lp", "name": "linkin park"}],
+            "songs": [{"ref": "numb", "title": "numb", "music_groups": ["lp"]}],
+            "albums": [{"title": "meteora", "music_groups": ["lp"], "songs": ["numb"]}],
+        })
+        out = StringIO()
+        call_command("import_catalog", path, "--chunk-size", "1", stdout=out)
+        self.assertIn("1 songs", out.getvalue())
+        self.assertEqual(list(Album.objects.get(title="Meteora").songs.values_list("title", flat=True)), ["Numb"])
+
+    def test_invalid_batch_writes_nothing(self):
+        path = self.write_batch({"songs": [{"ref": "numb", "title": "numb", "music_groups": ["missing"]}]})
+        err = StringIO()
+        with self.assertRaises(CommandError):
+            call_command("import_catalog", path, stderr=err)
+        self.assertIn("songs.0.music_groups: Unknown music group reference 'missing'.", err.getvalue())
+        self.assertFalse(Song.objects.exists())
+
+
+class RebuildListingsCommandTest(TestCase):
+    def test_stores_missing_listings(self):
+        song = Song.objects.bulk_create([Song(title="Numb")])[0]
+        album = Album.objects.bulk_create([Album(title="Meteora")])[0]
+        call_command("rebuild_listings", stdout=StringIO())
+        self.assertTrue(SongListing.objects.filter(song=song).exists())
+        self.assertEqual(AlbumListing.objects.get(album=album).creator, "Unknown")
+
+
+class GenerateCatalogCommandTest(TestCase):
+    def generate(self, *args):
+        out = StringIO()
+        call_command("generate_catalog", "--songs", "60", "--albums", "5", "--contributors", "20",
+                     "--music-groups", "4", "--batch-size", "25", *args, stdout=out)
+        return out.getvalue()
+
+    def test_generates_requested_counts(self):
+        self.assertIn("60 songs", self.generate())
+        self.assertEqual(Song.objects.count(), 60)
+        self.assertEqual(Album.objects.count(), 5)
+        self.assertTrue(SongPerformance.objects.exists())
+        # Written through the catalog importer, the search index is up to date
+        song = Song.objects.first()
+        self.assertIn(song, search_index.search(song.title, "song"))
+
+    def test_popular_contributors_get_most_credits(self):
+        self.generate("--skew", "1.5")
+        credits = Counter(SongPerformance.objects.exclude(contributor=None).values_list("contributor_id", flat=True))
+        top, *_ = credits.most_common()
+        self.assertGreater(top[1], sum(credits.values()) / 20)
+
+    def test_same_seed_gives_same_titles_and_reruns_add_rows(self):
+        self.generate("--seed", "7")
+        titles = sorted(Song.objects.values_list("title", flat=True))
+        self.generate("--seed", "7")
+        self.assertEqual(Song.objects.count(), 120)
+        self.assertEqual(sorted(Song.objects.values_list("title", flat=True))[::2], titles)
+
+
+class BenchmarkCommandTest(TestCase):
+    def setUp(self):
+        call_command("generate_catalog", "--songs", "20", "--albums", "2", "--contributors", "8", stdout=StringIO())
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.report = os.path.join(directory, "baseline.json")
+
+    def test_saves_report_for_every_view(self):
+        out = StringIO()
+        call_command("benchmark", "--iterations", "2", "--warmup", "0", "--output", self.report, stdout=out)
+        with open(self.report, encoding="utf-8") as file:
+            report = json.load(file)
+        self.assertEqual(report["meta"]["songs"], 20)
+        for name in ("songs", "album", "search"):
+            result = report["results"][name]
+            self.assertEqual(result["errors"], 0)
+            self.assertLessEqual(result["p50_ms"], result["p95_ms"])
+            self.assertGreater(result["queries_max"], 0)
+            self.assertGreater(result["peak_memory_kib"], 0)
+
+    def test_compare_fails_on_regression(self):
+        call_command("benchmark", "--group", "list", "--iterations", "2", "--warmup", "0",
+                     "--output", self.report, stdout=StringIO())
+        with open(self.report, encoding="utf-8") as file:
+            report = json.load(file)
+        for result in report["results"].values():
+            result["p95_ms"] = 0.001
+        with open(self.report, "w", encoding="utf-8") as file:
+            json.dump(report, file)
+        out = StringIO()
+        with self.assertRaisesMessage(CommandError, "p95 latency regressed"):
+            call_command("benchmark", "--group", "list", "--iterations", "2", "--warmup", "0",
+                         "--compare", self.report, "--max-regression", "50", stdout=out)
+        self.assertIn("p95_ms", out.getvalue())
+
+
+class BenchmarkSqliteCommandTest(TestCase):
+    def test_needs_sqlite_file(self):
+        with self.assertRaisesMessage(CommandError, "must be a SQLite file"):
+            call_command("benchmark_sqlite", "--workers", "1", "--duration", "0.1", stdout=StringIO())
+
+    @skipUnless('fork' in multiprocessing.get_all_start_methods(), "needs the fork start method")
+    def test_worker_exiting_without_result_does_not_block(self):
+        context = multiprocessing.get_context('fork')
+        queue = context.Queue()
+        process = context.Process(target=os._exit, args=(3,))
+        process.start()
+        self.assertEqual(_collect_results(queue, [process], timeout=30), [])
+        self.assertEqual(process.exitcode, 3)
@@ -1,10 +1,17 @@
 import datetime
 
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from viewer.models import (
     Genre, Country, Language, Contributor, ContributorRole, ContributorPreviousName,
-    MusicGroup, MusicGroupMembership, Song, SongPerformance, Album, AlbumSong, MusicGroupRole
+    MusicGroup, MusicGroupMembership, Song, SongPerformance, Album, AlbumSong, MusicGroupRole, AlbumSummary,
+    SongListing
 )
+from viewer.credits import SongCredits, _cache_key, get_song_credits
+from viewer.listings import refresh_song_listings
+from viewer.summaries import get_album_summary
 
 
 class MusicLibraryModelTest(TestCase):
@@ -318,3 +325,168 @@ class AlbumModelTest(TestCase):
         album = Album.objects.create(title="Test Album")
         self.assertEqual(str(album), "Test Album")
         self.assertIn("Test Album", repr(album))
+
+
+class AlbumSummaryTest(TestCase):
+    def setUp(self):
+        self.genre = Genre.objects.create(name="Rock")
+        self.language = Language.objects.create(name="English")
+        self.contributor = Contributor.objects.create(first_name="John", last_name="Doe")
+        self.role = ContributorRole.objects.create(name="Guitarist", category="performer")
+        self.song = Song.objects.create(title="Hit", duration=200, language=self.language)
+        self.song.genre.add(self.genre)
+        self.album = Album.objects.create(title="Album")
+        AlbumSong.objects.create(album=self.album, song=self.song, order=1)
+
+    def test_summary_built_by_signals(self):
+        """Adding a song to an album stores its duration, genres and languages in the summary."""
+        summary = AlbumSummary.objects.get(album=self.album)
+        self.assertEqual(summary.total_duration, 200)
+        self.assertEqual(summary.genre_ids, [self.genre.pk])
+        self.assertEqual(summary.language_ids, [self.language.pk])
+
+    def test_summary_follows_performances_and_genres(self):
+        """Summary is refreshed on SongPerformance and Song.genre changes."""
+        performance = SongPerformance.objects.create(
+            song=self.song, contributor=self.contributor, contributor_role=self.role
+        )
+        jazz = Genre.objects.create(name="Jazz")
+        self.song.genre.add(jazz)
+        summary = get_album_summary(self.album)
+        self.assertEqual(summary.contributors_by_category, [['performer', [[self.contributor.pk, ['Guitarist']]]]])
+        self.assertEqual(summary.genre_ids, sorted([self.genre.pk, jazz.pk]))
+
+        performance.delete()
+        jazz.song_set.clear()
+        summary = get_album_summary(self.album)
+        self.assertEqual(summary.contributors_by_category, [])
+        self.assertEqual(summary.genre_ids, [self.genre.pk])
+
+    def test_summary_matches_album_methods(self):
+        """Stored summary gives the same result as the on-the-fly Album methods."""
+        group = MusicGroup.objects.create(name="The Band")
+        group_role = MusicGroupRole.objects.create(name="Band")
+        SongPerformance.objects.create(song=self.song, contributor=self.contributor, contributor_role=self.role)
+        SongPerformance.objects.create(song=self.song, music_group=group, music_group_role=group_role)
+        summary = get_album_summary(self.album)
+        self.assertEqual(summary.total_duration, 200)
+        self.assertEqual(self.album.total_duration(), "3:20")
+        self.assertEqual(summary.groups_by_role, [['Band', [group.pk]]])
+        self.assertEqual(
+            {cat: [(c.pk, roles) for c, roles in items] for cat, items in self.album.contributors_by_category().items()},
+            {cat: [(c, roles) for c, roles in items] for cat, items in summary.contributors_by_category},
+        )
+
+    def test_album_delete_removes_summary(self):
+        """Deleting an album cascades to its summary without recreating it."""
+        self.album.delete()
+        self.assertFalse(AlbumSummary.objects.exists())
+
+
+
+class ListingTest(TestCase):
+    def setUp(self):
+        self.chester = Contributor.objects.create(first_name="Chester", last_name="Bennington")
+        self.mike = Contributor.objects.create(first_name="Mike", last_name="Shinoda", stage_name="Mike")
+        self.band = MusicGroup.objects.create(name="Linkin Park")
+        self.song = Song.objects.create(title="Numb")
+        self.song.artist.add(self.mike, self.chester)
+        self.song.music_group.add(self.band)
+        self.album = Album.objects.create(title="Meteora", released=datetime.date(2003, 3, 25))
+        self.album.artist.add(self.chester)
+        AlbumSong.objects.create(album=self.album, song=self.song, order=1)
+
+    def test_listing_kept_up_to_date_by_signals(self):
+        """Credit strings are stored when songs, links and tracks change, reading them runs no query."""
+        song = Song.objects.select_related('listing').get(pk=self.song.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(song.artists_list, "Chester Bennington, Mike")
+            self.assertEqual(song.music_groups_list, "Linkin Park")
+            self.assertEqual((song.album_label, song.albums_list), ("Album", "Meteora"))
+        self.assertEqual(Album.objects.select_related('listing').get().display_creator(), "Chester Bennington")
+
+        live = Album.objects.create(title="Live in Texas", released=datetime.date(2003, 11, 18))
+        AlbumSong.objects.create(album=live, song=self.song, order=1)
+        self.album.music_group.add(self.band)
+        self.chester.first_name = "Chaz"
+        self.chester.save()
+        self.song.artist.remove(self.mike)
+        song = Song.objects.select_related('listing').get(pk=self.song.pk)
+        self.assertEqual(song.artists_list, "Chaz Bennington")
+        self.assertEqual((song.album_label, song.albums_list), ("Albums", "Meteora, Live in Texas"))
+        self.assertEqual(Album.objects.get(pk=self.album.pk).display_creator(), "Chaz Bennington / Linkin Park")
+
+        live.delete()
+        self.band.delete()
+        song = Song.objects.select_related('listing').get(pk=self.song.pk)
+        self.assertEqual((song.music_groups_list, song.albums_list), ("", "Meteora"))
+
+    def test_missing_listing_computed_without_writing(self):
+        """Rows written by bulk_create have no listing until rebuild_listings, reading one stores nothing."""
+        song = Song.objects.bulk_create([Song(title="Faint")])[0]
+        Song.artist.through.objects.bulk_create([Song.artist.through(song_id=song.pk, contributor_id=self.mike.pk)])
+        song = Song.objects.select_related('listing').get(pk=song.pk)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(song.artists_list, "Mike")
+        self.assertTrue(all(query['sql'].startswith('SELECT') for query in queries))
+        self.assertFalse(SongListing.objects.filter(song=song).exists())
+
+    def test_refresh_without_create_only_updates_stored_listings(self):
+        song = Song.objects.bulk_create([Song(title="Faint")])[0]
+        self.assertEqual(refresh_song_listings([song.pk, self.song.pk], create=False).keys(), {self.song.pk})
+        self.assertFalse(SongListing.objects.filter(song=song).exists())
+
+    def test_song_delete_removes_listing(self):
+        self.song.delete()
+        self.assertFalse(SongListing.objects.exists())
+
+
+class SongCreditsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.song = Song.objects.create(title="Hit")
+        self.contributor = Contributor.objects.create(first_name="John", last_name="Doe")
+        self.guitarist = ContributorRole.objects.create(name="Guitarist", category="performer")
+        self.singer = ContributorRole.objects.create(name="Singer", category="performer")
+        self.group = MusicGroup.objects.create(name="The Band")
+        self.group_role = MusicGroupRole.objects.create(name="Band")
+        SongPerformance.objects.create(song=self.song, contributor=self.contributor, contributor_role=self.guitarist)
+        SongPerformance.objects.create(song=self.song, contributor=self.contributor, contributor_role=self.singer)
+        SongPerformance.objects.create(song=self.song, music_group=self.group, music_group_role=self.group_role)
+
+    def test_song_methods_group_credits(self):
+        """A contributor with several roles is listed once, each group once per song."""
+        self.assertEqual(
+            self.song.contributors_by_category(),
+            {'performer': [(self.contributor, ['Guitarist', 'Singer'])]},
+        )
+        self.assertEqual(self.song.groups_by_role(), {'Band': [self.group]})
+
+    def test_credits_cached_until_performances_change(self):
+        """Credits are loaded in one query and served from the cache afterwards."""
+        with self.assertNumQueries(1):
+            get_song_credits(self.song.pk)
+        with self.assertNumQueries(0):
+            self.song.contributors_by_category()
+            self.song.groups_by_role()
+
+        other = Contributor.objects.create(first_name="Jane", last_name="Roe")
+        SongPerformance.objects.create(song=self.song, contributor=other, contributor_role=self.singer)
+        self.assertEqual(len(self.song.contributors_by_category()['performer']), 2)
+
+    def test_credits_cached_before_commit_are_dropped(self):
+        other = Contributor.objects.create(first_name="Jane", last_name="Roe")
+        with self.captureOnCommitCallbacks(execute=True):
+            SongPerformance.objects.create(song=self.song, contributor=other, contributor_role=self.singer)
+            # A request reading before the commit caches credits without the new performance
+            cache.set(_cache_key(self.song.pk), SongCredits([]))
+        self.assertEqual(len(self.song.contributors_by_category()['performer']), 2)
+
+    def test_role_rename_invalidates_credits(self):
+        """Role names are stored in the cached credits, renaming a role drops them."""
+        self.song.contributors_by_category()
+        self.singer.name = "Vocalist"
+        self.singer.save()
+        self.assertEqual(
+            self.song.contributors_by_category()['performer'][0][1], ['Guitarist', 'Vocalist']
+        )
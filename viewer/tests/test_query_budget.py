@@ -0,0 +1,246 @@
+import datetime
+import logging
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+
+from MusicLibrary.urls import urlpatterns
+from viewer.listings import rebuild_listings
+from viewer.middleware import QueryRecorder, fingerprint
+from viewer.models import (
+    Album, AlbumSong, Contributor, ContributorRole, Country, Genre, Language, MusicGroup,
+    MusicGroupMembership, MusicGroupRole, Song, SongPerformance,
+)
+
+
+class QueryBudgetMixin:
+    """assertMaxQueries fails with the repeated statements, which usually point at the N+1 loop."""
+
+    @contextmanager
+    def assertMaxQueries(self, limit, label=''):
+        with CaptureQueriesContext(connection) as context:
+            yield context
+        if len(context) > limit:
+            recorder = QueryRecorder()
+            recorder.statements = [query['sql'] for query in context.captured_queries]
+            repeated = '\n'.join(f'  {count}x {sql}' for sql, count in recorder.duplicates()[:5])
+            self.fail(f'{label} ran {len(context)} queries, budget is {limit}. Repeated:\n{repeated or "  none"}')
+
+
+def seed_catalog(size):
+    """Catalog with `size` songs and contributors, every list page and detail page has full pages of rows."""
+    countries = Country.objects.bulk_create(Country(name=f"Country {i}") for i in range(5))
+    languages = Language.objects.bulk_create(Language(name=f"Language {i}") for i in range(5))
+    genres = Genre.objects.bulk_create(Genre(name=f"Genre {i}") for i in range(5))
+    roles = ContributorRole.objects.bulk_create([
+        ContributorRole(name="Singer", category='performer'),
+        ContributorRole(name="Guitarist", category='performer'),
+        ContributorRole(name="Songwriter", category='writer'),
+        ContributorRole(name="Producer", category='producer'),
+    ])
+    group_roles = MusicGroupRole.objects.bulk_create(MusicGroupRole(name=f"Group role {i}") for i in range(3))
+
+    contributors = Contributor.objects.bulk_create(
+        Contributor(
+            first_name=f"First{i}", last_name=f"{chr(65 + i % 26)}ast{i}", stage_name=f"Stage {i}" if i % 3 else None,
+            country=countries[i % 5], date_of_birth=datetime.date(1950 + i % 40, 1, 1),
+        )
+        for i in range(size)
+    )
+    groups = MusicGroup.objects.bulk_create(
+        MusicGroup(name=f"{chr(65 + i % 26)}roup {i}", country=countries[i % 5]) for i in range(size // 3)
+    )
+    for i, group in enumerate(groups):
+        for member in contributors[i * 3:i * 3 + 3]:
+            membership = MusicGroupMembership.objects.create(member=member, music_group=group)
+            membership.member_role.set(roles[:2])
+
+    songs = Song.objects.bulk_create(
+        Song(title=f"{chr(65 + i % 26)}ong {i}", duration=180 + i, language=languages[i % 5],
+             released=datetime.date(1990 + i % 30, 1, 1))
+        for i in range(size)
+    )
+    performances = []
+    for i, song in enumerate(songs):
+        song.artist.set(contributors[i:i + 2])
+        song.genre.set(genres[i % 5:i % 5 + 2])
+        if groups:
+            song.music_group.set([groups[i % len(groups)]])
+            performances.append(SongPerformance(
+                song=song, music_group=groups[i % len(groups)], music_group_role=group_roles[i % 3]))
+        for j, contributor in enumerate(contributors[i:i + 3]):
+            performances.append(SongPerformance(song=song, contributor=contributor, contributor_role=roles[j]))
+    SongPerformance.objects.bulk_create(performances)
+
+    albums = []
+    for i in range(size // 5):
+        album = Album.objects.create(title=f"{chr(65 + i % 26)}lbum {i}", released=datetime.date(2000 + i, 1, 1))
+        for order, song in enumerate(songs[i * 5:i * 5 + 10], start=1):
+            AlbumSong.objects.create(album=album, song=song, order=order)
+        album.artist.set(contributors[i:i + 2])
+        album.music_group.set(groups[i:i + 1])
+        albums.append(album)
+    # Songs were bulk created without their listings
+    rebuild_listings()
+    return {
+        'song': songs[0], 'album': albums[0], 'contributor': contributors[0], 'music_group': groups[0],
+        'contributor_role': roles[0], 'music_group_role': group_roles[0], 'country': countries[0],
+        'language': languages[0], 'genre': genres[0],
+        'contributor_performance': SongPerformance.objects.filter(song=songs[0], contributor__isnull=False).first(),
+        'group_performance': SongPerformance.objects.filter(song=songs[0], music_group__isnull=False).first(),
+        'membership': MusicGroupMembership.objects.filter(music_group=groups[0]).first(),
+    }
+
+
+# URL name: (object passed as the URL argument or a function of the seeded objects returning the
+# URL arguments, GET parameters, query budget)
+# A new URL in MusicLibrary/urls.py fails test_every_url_has_a_budget until it is listed here.
+BUDGETS = {
+    'home': (None, {}, 4),
+    'search_suggestions': (None, {'q': 'son'}, 9),
+    'search_suggestions_api': (None, {'q': 'son'}, 2),
+    'search': (None, {'q': 'son'}, 3),
+    'search_external': (None, {}, 2),
+    'catalog_export': (None, {}, 4),
+    'catalog_import': (None, {}, 4),
+    'api_list': (lambda objects: ['songs'], {'include': 'artists,music_groups,genres,language,albums'}, 6),
+    'api_detail': (lambda objects: ['albums', objects['album'].pk], {'include': 'artists,music_groups,songs'}, 4),
+
+    'songs': (None, {}, 3),
+    'song': ('song', {}, 8),
+    'song_create': (None, {}, 8),
+    'song_update': ('song', {}, 12),
+    'song_delete': ('song', {}, 5),
+    'song_performance_contributor_create': (None, {}, 6),
+    # contributor_song_performance_update and _delete name two URLs each, reverse() returns the later ones
+    'song_performance_music_group_create': (None, {}, 6),
+    'music_group_performance_update': ('group_performance', {}, 7),
+    'music_group_performance_delete': ('group_performance', {}, 7),
+
+    'albums': (None, {}, 4),
+    'album': ('album', {}, 13),
+    'album_create': (None, {}, 7),
+    'album_update': ('album', {}, 11),
+    'album_delete': ('album', {}, 5),
+    'album_song_order_update': ('album', {}, 4),
+
+    'contributors': (None, {}, 7),
+    'contributor': ('contributor', {}, 12),
+    'contributor_create': (None, {}, 5),
+    'contributor_update': ('contributor', {}, 6),
+    'contributor_delete': ('contributor', {}, 5),
+    'contributor_roles': (None, {}, 6),
+    'contributor_role': ('contributor_role', {}, 7),
+    'contributor_role_create': (None, {}, 4),
+    'contributor_role_update': ('contributor_role', {}, 5),
+    'contributor_role_delete': ('contributor_role', {}, 5),
+    'contributor_song_performance_create': ('contributor', {}, 7),
+    'contributor_song_performance_update': ('contributor_performance', {}, 8),
+    'contributor_song_performance_delete': ('contributor_performance', {}, 7),
+    'contributor_music_group_membership_create': ('contributor', {}, 7),
+    'contributor_music_group_membership_update': ('membership', {}, 9),
+    'contributor_music_group_membership_delete': ('membership', {}, 7),
+
+    'music_groups': (None, {}, 6),
+    'music_group': ('music_group', {}, 12),
+    'music_group_create': (None, {}, 5),
+    'music_group_update': ('music_group', {}, 6),
+    'music_group_delete': ('music_group', {}, 5),
+    'music_group_roles': (None, {}, 6),
+    'music_group_role': ('music_group_role', {}, 6),
+    'music_group_role_create': (None, {}, 4),
+    'music_group_role_update': ('music_group_role', {}, 5),
+    'music_group_role_delete': ('music_group_role', {}, 5),
+    'music_group_membership_create': (None, {}, 7),
+    'music_group_membership_update': ('membership', {}, 9),
+    'music_group_membership_delete': ('membership', {}, 7),
+
+    'countries': (None, {}, 6),
+    'country': ('country', {}, 7),
+    'country_create': (None, {}, 4),
+    'country_update': ('country', {}, 5),
+    'country_delete': ('country', {}, 5),
+    'languages': (None, {}, 6),
+    'language': ('language', {}, 5),
+    'language_create': (None, {}, 4),
+    'language_update': ('language', {}, 5),
+    'language_delete': ('language', {}, 5),
+    'genres': (None, {}, 6),
+    'genre': ('genre', {}, 4),
+    'genre_create': (None, {}, 4),
+    'genre_update': ('genre', {}, 5),
+    'genre_delete': ('genre', {}, 5),
+}
+
+
+def url_patterns():
+    """Named URL patterns of MusicLibrary/urls.py, included URLconfs (admin, accounts) are not ours to budget."""
+    return [pattern for pattern in urlpatterns if isinstance(pattern, URLPattern) and pattern.name]
+
+
+# Without a cache every request pays its full cost, cached pages would hide an N+1 loop
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class QueryBudgetTest(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.objects = seed_catalog(60)
+        cls.admin = User.objects.create_superuser(username='admin', password='pass')
+
+    def url(self, pattern, target):
+        if target is None:
+            return reverse(pattern.name)
+        if callable(target):
+            return reverse(pattern.name, args=target(self.objects))
+        return reverse(pattern.name, args=[self.objects[target].pk])
+
+    def test_every_url_has_a_budget(self):
+        missing = [pattern.name for pattern in url_patterns() if pattern.name not in BUDGETS]
+        self.assertEqual(missing, [])
+
+    def test_superuser_stays_within_budget(self):
+        self.client.force_login(self.admin)
+        for pattern in url_patterns():
+            target, params, limit = BUDGETS[pattern.name]
+            url = self.url(pattern, target)
+            with self.subTest(url=url):
+                with self.assertMaxQueries(limit, url):
+                    response = self.client.get(url, params)
+                self.assertLess(response.status_code, 500)
+
+    def test_anonymous_stays_within_budget(self):
+        for pattern in url_patterns():
+            target, params, limit = BUDGETS[pattern.name]
+            url = self.url(pattern, target)
+            with self.subTest(url=url):
+                with self.assertMaxQueries(limit, url):
+                    response = self.client.get(url, params)
+                self.assertLess(response.status_code, 500)
+
+
+@override_settings(QUERY_INSTRUMENTATION=True, QUERY_BUDGET=0)
+class QueryBudgetMiddlewareTest(TestCase):
+    def setUp(self):
+        Genre.objects.bulk_create(Genre(name=f"Genre {i}") for i in range(3))
+
+    def test_headers_report_query_count_and_time(self):
+        # The page is over the zero budget, the warning is checked by the next test
+        with self.assertLogs('viewer.middleware', logging.WARNING):
+            response = self.client.get(reverse('genres'))
+        self.assertGreater(int(response['X-Query-Count']), 0)
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries"$')
+
+    def test_request_over_budget_is_logged_with_repeated_queries(self):
+        with self.assertLogs('viewer.middleware', logging.WARNING) as logs:
+            self.client.get(reverse('genre', args=[Genre.objects.first().pk]))
+        self.assertIn("budget 0", logs.output[0])
+
+    def test_fingerprint_ignores_placeholder_count(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s)'),
+            fingerprint('SELECT  *  FROM t\nWHERE id IN (%s, %s, %s)'),
+        )
@@ -1,16 +1,41 @@
 import datetime
+import json
+import os
+import shutil
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+from PIL import Image
 from django.contrib.auth.models import Permission, User
-from django.test import TestCase, Client
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from viewer.models import (
     Song, Language, Contributor, Country, Genre, ContributorRole, SongPerformance, AlbumSong,
     Album, MusicGroup, MusicGroupRole, MusicGroupMembership
 )
+from viewer import musicbrainz
+from viewer.api import MAX_INCLUDED
+from viewer.covers import cover_index
+from viewer.search import search_index
+from viewer.tracklists import apply_track_orders, sync_album_tracklist
+from viewer.typeahead import VERSION_KEY, TypeaheadIndex, typeahead_index
 from viewer.utils import format_seconds
+from viewer.viewcache import fragment_version, get_versions
+from viewer.views import SEARCH_RESULTS_LIMIT
 
 
 class HomeViewTest(TestCase):
     def setUp(self):
+        cover_index.invalidate()
         # Create some albums with and without cover images for testing get_queryset
         Album.objects.create(title="Album1", cover_image="")
         Album.objects.create(title="Album2")  # no cover image
@@ -27,6 +52,79 @@ class HomeViewTest(TestCase):
             self.assertTrue(album.cover_image)
         self.assertLessEqual(len(albums), 6)
 
+    def test_missing_cover_file_uses_placeholder(self):
+        response = self.client.get(reverse("home"))
+        albums = response.context['albums']
+        self.assertEqual([album.title for album in albums], ["Album3"])
+        self.assertIn("placeholders/placeholder", albums[0].image_url)
+
+
+class CoverIndexTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        os.makedirs(os.path.join(self.media_root, "album_covers"))
+        with open(os.path.join(self.media_root, "album_covers", "cover.jpg"), "wb") as cover:
+            cover.write(b"jpeg")
+        cover_index.invalidate()
+
+    def test_index_follows_album_saves_and_deletes(self):
+        with self.settings(MEDIA_ROOT=self.media_root):
+            album = Album.objects.create(title="With cover", cover_image="album_covers/cover.jpg")
+            self.assertIn(album.pk, cover_index)
+
+            response = self.client.get(reverse("home"))
+            self.assertEqual(response.context['albums'][0].image_url, album.cover_image.url)
+
+            album.cover_image = "album_covers/missing.jpg"
+            album.save()
+            self.assertNotIn(album.pk, cover_index)
+
+            album.delete()
+            self.assertEqual(cover_index.sample(6), ([], []))
+
+
+class CoverThumbnailTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        os.makedirs(os.path.join(self.media_root, "album_covers"))
+        Image.new("RGB", (2000, 1500), "red").save(os.path.join(self.media_root, "album_covers", "big.png"))
+        cover_index.invalidate()
+
+    def test_derivatives_generated_on_save(self):
+        with self.settings(MEDIA_ROOT=self.media_root):
+            with self.captureOnCommitCallbacks(execute=True):
+                album = Album.objects.create(title="Big cover", cover_image="album_covers/big.png")
+            with Image.open(os.path.join(self.media_root, "album_covers", "big.grid.webp")) as grid:
+                self.assertEqual(grid.size, (480, 360))
+            with Image.open(os.path.join(self.media_root, "album_covers", "big.retina.jpg")) as retina:
+                self.assertEqual(retina.size, (1200, 900))
+
+            response = self.client.get(reverse("home"))
+            self.assertEqual(response.context['albums'][0].image_url, "/media/album_covers/big.grid.webp")
+
+            response = self.client.get(reverse("album", kwargs={'pk': album.pk}))
+            self.assertContains(response, 'srcset="/media/album_covers/big.detail.webp 1x, '
+                                          '/media/album_covers/big.retina.webp 2x"')
+
+            # Up to date derivatives are not written again
+            out = StringIO()
+            call_command("generate_thumbnails", stdout=out)
+            self.assertIn("Wrote 0 derivatives", out.getvalue())
+
+    def test_pages_do_not_probe_storage(self):
+        with self.settings(MEDIA_ROOT=self.media_root):
+            with self.captureOnCommitCallbacks(execute=True):
+                album = Album.objects.create(title="Big cover", cover_image="album_covers/big.png")
+            # A rescan lists the cover directory once and finds the derivatives
+            cover_index.invalidate()
+            with mock.patch.object(FileSystemStorage, 'exists', side_effect=AssertionError("storage probed")):
+                response = self.client.get(reverse("home"))
+                self.assertEqual(response.context['albums'][0].image_url, "/media/album_covers/big.grid.webp")
+                response = self.client.get(reverse("album", kwargs={'pk': album.pk}))
+                self.assertContains(response, "/media/album_covers/big.detail.webp 1x")
+
 
 class SongsListViewTest(TestCase):
     def test_songs_view_with_songs(self):
@@ -43,6 +141,59 @@ class SongsListViewTest(TestCase):
         self.assertContains(response, "There is no song in the database.")
 
 
+class SongsListViewCursorPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Duplicate titles check the pk tie-breaker
+        for i in range(12):
+            Song.objects.create(title=f"Song {i:02}")
+            Song.objects.create(title=f"Song {i:02}")
+
+    def titles(self, response):
+        return [(song.title, song.pk) for song in response.context['songs']]
+
+    def test_walk_forward_and_back(self):
+        expected = [(song.title, song.pk) for song in Song.objects.order_by('title', 'pk')]
+        seen = []
+        params = {'paginate_by': 10}
+        pages = []
+        while True:
+            response = self.client.get(reverse('songs'), params)
+            pages.append(response)
+            seen += self.titles(response)
+            page_obj = response.context['page_obj']
+            if not page_obj.has_next():
+                break
+            params = {'paginate_by': 10, 'after': page_obj.next_cursor()}
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(pages), 3)
+
+        # Walking back from the last page returns the previous page
+        last_page = pages[-1].context['page_obj']
+        response = self.client.get(reverse('songs'), {'paginate_by': 10, 'before': last_page.previous_cursor()})
+        self.assertEqual(self.titles(response), self.titles(pages[1]))
+        self.assertTrue(response.context['page_obj'].has_previous())
+
+    def test_no_count_query_and_desc_order(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('songs'), {'paginate_by': 5, 'order': 'desc'})
+        song_queries = [q['sql'] for q in queries if 'FROM "viewer_song" ' in q['sql']]
+        self.assertEqual(len(song_queries), 1)
+        self.assertNotIn('COUNT(', song_queries[0])
+        self.assertNotIn('OFFSET', song_queries[0])
+        first_page = self.titles(response)
+        self.assertEqual(first_page[0][0], "Song 11")
+        response = self.client.get(reverse('songs'), {
+            'paginate_by': 5, 'order': 'desc', 'after': response.context['page_obj'].next_cursor()
+        })
+        self.assertEqual([title for title, _ in self.titles(response)], ["Song 09", "Song 08", "Song 08", "Song 07", "Song 07"])
+
+    def test_invalid_cursor_shows_first_page(self):
+        response = self.client.get(reverse('songs'), {'after': 'not-a-token', 'letter': 'S'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+
 class SongDetailViewTest(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -96,6 +247,28 @@ class ContributorListViewTest(TestCase):
         self.assertIn('performers', response.context)
         self
 
+    def test_contributors_list_view_constant_queries(self):
+        singer = ContributorRole.objects.create(name="Singer", category="performer")
+        writer = ContributorRole.objects.create(name="Lyricist", category="writer")
+        song = Song.objects.create(title="Song")
+        for i in range(12):
+            contributor = Contributor.objects.create(first_name=f"First{i}", last_name=f"Last{i:02}")
+            SongPerformance.objects.create(song=song, contributor=contributor, contributor_role=singer)
+            if i % 2:
+                SongPerformance.objects.create(song=song, contributor=contributor, contributor_role=writer)
+        Contributor.objects.create(first_name="No", last_name="Role")
+
+        # Grouped counts, one categorized page query and one batch of role names
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('contributors'), {'paginate_per_column': 10, 'page_writer': 2})
+
+        self.assertEqual(response.context['performers_paginator'].count, 12)
+        self.assertEqual([str(c) for c in response.context['performers']][:2], ["First0 Last00", "First1 Last01"])
+        self.assertEqual(response.context['performers'][1].role_names, "Lyricist, Singer")
+        self.assertEqual(response.context['writers_page_obj'].number, 1)  # only one page of writers
+        self.assertEqual(len(response.context['writers']), 6)
+        self.assertEqual([c.role_names for c in response.context['without_role']], ['—'])
+
 
 class AlbumSongModelTest(TestCase):
     @classmethod
@@ -348,6 +521,60 @@ class AlbumCreateUpdateViewTest(TestCase):
         response = self.client.get(reverse('album_update', kwargs={'pk': album.pk}))
         self.assertEqual(response.status_code, 302)  # redirects to login
 
+    def login_with(self, codename):
+        user = User.objects.create_user(username='editor', password='pass')
+        user.user_permissions.add(Permission.objects.get(codename=codename))
+        self.client.login(username='editor', password='pass')
+
+    def test_create_without_songs_saves_nothing(self):
+        self.login_with('add_album')
+        contributor = Contributor.objects.create(first_name="John", last_name="Doe")
+        response = self.client.post(reverse('album_create'), {'title': "Empty Album", 'artist': [contributor.pk]})
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(response.context['form'], 'songs', "At least one song must be selected.")
+        self.assertEqual(response.context['form'].non_field_errors(), [])
+        self.assertFalse(Album.objects.filter(title="Empty Album").exists())
+
+    def test_update_writes_only_tracklist_changes(self):
+        self.login_with('change_album')
+        contributor = Contributor.objects.create(first_name="John", last_name="Doe")
+        song3 = Song.objects.create(title="Song3", duration=100)
+        album = Album.objects.create(title="Test Album")
+        AlbumSong.objects.create(album=album, song=self.song2, order=1)
+        AlbumSong.objects.create(album=album, song=self.song1, order=2)
+        AlbumSong.objects.create(album=album, song=song3, order=3)
+        kept = AlbumSong.objects.get(album=album, song=self.song1)
+        new_songs = [Song(title=f"New {i}") for i in range(20)]
+        Song.objects.bulk_create(new_songs)
+
+        response = self.client.post(reverse('album_update', kwargs={'pk': album.pk}), {
+            'title': "Test Album",
+            'artist': [contributor.pk],
+            'songs': [self.song1.pk, song3.pk] + [song.pk for song in new_songs],
+        })
+        self.assertEqual(response.status_code, 302)
+
+        # Kept tracks keep their relative order and their rows, new songs are appended
+        tracks = list(AlbumSong.objects.filter(album=album).order_by('order').values_list('song__title', 'order'))
+        self.assertEqual(tracks[:3], [("Song1", 1), ("Song3", 2), ("New 0", 3)])
+        self.assertEqual(len(tracks), 22)
+        self.assertEqual(AlbumSong.objects.get(album=album, song=self.song1).pk, kept.pk)
+        self.assertEqual(album.aggregates.total_duration, 300)
+
+    def test_tracklist_sync_uses_bulk_statements(self):
+        album = Album.objects.create(title="Compilation")
+        songs = [Song(title=f"Track {i}") for i in range(200)]
+        Song.objects.bulk_create(songs)
+        songs = list(Song.objects.filter(title__startswith="Track "))
+        sync_album_tracklist(album, songs[:100])
+
+        # Select, delete (select + delete), bulk update, bulk create and summary rebuild
+        with CaptureQueriesContext(connection) as queries:
+            diff = sync_album_tracklist(album, songs[50:])
+        self.assertEqual((len(diff.inserts), len(diff.updates), len(diff.deletes)), (100, 50, 50))
+        self.assertLess(len(queries), 20)
+        self.assertEqual(AlbumSong.objects.filter(album=album).count(), 150)
+
 class MusicGroupViewsTests(TestCase):
     def setUp(self):
         self.client = Client()
@@ -543,3 +770,724 @@ class SearchViewsTests(TestCase):
         self.assertIn('external_songs', response.context)
 
 
+
+
+class FakeMusicBrainzHandler(BaseHTTPRequestHandler):
+    """Minimal stand-in for the MusicBrainz recording search, answers with the query as the title."""
+    requests_seen = []
+
+    def do_GET(self):
+        params = parse_qs(urlparse(self.path).query)
+        query = params.get('query', [''])[0]
+        FakeMusicBrainzHandler.requests_seen.append(query)
+        if query == 'broken':
+            self.send_response(503)
+            self.end_headers()
+            return
+        body = json.dumps({
+            'recordings': [{'title': f"Remote {query}", 'artist-credit': [{'name': "Remote Artist"}]}]
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MusicBrainzSearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeMusicBrainzHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.settings_override = override_settings(
+            MUSICBRAINZ_BASE_URL=f"http://127.0.0.1:{cls.server.server_port}/ws/2"
+        )
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        musicbrainz.cache.clear()
+        FakeMusicBrainzHandler.requests_seen = []
+
+    def test_search_page_defers_external_lookup(self):
+        response = self.client.get(reverse('search'), {'q': 'Yellow'})
+        self.assertIsNone(response.context['external_songs'])
+        self.assertContains(response, reverse('search_external') + '?q=Yellow')
+        self.assertEqual(FakeMusicBrainzHandler.requests_seen, [])
+
+    def test_external_results_are_cached_by_normalized_query(self):
+        response = self.client.get(reverse('search_external'), {'q': 'Yellow  Submarine'})
+        self.assertContains(response, "Remote yellow submarine – Remote Artist")
+        self.client.get(reverse('search_external'), {'q': ' yellow submarine '})
+        self.assertEqual(FakeMusicBrainzHandler.requests_seen, ['yellow submarine'])
+
+        # Cached results are rendered directly in the search page
+        response = self.client.get(reverse('search'), {'q': 'YELLOW SUBMARINE'})
+        self.assertEqual(response.context['external_songs'][0]['title'], "Remote yellow submarine")
+        self.assertNotContains(response, 'hx-get="' + reverse('search_external'))
+
+    def test_external_errors_are_not_cached(self):
+        response = self.client.get(reverse('search_external'), {'q': 'broken'})
+        self.assertContains(response, "No external songs found.")
+        self.client.get(reverse('search_external'), {'q': 'broken'})
+        self.assertEqual(FakeMusicBrainzHandler.requests_seen, ['broken', 'broken'])
+
+
+class SearchIndexTest(TestCase):
+    def setUp(self):
+        self.song = Song.objects.create(title="Bohemian Rhapsody")
+        self.other_song = Song.objects.create(title="Rhapsody in Blue")
+        self.contributor = Contributor.objects.create(first_name="Antonín", last_name="Dvořák")
+
+    def test_prefix_terms_match(self):
+        self.assertEqual(search_index.search('bohem rhap', 'song'), [self.song])
+        self.assertEqual(set(search_index.search('rhaps', 'song')), {self.song, self.other_song})
+
+    def test_diacritics_are_ignored(self):
+        self.assertEqual(search_index.search('dvorak', 'contributor'), [self.contributor])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.song.title = "Killer Queen"
+        self.song.save()
+        self.assertEqual(search_index.search('bohemian', 'song'), [])
+        self.assertEqual(search_index.search('killer', 'song'), [self.song])
+
+        self.song.delete()
+        self.assertEqual(search_index.search('killer', 'song'), [])
+
+    def test_kinds_are_kept_apart(self):
+        album = Album.objects.create(title="Rhapsody Collection")
+        self.assertEqual(search_index.search('rhapsody', 'album'), [album])
+        self.assertNotIn(album.pk, search_index.search_ids('collection', 'song'))
+
+    def test_search_page_shows_best_matches_only(self):
+        Song.objects.bulk_create(Song(title=f"Rhapsody {number}") for number in range(SEARCH_RESULTS_LIMIT))
+        search_index.rebuild()
+        response = self.client.get(reverse('search'), {'q': 'r'})
+        self.assertEqual(len(response.context['songs']), SEARCH_RESULTS_LIMIT)
+        self.assertContains(response, "refine the search")
+
+    def test_migrate_keeps_existing_index(self):
+        # Rows written without signals stay out of the index until it is rebuilt
+        Song.objects.bulk_create([Song(title="Unindexed Ballad")])
+        search_index.install()
+        self.assertEqual(search_index.search('ballad', 'song'), [])
+        search_index.rebuild()
+        self.assertEqual(len(search_index.search('ballad', 'song')), 1)
+
+
+class TypeaheadTest(TestCase):
+    def setUp(self):
+        typeahead_index.invalidate()
+        self.song = Song.objects.create(title="Bohemian Rhapsody")
+        self.album = Album.objects.create(title="A Night at the Opera")
+        self.contributor = Contributor.objects.create(first_name="Antonín", last_name="Dvořák")
+        self.genre = Genre.objects.create(name="Rock")
+        self.country = Country.objects.create(name="Czech Republic")
+
+    def suggest(self, query, **kwargs):
+        return [(s.kind, s.pk) for s in typeahead_index.suggest(query, **kwargs)]
+
+    def test_word_prefixes(self):
+        self.assertEqual(self.suggest('rhap'), [('song', self.song.pk)])
+        self.assertEqual(self.suggest('night op'), [('album', self.album.pk)])
+        self.assertEqual(self.suggest('dvo'), [('contributor', self.contributor.pk)])
+        self.assertEqual(self.suggest('czech'), [('country', self.country.pk)])
+
+    def test_typos_fall_back_to_trigrams(self):
+        self.assertIn(('song', self.song.pk), self.suggest('bohemain'))
+
+    def test_index_follows_committed_changes(self):
+        self.assertEqual(self.suggest('rock'), [('genre', self.genre.pk)])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.genre.name = "Jazz"
+            self.genre.save()
+        self.assertEqual(self.suggest('rock'), [])
+        self.assertEqual(self.suggest('jazz'), [('genre', self.genre.pk)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.genre.delete()
+        self.assertEqual(self.suggest('jazz'), [])
+
+    def test_short_prefixes_are_not_looked_up(self):
+        self.assertEqual(self.suggest('r'), [])
+        self.assertEqual(self.suggest('ro'), [('genre', self.genre.pk)])
+
+    def test_changes_of_other_processes_are_reloaded(self):
+        self.assertEqual(self.suggest('rock'), [('genre', self.genre.pk)])
+        # Saved in another process, which bumps the shared version after updating its own index
+        Genre.objects.filter(pk=self.genre.pk).update(name="Jazz")
+        self.assertEqual(self.suggest('rock'), [('genre', self.genre.pk)])
+        cache.incr(VERSION_KEY)
+        self.assertEqual(self.suggest('jazz'), [('genre', self.genre.pk)])
+
+        # Without signals the periodic reload picks the change up
+        Genre.objects.filter(pk=self.genre.pk).update(name="Blues")
+        with override_settings(TYPEAHEAD_RELOAD_SECONDS=-1):
+            self.assertEqual(self.suggest('blues'), [('genre', self.genre.pk)])
+
+    def test_changes_of_other_processes_are_applied_without_reloading(self):
+        typeahead_index.load()
+        other = TypeaheadIndex()
+        other.load()
+        Genre.objects.filter(pk=self.genre.pk).update(name="Jazz")
+        self.genre.name = "Jazz"
+        other.update(self.genre)
+        other.remove(Song, self.song.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.suggest('jazz'), [('genre', self.genre.pk)])
+            self.assertEqual(self.suggest('rock'), [])
+            self.assertEqual(self.suggest('rhap'), [])
+
+    def test_own_changes_do_not_reload(self):
+        typeahead_index.load()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.genre.name = "Jazz"
+            self.genre.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.suggest('jazz'), [('genre', self.genre.pk)])
+
+    def test_suggestions_api(self):
+        typeahead_index.load()
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('search_suggestions_api'), {'q': 'bohem'})
+        self.assertEqual(response.json(), {
+            'query': 'bohem',
+            'results': [{
+                'kind': 'song', 'id': self.song.pk, 'label': "Bohemian Rhapsody",
+                'url': reverse('song', args=[self.song.pk]),
+            }],
+        })
+
+    def test_search_suggestions_context(self):
+        response = self.client.get(reverse('search_suggestions'), {'q': 'dvo'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([s.pk for s in response.context['contributors']], [self.contributor.pk])
+
+
+class AlbumSongOrderUpdateViewTest(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='editor', password='pass')
+        user.user_permissions.add(Permission.objects.get(codename='change_albumsong'))
+        self.client.login(username='editor', password='pass')
+        self.album = Album.objects.create(title="Album")
+        self.songs = [Song.objects.create(title=f"Song {i}") for i in range(1, 5)]
+        for order, song in enumerate(self.songs, start=1):
+            AlbumSong.objects.create(album=self.album, song=song, order=order)
+        self.url = reverse('album_song_order_update', kwargs={'album_pk': self.album.pk})
+
+    def track_titles(self):
+        return list(AlbumSong.objects.filter(album=self.album).order_by('order').values_list('song__title', flat=True))
+
+    def test_form_reorder_with_unique_order_constraint(self):
+        data = {f'order_{song.pk}': order for song, order in zip(self.songs, [4, 3, 2, 1])}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, data)
+        self.assertRedirects(response, reverse('album', kwargs={'pk': self.album.pk}), fetch_redirect_response=False)
+        self.assertEqual(self.track_titles(), ["Song 4", "Song 3", "Song 2", "Song 1"])
+
+        # One joined fetch and the two update statements
+        track_queries = [q['sql'] for q in queries.captured_queries if 'viewer_album_song' in q['sql']]
+        self.assertEqual(len(track_queries), 3)
+
+    def test_form_rejects_duplicate_orders(self):
+        data = {f'order_{song.pk}': 1 for song in self.songs}
+        self.client.post(self.url, data)
+        self.assertEqual(self.track_titles(), ["Song 1", "Song 2", "Song 3", "Song 4"])
+
+    def test_json_reorder(self):
+        new_order = [self.songs[2].pk, self.songs[0].pk, self.songs[3].pk, self.songs[1].pk]
+        response = self.client.post(self.url, json.dumps({'songs': new_order}), content_type='application/json')
+        self.assertEqual(response.json(), {'songs': new_order})
+        self.assertEqual(self.track_titles(), ["Song 3", "Song 1", "Song 4", "Song 2"])
+
+    def test_json_requires_every_song_once(self):
+        response = self.client.post(
+            self.url, json.dumps({'songs': [self.songs[0].pk, self.songs[0].pk]}), content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('errors', response.json())
+        self.assertEqual(self.track_titles(), ["Song 1", "Song 2", "Song 3", "Song 4"])
+
+
+class CatalogExportViewTest(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='exporter', password='pass')
+        for model in ('song', 'album', 'contributor', 'musicgroup', 'musicgroupmembership', 'songperformance'):
+            user.user_permissions.add(Permission.objects.get(codename=f'view_{model}'))
+        self.genre = Genre.objects.create(name="Rock")
+        self.songs = [Song.objects.create(title=f"Song {i}", duration=100 + i) for i in range(3)]
+        self.songs[0].genre.add(self.genre)
+        self.album = Album.objects.create(title="Album")
+        for order, song in enumerate(reversed(self.songs), start=1):
+            AlbumSong.objects.create(album=self.album, song=song, order=order)
+        self.client.login(username='exporter', password='pass')
+
+    def read(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_jsonl_export(self):
+        response = self.client.get(reverse('catalog_export'), {'kind': ['songs', 'albums']})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual([row['type'] for row in rows], ['songs'] * 3 + ['albums'])
+        self.assertEqual(rows[0]['genre_ids'], [self.genre.pk])
+        self.assertEqual(rows[-1]['tracklist'], [song.pk for song in reversed(self.songs)])
+
+    def test_csv_export(self):
+        response = self.client.get(reverse('catalog_export'), {'kind': 'songs', 'format': 'csv'})
+        lines = self.read(response).splitlines()
+        self.assertEqual(
+            lines[0], "id,title,duration,released,language_id,genre_ids,artist_ids,music_group_ids,summary,lyrics",
+        )
+        self.assertEqual(lines[1], f"{self.songs[0].pk},Song 0,100,,,{self.genre.pk},,,,")
+
+        response = self.client.get(reverse('catalog_export'), {'kind': ['songs', 'albums'], 'format': 'csv'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_lookup_tables_come_before_their_references(self):
+        for model in ('genre', 'country', 'language', 'contributorrole', 'musicgrouprole', 'contributorpreviousname'):
+            User.objects.get(username='exporter').user_permissions.add(Permission.objects.get(codename=f'view_{model}'))
+        self.songs[1].lyrics = "Hello"
+        self.songs[1].save()
+        rows = [json.loads(line) for line in self.read(self.client.get(reverse('catalog_export'))).splitlines()]
+        types = [row['type'] for row in rows]
+        self.assertLess(types.index('genres'), types.index('songs'))
+        self.assertIn({'type': 'genres', 'id': self.genre.pk, 'name': "Rock"}, rows)
+        self.assertEqual([row['lyrics'] for row in rows if row['type'] == 'songs'], [None, "Hello", None])
+
+    def test_query_count_does_not_grow_with_rows(self):
+        # The song query and one prefetch query per M2M relation, for a single chunk
+        response = self.client.get(reverse('catalog_export'), {'kind': 'songs'})
+        with self.assertNumQueries(4):
+            self.read(response)
+
+    def test_requires_view_permissions(self):
+        self.client.logout()
+        User.objects.create_user(username='plain', password='pass')
+        self.client.login(username='plain', password='pass')
+        response = self.client.get(reverse('catalog_export'))
+        self.assertEqual(response.status_code, 403)
+
+
+class CatalogImportViewTest(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='importer', password='pass')
+        for model in ('contributor', 'musicgroup', 'song', 'album', 'albumsong', 'songperformance'):
+            user.user_permissions.add(Permission.objects.get(codename=f'add_{model}'))
+        self.client.login(username='importer', password='pass')
+        self.rock = Genre.objects.create(name="Rock")
+        self.english = Language.objects.create(name="English")
+        self.singer = ContributorRole.objects.create(name="Singer", category='performer')
+        self.band = MusicGroupRole.objects.create(name="Band")
+        self.existing = Contributor.objects.create(first_name="Chester", last_name="Bennington", stage_name="Chazy")
+
+    def batch(self, **overrides):
+        batch = {
+            'contributors': [{'ref': 'mike', 'first_name': 'mike', 'last_name': 'shinoda', 'stage_name': 'mike s'}],
+            'music_groups': [{'ref': 'lp', 'name': 'linkin park'}],
+            'songs': [
+                {'ref': 'numb', 'title': 'NUMB', 'duration': 185, 'language': 'english', 'genres': ['rock'],
+                 'artists': ['mike', self.existing.pk], 'music_groups': ['lp']},
+                {'ref': 'faint', 'title': 'faint  again', 'duration': 162, 'music_groups': ['lp']},
+            ],
+            'albums': [{'title': 'meteora', 'released': '2003-03-25', 'music_groups': ['lp'],
+                        'songs': ['faint', 'numb']}],
+            'credits': [
+                {'song': 'numb', 'contributor': self.existing.pk, 'role': 'singer'},
+                {'song': 'numb', 'music_group': 'lp', 'role': 'band'},
+            ],
+        }
+        batch.update(overrides)
+        return batch
+
+    def post(self, batch):
+        return self.client.post(reverse('catalog_import'), json.dumps(batch), content_type='application/json')
+
+    def test_creates_batch(self):
+        response = self.post(self.batch())
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], {
+            'contributors': 1, 'music_groups': 1, 'songs': 2, 'albums': 1, 'credits': 2,
+        })
+
+        numb = Song.objects.get(title="Numb")  # Same normalization as SongModelForm
+        self.assertEqual(numb.language, self.english)
+        self.assertEqual(list(numb.genre.all()), [self.rock])
+        self.assertEqual({c.last_name for c in numb.artist.all()}, {"Shinoda", "Bennington"})
+        self.assertTrue(Song.objects.filter(title="Faint Again").exists())
+        self.assertEqual(Contributor.objects.get(first_name="Mike").stage_name, "Mike S")
+
+        album = Album.objects.get(title="Meteora")
+        self.assertEqual([song.title for song in album.ordered_songs()], ["Faint Again", "Numb"])
+        self.assertEqual(album.aggregates.total_duration, 347)
+        self.assertEqual(numb.performances.count(), 2)
+        self.assertEqual(search_index.search_ids("linkin", 'music_group'), [MusicGroup.objects.get().pk])
+
+    def test_errors_are_reported_for_the_whole_batch(self):
+        batch = self.batch(
+            contributors=[{'ref': 'mike', 'first_name': 'mike two', 'last_name': 'shinoda', 'stage_name': 'CHAZY'}],
+            credits=[
+                {'song': 'numb', 'contributor': 'mike', 'role': 'singer'},
+                {'song': 'numb', 'contributor': 'mike', 'role': 'singer'},
+                {'song': 999, 'music_group': 'lp', 'role': 'drummer'},
+            ],
+        )
+        batch['songs'][1]['title'] = 'x'
+        response = self.post(batch)
+        self.assertEqual(response.status_code, 400)
+        errors = {(e['section'], e['index'], e['field'], e['message']) for e in response.json()['errors']}
+        self.assertEqual(errors, {
+            ('contributors', 0, 'first_name',
+             "First name must be a single word and can include letters and digits only."),
+            ('contributors', 0, 'stage_name', "This stage name already exists."),
+            ('songs', 1, 'title', "Title must be at least 2 characters long."),
+            ('credits', 1, None, "This credit already exists."),
+            ('credits', 2, 'song', "Unknown song reference 999."),
+            ('credits', 2, 'role', "Unknown role 'drummer'."),
+        })
+        self.assertFalse(Song.objects.exists())
+        self.assertEqual(Contributor.objects.count(), 1)
+
+    def test_badly_typed_fields_are_reported(self):
+        batch = self.batch(contributors=[{'ref': 'mike', 'first_name': 5, 'last_name': 'shinoda'}])
+        batch['songs'][0].update(artists=5, genres=5)
+        batch['songs'][1]['title'] = 123
+        batch['albums'][0]['songs'] = 'numb'
+        response = self.post(batch)
+        self.assertEqual(response.status_code, 400)
+        errors = {(e['section'], e['index'], e['field'], e['message']) for e in response.json()['errors']}
+        self.assertEqual(errors, {
+            ('contributors', 0, 'first_name', "Expected a string."),
+            ('songs', 0, 'artists', "Expected a list."),
+            ('songs', 0, 'genres', "Expected a list."),
+            ('songs', 1, 'title', "Expected a string."),
+            ('albums', 0, 'songs', "Expected a list."),
+        })
+        self.assertFalse(Song.objects.exists())
+
+    def test_duplicate_checks_run_once_per_batch(self):
+        def count_queries(size):
+            batch = self.batch(
+                contributors=[{'ref': f'c{i}', 'first_name': f'first{i}', 'last_name': 'last',
+                               'stage_name': f'stage {size} {i}'} for i in range(size)],
+                music_groups=[{'ref': f'g{i}', 'name': f'group {size} {i}'} for i in range(size)],
+                songs=[{'ref': f's{i}', 'title': f'song {i}', 'artists': [f'c{i}'], 'music_groups': [f'g{i}'],
+                        'genres': ['rock']} for i in range(size)],
+                albums=[{'title': f'album {size}', 'music_groups': ['g0'],
+                         'songs': [f's{i}' for i in range(size)]}],
+                credits=[{'song': f's{i}', 'contributor': f'c{i}', 'role': 'singer'} for i in range(size)],
+            )
+            with CaptureQueriesContext(connection) as context:
+                self.assertEqual(self.post(batch).status_code, 201)
+            return len(context.captured_queries)
+
+        self.assertEqual(count_queries(2), count_queries(20))
+
+    def test_rejects_duplicate_existing_credit(self):
+        song = Song.objects.create(title="Crawling")
+        SongPerformance.objects.create(song=song, contributor=self.existing, contributor_role=self.singer)
+        response = self.post({'credits': [{'song': song.pk, 'contributor': self.existing.pk, 'role': 'Singer'}]})
+        self.assertEqual(response.json()['errors'][0]['message'], "This credit already exists.")
+
+    def test_requires_add_permissions(self):
+        User.objects.create_user(username='plain', password='pass')
+        self.client.login(username='plain', password='pass')
+        self.assertEqual(self.post(self.batch()).status_code, 403)
+
+
+class ListViewCacheTest(TestCase):
+    def setUp(self):
+        self.rock = Genre.objects.create(name="Rock")
+        Genre.objects.create(name="Jazz")
+
+    def test_second_request_runs_no_queries(self):
+        url = reverse('genres')
+        self.client.get(url, {'order': 'desc'})
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {'order': 'desc', 'utm_source': 'ignored'})
+        self.assertEqual([genre.name for genre in response.context['genres']], ["Rock", "Jazz"])
+        self.assertEqual(response.context['page_obj'].paginator.count, 2)
+
+    def test_pages_are_keyed_on_list_parameters(self):
+        url = reverse('genres')
+        self.client.get(url)
+        response = self.client.get(url, {'letter': 'j'})
+        self.assertEqual([genre.name for genre in response.context['genres']], ["Jazz"])
+
+    def test_model_changes_invalidate_cached_pages(self):
+        url = reverse('genres')
+        self.client.get(url)
+        Genre.objects.create(name="Blues")
+        self.assertContains(self.client.get(url), "Blues")
+
+        song = Song.objects.create(title="Song")
+        song.genre.add(self.rock)
+        rock = next(genre for genre in self.client.get(url).context['genres'] if genre.pk == self.rock.pk)
+        self.assertEqual(rock.songs_count, 1)
+
+    def test_versions_change_again_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Genre.objects.create(name="Blues")
+            # A page cached by a request reading before the commit is stored under this version
+            during_transaction = get_versions([Genre])
+        self.assertNotEqual(get_versions([Genre]), during_transaction)
+
+    def test_permission_buttons_are_rendered_per_user(self):
+        url = reverse('genres')
+        self.assertNotContains(self.client.get(url), reverse('genre_update', args=[self.rock.pk]))
+        user = User.objects.create_user(username='editor', password='pass')
+        user.user_permissions.add(Permission.objects.get(codename='change_genre'))
+        self.client.login(username='editor', password='pass')
+        self.assertContains(self.client.get(url), reverse('genre_update', args=[self.rock.pk]))
+
+
+class DetailFragmentCacheTest(TestCase):
+    def setUp(self):
+        self.singer = ContributorRole.objects.create(name="Singer", category='performer')
+        self.contributor = Contributor.objects.create(first_name="Chester", last_name="Bennington")
+        self.song = Song.objects.create(title="Numb")
+        self.other = Song.objects.create(title="Faint")
+        self.album = Album.objects.create(title="Meteora")
+        AlbumSong.objects.create(album=self.album, song=self.song, order=1)
+        AlbumSong.objects.create(album=self.album, song=self.other, order=2)
+        SongPerformance.objects.create(song=self.song, contributor=self.contributor, contributor_role=self.singer)
+
+    def test_cached_fragments_save_rendering_queries(self):
+        url = reverse('music_group', args=[MusicGroup.objects.create(name="Linkin Park").pk])
+        with CaptureQueriesContext(connection) as first:
+            self.client.get(url)
+        with CaptureQueriesContext(connection) as second:
+            response = self.client.get(url)
+        self.assertLess(len(second), len(first))
+        self.assertContains(response, "Linkin Park")
+
+    def test_cached_album_fragments_skip_the_summary(self):
+        url = reverse('album', args=[self.album.pk])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertContains(response, "Chester")
+        self.assertFalse([query for query in queries if 'albumsummary' in query['sql']])
+
+    def test_fragment_versions_change_again_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.contributor.save()
+            # Fragments cached by a request reading before the commit are stored under this version
+            during_transaction = fragment_version(self.contributor)
+        self.assertNotEqual(fragment_version(self.contributor), during_transaction)
+
+    def test_renamed_contributor_refreshes_song_and_album_pages(self):
+        self.assertContains(self.client.get(reverse('song', args=[self.song.pk])), "Chester")
+        self.assertContains(self.client.get(reverse('album', args=[self.album.pk])), "Chester")
+        self.contributor.first_name = "Mike"
+        self.contributor.save()
+        self.assertContains(self.client.get(reverse('song', args=[self.song.pk])), "Mike")
+        self.assertContains(self.client.get(reverse('album', args=[self.album.pk])), "Mike")
+
+    def test_new_credit_refreshes_contributor_page(self):
+        url = reverse('contributor', args=[self.contributor.pk])
+        self.assertNotContains(self.client.get(url), "Faint")
+        SongPerformance.objects.create(song=self.other, contributor=self.contributor, contributor_role=self.singer)
+        self.assertContains(self.client.get(url), "Faint")
+
+    def test_reordered_tracklist_is_rendered_again(self):
+        url = reverse('album', args=[self.album.pk])
+        self.assertContains(self.client.get(url), "1. Numb")
+        rows = list(AlbumSong.objects.filter(album=self.album).order_by('order'))
+        rows[0].order, rows[1].order = 2, 1
+        apply_track_orders(rows, current_max=2)
+        self.assertContains(self.client.get(url), "1. Faint")
+
+    def test_edit_buttons_never_enter_shared_fragments(self):
+        url = reverse('song', args=[self.song.pk])
+        update_url = reverse('contributor_song_performance_update', args=[self.song.performances.get().pk])
+        self.assertNotContains(self.client.get(url), update_url)
+
+        editor = User.objects.create_user(username='editor', password='pass')
+        editor.user_permissions.add(Permission.objects.get(codename='change_songperformance'))
+        self.client.login(username='editor', password='pass')
+        self.assertContains(self.client.get(url), update_url)
+
+        self.client.logout()
+        self.assertNotContains(self.client.get(url), update_url)
+
+
+class JsonApiTest(TestCase):
+    def setUp(self):
+        self.english = Language.objects.create(name="English")
+        self.rock = Genre.objects.create(name="Rock")
+        self.chester = Contributor.objects.create(first_name="Chester", last_name="Bennington")
+        self.songs = []
+        for title in ("Numb", "Faint", "Lying From You"):
+            song = Song.objects.create(title=title, duration=180, language=self.english)
+            song.artist.add(self.chester)
+            song.genre.add(self.rock)
+            self.songs.append(song)
+        self.album = Album.objects.create(title="Meteora")
+        for order, song in enumerate(self.songs, start=1):
+            AlbumSong.objects.create(album=self.album, song=song, order=order)
+
+    def get(self, url, params=None, **headers):
+        return self.client.get(url, params or {}, **headers)
+
+    def test_sparse_fields_and_cursor_pages(self):
+        url = reverse('api_list', args=['songs'])
+        first = self.get(url, {'fields': 'title', 'limit': 2}).json()
+        self.assertEqual(first['data'], [{'id': self.songs[1].pk, 'title': "Faint"},
+                                         {'id': self.songs[2].pk, 'title': "Lying From You"}])
+        self.assertIsNone(first['previous'])
+        second = self.get(first['next']).json()
+        self.assertEqual([song['title'] for song in second['data']], ["Numb"])
+        self.assertIsNone(second['next'])
+        self.assertEqual([song['title'] for song in self.get(second['previous']).json()['data']],
+                         ["Faint", "Lying From You"])
+
+    def test_includes_cost_one_query_per_relation(self):
+        url = reverse('api_list', args=['songs'])
+        params = {'include': 'artists,genres,language,albums'}
+        with self.assertNumQueries(5):
+            data = self.get(url, params).json()['data']
+        self.assertEqual(data[0]['artists'][0]['last_name'], "Bennington")
+        self.assertEqual(data[0]['language'], {'id': self.english.pk, 'name': "English"})
+        self.assertEqual(data[0]['albums'][0]['title'], "Meteora")
+
+        for number in range(10):
+            Song.objects.create(title=f"Song {number}").artist.add(self.chester)
+        with self.assertNumQueries(5):
+            self.get(url, params)
+
+    def test_album_songs_in_track_order(self):
+        response = self.get(reverse('api_detail', args=['albums', self.album.pk]), {'include': 'songs'})
+        self.assertEqual([song['title'] for song in response.json()['data']['songs']],
+                         ["Numb", "Faint", "Lying From You"])
+
+    def test_invalid_parameters(self):
+        response = self.get(reverse('api_list', args=['songs']), {'fields': 'title,secret', 'include': 'owner'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.json()['errors']), 2)
+        self.assertIn("Unknown field secret", response.json()['errors'][0])
+        response = self.get(reverse('api_list', args=['songs']), {'after': 'garbage'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("not a cursor", response.json()['errors'][0])
+        for url in (reverse('api_list', args=['users']), reverse('api_detail', args=['songs', 9999])):
+            response = self.get(url)
+            self.assertEqual(response.status_code, 404)
+            self.assertEqual(len(response.json()['errors']), 1)
+
+    def test_sparse_fields_page_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.get(reverse('api_list', args=['songs']), {'fields': 'duration', 'limit': 1})
+        self.assertIsNotNone(response.json()['next'])
+
+    def test_included_lists_are_capped(self):
+        for number in range(MAX_INCLUDED + 1):
+            Song.objects.create(title=f"Song {number}").artist.add(self.chester)
+        response = self.get(reverse('api_detail', args=['contributors', self.chester.pk]), {'include': 'songs'})
+        self.assertEqual(len(response.json()['data']['songs']), MAX_INCLUDED)
+
+    def test_etag_answers_not_modified_without_queries(self):
+        url = reverse('api_detail', args=['songs', self.songs[0].pk])
+        response = self.get(url, {'include': 'artists'})
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.get(url, {'include': 'artists'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # A change to an included relation is a new representation
+        self.chester.first_name = "Mike"
+        self.chester.save()
+        response = self.get(url, {'include': 'artists'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['data']['artists'][0]['first_name'], "Mike")
+
+
+class ConditionalDetailTest(TestCase):
+    def setUp(self):
+        self.singer = ContributorRole.objects.create(name="Singer", category='performer')
+        self.contributor = Contributor.objects.create(first_name="Chester", last_name="Bennington")
+        self.song = Song.objects.create(title="Numb")
+        self.other = Song.objects.create(title="Faint")
+        self.album = Album.objects.create(title="Meteora")
+        AlbumSong.objects.create(album=self.album, song=self.song, order=1)
+        AlbumSong.objects.create(album=self.album, song=self.other, order=2)
+
+    def assertNotModified(self, url, etag):
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def assertModified(self, url, etag):
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        return response['ETag']
+
+    def test_unchanged_page_is_not_modified_without_queries(self):
+        # The first response sets the CSRF cookie, the ETag of the page with the cookie is the one to reuse
+        self.client.get(reverse('home'))
+        for url in (reverse('song', args=[self.song.pk]), reverse('album', args=[self.album.pk]),
+                    reverse('contributor', args=[self.contributor.pk])):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotModified(url, response['ETag'])
+
+    def test_new_credit_changes_song_and_contributor_pages(self):
+        song_url = reverse('song', args=[self.song.pk])
+        contributor_url = reverse('contributor', args=[self.contributor.pk])
+        song_etag = self.client.get(song_url)['ETag']
+        contributor_etag = self.client.get(contributor_url)['ETag']
+        SongPerformance.objects.create(song=self.song, contributor=self.contributor, contributor_role=self.singer)
+        self.assertModified(song_url, song_etag)
+        self.assertModified(contributor_url, contributor_etag)
+
+    def test_reordered_tracklist_changes_album_page(self):
+        self.client.get(reverse('home'))
+        url = reverse('album', args=[self.album.pk])
+        etag = self.client.get(url)['ETag']
+        rows = list(AlbumSong.objects.filter(album=self.album).order_by('order'))
+        rows[0].order, rows[1].order = 2, 1
+        apply_track_orders(rows, current_max=2)
+        etag = self.assertModified(url, etag)
+        self.assertNotModified(url, etag)
+
+    def test_new_song_in_genre_changes_genre_page(self):
+        genre = Genre.objects.create(name="Rock")
+        url = reverse('genre', args=[genre.pk])
+        etag = self.client.get(url)['ETag']
+        self.other.genre.add(genre)
+        self.assertContains(self.client.get(url, HTTP_IF_NONE_MATCH=etag), "Faint")
+
+    def test_logged_in_user_gets_own_etag(self):
+        url = reverse('song', args=[self.song.pk])
+        anonymous = self.client.get(url)['ETag']
+        user = User.objects.create_user(username="editor", password="secret")
+        self.client.force_login(user)
+        etag = self.client.get(url)['ETag']
+        self.assertNotEqual(etag, anonymous)
+        user.user_permissions.add(Permission.objects.get(codename='change_song'))
+        self.assertModified(url, etag)
+
+    def test_other_users_logging_in_keep_etags(self):
+        url = reverse('song', args=[self.song.pk])
+        editor = User.objects.create_user(username="editor", password="secret")
+        User.objects.create_user(username="visitor", password="secret")
+        self.client.force_login(editor)
+        self.client.get(reverse('home'))
+        etag = self.client.get(url)['ETag']
+        self.assertTrue(Client().login(username="visitor", password="secret"))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        editor.is_staff = True
+        editor.save(update_fields=['is_staff'])
+        self.assertModified(url, etag)
@@ -0,0 +1,88 @@
+import io
+import posixpath
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+
+# Bounding boxes of the derived cover sizes, the aspect ratio of the original is kept
+SIZES = {
+    'grid': (480, 480),  # home page cards
+    'detail': (600, 600),  # album page
+    'retina': (1200, 1200),  # album page on 2x displays
+}
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+
+def thumbnail_name(name, size, fmt):
+    """Storage name of a derivative, beside the original: album_covers/cover.jpg -> album_covers/cover.grid.webp"""
+    stem, _ = posixpath.splitext(name)
+    extension = 'jpg' if fmt == 'jpeg' else fmt
+    return f"{stem}.{size}.{extension}"
+
+
+def _is_fresh(storage, name, original_modified):
+    if not storage.exists(name):
+        return False
+    if original_modified is None:
+        return True
+    return storage.get_modified_time(name) >= original_modified
+
+
+def generate_thumbnails(image_file, force=False):
+    """Create missing or outdated derivatives of an ImageField file in every size and format.
+
+    Returns the number of files written. Files Pillow cannot read are skipped.
+    """
+    if not image_file or not image_file.name:
+        return 0
+    storage = image_file.storage
+    if not storage.exists(image_file.name):
+        return 0
+    try:
+        original_modified = storage.get_modified_time(image_file.name)
+    except NotImplementedError:
+        original_modified = None
+
+    targets = [
+        (size, fmt) for size in SIZES for fmt in FORMATS
+        if force or not _is_fresh(storage, thumbnail_name(image_file.name, size, fmt), original_modified)
+    ]
+    if not targets:
+        return 0
+
+    try:
+        with storage.open(image_file.name, 'rb') as source:
+            original = Image.open(source)
+            original = ImageOps.exif_transpose(original).convert('RGB')
+    except (UnidentifiedImageError, OSError):
+        return 0
+
+    for size, fmt in targets:
+        image = original.copy()
+        # Never upscale, small covers are only re-encoded
+        image.thumbnail(SIZES[size], Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        pil_format, options = FORMATS[fmt]
+        image.save(buffer, pil_format, **options)
+
+        name = thumbnail_name(image_file.name, size, fmt)
+        if storage.exists(name):
+            storage.delete(name)
+        storage.save(name, ContentFile(buffer.getvalue()))
+    return len(targets)
+
+
+def thumbnail_url(image_file, size, fmt='webp', available=frozenset()):
+    """URL of a derivative, or of the original upload when the derivative was not generated yet.
+
+    `available` holds the (size, format) pairs known to exist, see CoverIndex.thumbnails().
+    """
+    if not image_file:
+        return ''
+    if (size, fmt) in available:
+        return image_file.storage.url(thumbnail_name(image_file.name, size, fmt))
+    return image_file.url
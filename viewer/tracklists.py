@@ -0,0 +1,92 @@
+from collections import namedtuple
+
+from django.db import transaction
+from django.db.models import F
+
+from viewer.models import Album, AlbumSong, Song
+from viewer.listings import deferred_listings, refresh_song_listings
+from viewer.summaries import deferred_album_summaries, refresh_album_summaries
+from viewer.viewcache import bump_object_versions, bump_versions
+
+
+TracklistDiff = namedtuple('TracklistDiff', ['inserts', 'updates', 'deletes'])
+
+
+def merge_track_order(existing, song_ids):
+    """Return the song ids in track order: kept tracks in their current order, new songs appended."""
+    selected = set(song_ids)
+    ordered = [row.song_id for row in existing if row.song_id in selected]
+    kept = set(ordered)
+    ordered += [song_id for song_id in dict.fromkeys(song_ids) if song_id not in kept]
+    return ordered
+
+
+def diff_tracklist(album_id, existing, song_ids):
+    """Compare existing AlbumSong rows with the wanted song ids in track order.
+
+    Returns new AlbumSong instances to create, existing rows with a changed order (already set
+    on the instance) and primary keys of rows to delete.
+    """
+    current = {row.song_id: row for row in existing}
+    song_ids = list(dict.fromkeys(song_ids))
+    wanted = set(song_ids)
+
+    deletes = [row.pk for row in existing if row.song_id not in wanted]
+    inserts = []
+    updates = []
+    for order, song_id in enumerate(song_ids, start=1):
+        row = current.get(song_id)
+        if row is None:
+            inserts.append(AlbumSong(album_id=album_id, song_id=song_id, order=order))
+        elif row.order != order:
+            row.order = order
+            updates.append(row)
+    return TracklistDiff(inserts, updates, deletes)
+
+
+def apply_track_orders(updates, current_max):
+    """Save the new orders already set on AlbumSong rows in two statements.
+
+    The rows are first moved above every current and new order, so the unique (album, order)
+    constraint holds after each row update. bulk_update then writes the final orders.
+    `current_max` is the highest order stored for the album before the change.
+    """
+    if not updates:
+        return
+    offset = max([current_max or 0] + [row.order for row in updates])
+    AlbumSong.objects.filter(pk__in=[row.pk for row in updates]).update(order=F('order') + offset)
+    AlbumSong.objects.bulk_update(updates, ['order'])
+    # Neither statement sends signals, the cached tracklists are invalidated here
+    bump_object_versions((Album, row.album_id) for row in updates)
+    bump_versions(AlbumSong)
+
+
+def sync_album_tracklist(album, songs):
+    """Make the album tracklist match the selected songs with a few bulk statements.
+
+    Tracks already on the album keep their relative order, newly selected songs are appended
+    and the orders are renumbered from 1. Returns the applied TracklistDiff.
+    """
+    with transaction.atomic(), deferred_album_summaries(), deferred_listings():
+        existing = list(
+            AlbumSong.objects.select_for_update()
+            .filter(album=album)
+            .order_by(F('order').asc(nulls_last=True), 'pk')
+        )
+        current_max = max((row.order for row in existing if row.order is not None), default=0)
+        song_ids = merge_track_order(existing, [song.pk for song in songs])
+        diff = diff_tracklist(album.pk, existing, song_ids)
+
+        if diff.deletes:
+            AlbumSong.objects.filter(pk__in=diff.deletes).delete()
+        apply_track_orders(diff.updates, current_max)
+        if diff.inserts:
+            AlbumSong.objects.bulk_create(diff.inserts)
+
+        # bulk_create sends no post_save signals, deleted rows are already collected by the signals
+        if diff.inserts:
+            refresh_album_summaries([album.pk])
+            refresh_song_listings([row.song_id for row in diff.inserts], create=False)
+            bump_object_versions([(Album, album.pk)] + [(Song, row.song_id) for row in diff.inserts])
+            bump_versions(AlbumSong)
+    return diff
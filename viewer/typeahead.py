@@ -0,0 +1,280 @@
+import bisect
+import heapq
+import threading
+import time
+import unicodedata
+from collections import Counter, namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from viewer.models import Album, Contributor, Country, Genre, Language, MusicGroup, Song
+
+
+Suggestion = namedtuple('Suggestion', ['kind', 'pk', 'label'])
+
+# Kind name (also the URL name of the detail page): model, label, searchable names
+KINDS = {
+    'song': (Song, lambda song: song.title, lambda song: [song.title]),
+    'album': (Album, lambda album: album.title, lambda album: [album.title]),
+    'contributor': (
+        Contributor,
+        lambda c: c.stage_name or f"{c.first_name} {c.last_name}",
+        lambda c: [c.stage_name, c.first_name, c.last_name],
+    ),
+    'music_group': (MusicGroup, lambda group: group.name, lambda group: [group.name]),
+    'genre': (Genre, lambda genre: genre.name, lambda genre: [genre.name]),
+    'country': (Country, lambda country: country.name, lambda country: [country.name]),
+    'language': (Language, lambda language: language.name, lambda language: [language.name]),
+}
+KIND_BY_MODEL = {model: kind for kind, (model, _, _) in KINDS.items()}
+
+# Fields loaded for the initial build, the label and names functions only read these
+LOAD_FIELDS = {
+    'song': ['pk', 'title'],
+    'album': ['pk', 'title'],
+    'contributor': ['pk', 'stage_name', 'first_name', 'last_name'],
+    'music_group': ['pk', 'name'],
+    'genre': ['pk', 'name'],
+    'country': ['pk', 'name'],
+    'language': ['pk', 'name'],
+}
+
+# Share of the query trigrams a name must contain to be offered as a fuzzy match
+MIN_TRIGRAM_SIMILARITY = 0.5
+# A one letter prefix ranges over a large part of the index, it is not looked up
+MIN_PREFIX_LENGTH = 2
+# Bumped by every process that changes its index, the change itself is stored under the new version
+# and the other processes apply it on their next lookup
+VERSION_KEY = 'typeahead:version'
+CHANGE_KEY = 'typeahead:change:{}'
+# A process further behind than this reloads the whole index instead of applying the changes
+MAX_CHANGES = 1000
+
+
+def normalize(text):
+    # Lowercase without diacritics, "Dvořák" is found by "dvorak"
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text):
+    return ''.join(char if char.isalnum() else ' ' for char in normalize(text)).split()
+
+
+def trigrams(token):
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TypeaheadIndex:
+    """In-memory prefix and trigram index of entity names for the search suggestions.
+
+    Word prefixes are looked up with bisect in a sorted token list. When prefixes give fewer
+    than `limit` results, names sharing enough trigrams with the query are added, so small
+    typos still produce suggestions. The index is loaded on first use and kept up to date
+    by the signals in viewer.signals. Changes made in other processes are read from the
+    shared cache and applied one by one, and the whole index is reloaded periodically, so
+    rows written without signals show up without a restart.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Held while catching up with the shared version, one thread reads the changes or the tables
+        self._reload_lock = threading.Lock()
+        self._loaded = False
+        self._loaded_at = None
+        self._version = None
+        self._entries = {}  # (kind, pk) -> (label, tokens)
+        self._tokens = []  # sorted (token, kind, pk)
+        self._trigrams = {}  # trigram -> set of (kind, pk)
+
+    def invalidate(self):
+        # Force a full reload on the next lookup
+        with self._lock:
+            self._loaded = False
+
+    def reload_interval(self):
+        return getattr(settings, 'TYPEAHEAD_RELOAD_SECONDS', 300)
+
+    def load(self, version=None):
+        # The version is read before the rows, a change saved meanwhile is applied again later
+        version = version if version is not None else _shared_version()
+        entries = {}
+        for kind, (model, _, _) in KINDS.items():
+            for obj in model.objects.only(*LOAD_FIELDS[kind]).iterator():
+                entries[(kind, obj.pk)] = self._entry(kind, obj)
+        with self._lock:
+            self._entries = {}
+            self._tokens = []
+            self._trigrams = {}
+            for key, entry in entries.items():
+                self._add(key, entry, sort=False)
+            self._tokens.sort()
+            self._loaded = True
+            self._loaded_at = time.monotonic()
+            self._version = version
+
+    def _fresh(self):
+        return self._loaded and time.monotonic() - self._loaded_at <= self.reload_interval()
+
+    def _ensure_loaded(self):
+        if self._fresh() and _shared_version() == self._version:
+            return
+        with self._reload_lock:
+            # Another thread may have caught up while this one waited
+            version = _shared_version()
+            if self._fresh() and (version == self._version or self._apply_changes(version)):
+                return
+            self.load(version)
+
+    def _apply_changes(self, version):
+        """Apply the changes of other processes up to `version`, False when some are no longer in the cache."""
+        if self._version is None or not 0 < version - self._version <= MAX_CHANGES:
+            return False
+        keys = [CHANGE_KEY.format(number) for number in range(self._version + 1, version + 1)]
+        changes = cache.get_many(keys)
+        if len(changes) < len(keys):
+            return False
+        with self._lock:
+            for cache_key in keys:
+                key, entry = changes[cache_key]
+                self._remove(key)
+                if entry is not None:
+                    self._add(key, entry)
+            self._version = version
+        return True
+
+    def _publish(self, key, entry):
+        # Tell the other processes what changed, a removed object has no entry
+        try:
+            version = cache.incr(VERSION_KEY)
+        except ValueError:
+            cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+            version = None
+        if version is not None:
+            # Kept for as long as a process may go without a full reload
+            cache.set(CHANGE_KEY.format(version), (key, entry), timeout=max(self.reload_interval(), 60))
+        with self._lock:
+            if version is None:
+                self._loaded = False
+            elif self._version == version - 1:
+                self._version = version
+
+    def _entry(self, kind, obj):
+        _, label, names = KINDS[kind]
+        tokens = []
+        for name in names(obj):
+            for token in tokenize(name or ''):
+                if token not in tokens:
+                    tokens.append(token)
+        return label(obj), tuple(tokens)
+
+    def _add(self, key, entry, sort=True):
+        self._entries[key] = entry
+        for token in entry[1]:
+            item = (token, *key)
+            if sort:
+                bisect.insort(self._tokens, item)
+            else:
+                self._tokens.append(item)
+            for gram in trigrams(token):
+                self._trigrams.setdefault(gram, set()).add(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for token in entry[1]:
+            item = (token, *key)
+            position = bisect.bisect_left(self._tokens, item)
+            if position < len(self._tokens) and self._tokens[position] == item:
+                del self._tokens[position]
+            for gram in trigrams(token):
+                keys = self._trigrams.get(gram)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._trigrams[gram]
+
+    def update(self, obj):
+        key = (KIND_BY_MODEL[type(obj)], obj.pk)
+        entry = self._entry(key[0], obj)
+        # Before the first load there is nothing to update, the load reads the saved row
+        if self._loaded:
+            with self._lock:
+                self._remove(key)
+                self._add(key, entry)
+        self._publish(key, entry)
+
+    def remove(self, model, pk):
+        key = (KIND_BY_MODEL[model], pk)
+        with self._lock:
+            self._remove(key)
+        self._publish(key, None)
+
+    def _prefix_keys(self, term):
+        position = bisect.bisect_left(self._tokens, (term,))
+        seen = set()
+        while position < len(self._tokens) and self._tokens[position][0].startswith(term):
+            key = self._tokens[position][1:]
+            if key not in seen:
+                seen.add(key)
+                yield key
+            position += 1
+
+    def suggest(self, query, limit=8, kinds=None):
+        """Return up to `limit` Suggestions, names starting with the query words first."""
+        terms = tokenize(query)
+        terms.sort(key=len, reverse=True)
+        if not terms or len(terms[0]) < MIN_PREFIX_LENGTH or limit <= 0:
+            return []
+        self._ensure_loaded()
+        with self._lock:
+            # Scan the prefix range of the longest term, check the other terms per candidate
+            matches = heapq.nsmallest(limit, self._prefix_matches(terms, kinds))
+            results = [key for _, key in matches]
+
+            if len(results) < limit:
+                results += self._fuzzy_keys(terms, limit - len(results), set(results), kinds)
+            return [Suggestion(kind, pk, self._entries[(kind, pk)][0]) for kind, pk in results]
+
+    def _prefix_matches(self, terms, kinds):
+        for key in self._prefix_keys(terms[0]):
+            if kinds is not None and key[0] not in kinds:
+                continue
+            label, tokens = self._entries[key]
+            if all(any(token.startswith(term) for token in tokens) for term in terms[1:]):
+                first_word = 0 if tokens[0].startswith(terms[0]) else 1
+                yield (first_word, len(label), label), key
+
+    def _fuzzy_keys(self, terms, limit, exclude, kinds):
+        if len(''.join(terms)) < 3:
+            return []
+        query_grams = set().union(*(trigrams(term) for term in terms))
+        counts = Counter()
+        for gram in query_grams:
+            counts.update(self._trigrams.get(gram, ()))
+        matches = []
+        for key, count in counts.items():
+            similarity = count / len(query_grams)
+            if similarity < MIN_TRIGRAM_SIMILARITY or key in exclude:
+                continue
+            if kinds is not None and key[0] not in kinds:
+                continue
+            label = self._entries[key][0]
+            matches.append(((-similarity, len(label), label), key))
+        matches.sort()
+        return [key for _, key in matches[:limit]]
+
+
+def _shared_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # A lost version restarts from the current time, never from a version already used
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+typeahead_index = TypeaheadIndex()
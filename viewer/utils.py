@@ -1,5 +1,68 @@
+import json
+
+from django.utils.functional import SimpleLazyObject
+
+
 def format_seconds(seconds: int) -> str:
     if seconds is None:
         return None
     mins, secs = divmod(seconds, 60)
-    return f"{mins}:{secs:02}"
\ No newline at end of file
+    return f"{mins}:{secs:02}"
+
+
+def lazy_context(build, keys):
+    """Template context for `keys`, `build()` returns their values and runs when a template first reads one.
+
+    Detail pages whose fragments are cached render without running the queries behind them.
+    """
+    values = SimpleLazyObject(build)
+    return {key: SimpleLazyObject(lambda key=key: values[key]) for key in keys}
+
+
+def iter_json_array(file, chunk_size: int = 1024 * 1024):
+    """Yield the items of a top-level JSON array from a text file one by one.
+
+    Only the current chunk and the item being decoded are held in memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    eof = False
+    while True:
+        # Skip whitespace and separators between items
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position == len(buffer) and not eof:
+            chunk = file.read(chunk_size)
+            buffer, position = buffer[position:] + chunk, 0
+            eof = not chunk
+            continue
+        if not started:
+            if position == len(buffer):
+                return
+            if buffer[position] != '[':
+                raise ValueError("Expected a JSON array.")
+            started = True
+            position += 1
+            continue
+        if position == len(buffer):
+            raise ValueError("Unexpected end of the JSON array.")
+        if buffer[position] == ']':
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+            # A number at the end of the buffer may continue in the next chunk
+            complete = eof or end < len(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            complete = False
+        if not complete:
+            # The item continues in the next chunk
+            chunk = file.read(chunk_size)
+            buffer, position = buffer[position:] + chunk, 0
+            eof = not chunk
+            continue
+        yield item
+        position = end
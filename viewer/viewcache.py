@@ -0,0 +1,107 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.http import urlencode
+
+from viewer.models import ContributorRole, Country, Genre, Language, MusicGroupRole
+
+
+# GET parameters that change the rows of a paginated list page
+LIST_PARAMS = ('letter', 'order', 'paginate_by', 'page', 'after', 'before')
+# Lookup tables named on every detail page, a change to one of them invalidates all fragments
+FRAGMENT_SHARED_MODELS = (Genre, Language, Country, ContributorRole, MusicGroupRole)
+ALL_FRAGMENTS_KEY = 'view-cache:version:fragments'
+
+
+def _version_key(model, pk=None):
+    if pk is None:
+        return f'view-cache:version:{model._meta.label_lower}'
+    return f'view-cache:version:{model._meta.label_lower}:{pk}'
+
+
+def _get_versions(keys):
+    versions = cache.get_many(keys)
+    # A lost version restarts from the current time, never from a version already used
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def invalidate_after_commit(invalidate, using=DEFAULT_DB_ALIAS):
+    """Run `invalidate` now, for reads later in the writing transaction, and again after commit.
+
+    A request reading between the two still sees the committed rows and may cache them under
+    the new version, the second call leaves what it cached behind.
+    """
+    invalidate()
+    if transaction.get_connection(using).in_atomic_block:
+        transaction.on_commit(invalidate, using=using)
+
+
+def _bump_all(keys, using):
+    keys = list(keys)
+
+    def bump():
+        for key in keys:
+            _bump(key)
+
+    invalidate_after_commit(bump, using)
+
+
+def get_versions(models):
+    """Current version of every model, one cache round trip for all of them."""
+    return _get_versions([_version_key(model) for model in models])
+
+
+def bump_versions(*models, using=DEFAULT_DB_ALIAS):
+    """Invalidate every cached view reading one of the models, viewer.signals calls this on each change."""
+    _bump_all((_version_key(model) for model in models), using)
+
+
+def object_version(model, pk, models=()):
+    """Version of one object's detail page, plus the given models, in one cache round trip.
+
+    viewer.signals bumps it when the object, a row linked to it (credits, tracks, memberships)
+    or a lookup table named on the page changes.
+    """
+    keys = [_version_key(model, pk), ALL_FRAGMENTS_KEY]
+    keys += [_version_key(shared) for shared in FRAGMENT_SHARED_MODELS + tuple(models)]
+    return '.'.join(str(version) for version in _get_versions(keys))
+
+
+def fragment_version(obj):
+    """Version of the cached template fragments of one object's detail page."""
+    return object_version(type(obj), obj.pk)
+
+
+def bump_object_versions(objects, using=DEFAULT_DB_ALIAS):
+    """Invalidate the detail page fragments of the given (model, pk) pairs."""
+    _bump_all({_version_key(model, pk) for model, pk in objects}, using)
+
+
+def invalidate_all_fragments():
+    """For bulk loads that bypass the signals, every detail page fragment is rendered again."""
+    _bump(ALL_FRAGMENTS_KEY)
+
+
+def view_cache_key(name, models, params):
+    """Cache key of a view for the given GET parameters and the current versions of the models it reads."""
+    versions = '.'.join(str(version) for version in get_versions(models))
+    query = urlencode(sorted((key, value) for key, value in params.items() if value is not None))
+    return f'view-cache:{name}:{versions}:{hashlib.md5(query.encode()).hexdigest()}'
+
+
+def cache_timeout():
+    return getattr(settings, 'VIEW_CACHE_TIMEOUT', 600)
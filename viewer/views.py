@@ -1,24 +1,25 @@
-import os
-import requests
+import json
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.mixins import PermissionRequiredMixin
 from django.core.paginator import Paginator
 from django.db import transaction
-from django.db.models import Q, Count
-from django.http import HttpResponse, Http404
+from django.db.models import Q, Count, F, Case, When, Value, IntegerField, Window, prefetch_related_objects
+from django.db.models.functions import DenseRank
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.template.loader import render_to_string
 from django.urls import reverse, reverse_lazy
 from django.utils.decorators import method_decorator
 from django.views import View
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import condition, require_POST, require_safe
 from django.views.generic import ListView, DetailView, TemplateView, CreateView, UpdateView, DeleteView
 
 from collections import OrderedDict
 
-from mixins import AlphabetOrderPaginationMixin, AlphabetOrderPaginationRelatedMixin, \
+from mixins import AlphabetOrderPaginationMixin, AlphabetOrderPaginationRelatedMixin, ConditionalDetailMixin, \
     SongPerformanceBaseMixin
 from viewer.forms import (
     GenreModelForm, CountryModelForm, ContributorModelForm, MusicGroupModelForm, SongModelForm, AlbumModelForm,
@@ -28,8 +29,25 @@ from viewer.forms import (
 )
 from viewer.models import (
     Song, Contributor, Album, Genre, Country, AlbumSong, MusicGroup, ContributorRole, MusicGroupMembership,
-    SongPerformance, MusicGroupRole, Language,
+    SongPerformance, MusicGroupRole, Language, SongListing,
 )
+from viewer.api import ApiError, ApiQuery, api_etag, get_resource
+from viewer.covers import cover_index
+from viewer.credits import get_song_credits
+from viewer.exports import EXPORTS, FORMATS, iter_csv, iter_jsonl
+from viewer.imports import CatalogImportError, import_catalog
+from viewer.musicbrainz import cached_external_songs, lookup_external_songs
+from viewer.search import search_index
+from viewer.typeahead import typeahead_index
+from viewer.summaries import ALBUM_SUMMARY_KEYS, get_album_summary, album_summary_context
+from viewer.thumbnails import thumbnail_url
+from viewer.tracklists import apply_track_orders, sync_album_tracklist
+from viewer.utils import lazy_context
+
+# Models read by includes/song_list_group.html, the credit strings of every row are stored in SongListing
+SONG_LIST_MODELS = (Song, SongListing)
+# Best matches shown on the search page, a one letter query matches most of the catalog
+SEARCH_RESULTS_LIMIT = 50
 
 
 # Home
@@ -40,17 +58,20 @@ class HomeView(ListView):
     login_url = 'login'
 
     def get_queryset(self):
-        # Get 6 random albums with a valid cover image
-        return Album.objects.exclude(cover_image='').exclude(cover_image__isnull=True).order_by('?')[:6]
+        # Get 6 random albums with a cover image, sampled from the in-process cover index
+        verified_ids, missing_ids = cover_index.sample(6)
+        self.verified_cover_ids = set(verified_ids)
+        albums = Album.objects.filter(pk__in=verified_ids + missing_ids).prefetch_related('artist').in_bulk()
+        # Keep the random order of the sample
+        return [albums[pk] for pk in verified_ids + missing_ids if pk in albums]
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         albums = context['albums']
         for index, album in enumerate(albums):
-            file_path = os.path.join(settings.MEDIA_ROOT, album.cover_image.name)
-            if os.path.exists(file_path):
-                # Use real cover image URL if file exists
-                album.image_url = album.cover_image.url
+            if album.pk in self.verified_cover_ids:
+                # Use the grid sized cover, the index already verified the files that exist
+                album.image_url = thumbnail_url(album.cover_image, 'grid', available=cover_index.thumbnails(album.pk))
             else:
                 # Use placeholder image if cover image file missing
                 placeholder_number = (index % 6) + 1  # 1 to 6
@@ -65,6 +86,10 @@ class SongsListView(AlphabetOrderPaginationMixin, ListView):
     context_object_name = 'songs'
     default_paginate_by = 10
     default_order_field = 'title'
+    cursor_pagination = True  # no COUNT(*)/OFFSET on large catalogs
+
+    def get_queryset(self):
+        return super().get_queryset().select_related('listing')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -74,7 +99,7 @@ class SongsListView(AlphabetOrderPaginationMixin, ListView):
         return context
 
 
-class SongDetailView(DetailView):
+class SongDetailView(ConditionalDetailMixin, DetailView):
     model = Song
     template_name = 'song.html'
 
@@ -82,33 +107,21 @@ class SongDetailView(DetailView):
         context = super().get_context_data(**kwargs)
         song = self.object
 
-        # Query contributor performances with related contributor and role
-        contributor_performances = SongPerformance.objects.filter(
-            song=song,
-            contributor__isnull=False
-        ).select_related('contributor', 'contributor_role')
-
-        # Group performances by contributor role category
-        performances_by_category = OrderedDict()
-        for perf in contributor_performances:
-            category = perf.contributor_role.category if perf.contributor_role else 'other'
-            if category not in performances_by_category:
-                performances_by_category[category] = []
-            performances_by_category[category].append(perf)
-
-        # Query music group performances with related group and role
-        music_group_performances = SongPerformance.objects.filter(
-            song=song,
-            music_group__isnull=False
-        ).select_related('music_group', 'music_group_role')
-
-        # Store music group performances by role
-        performances_by_role = OrderedDict()
-        performances_by_role['music_groups'] = list(music_group_performances)
-
-        context['performances_by_category'] = performances_by_category
-        context['music_group_performances_by_role'] = performances_by_role
+        # All performances come from the cached per-song credits, grouped in a single pass
+        def credits_context():
+            credits = get_song_credits(song.pk)
+
+            # Store music group performances by role
+            performances_by_role = OrderedDict()
+            performances_by_role['music_groups'] = credits.music_group_performances
 
+            return {
+                'performances_by_category': credits.performances_by_category,
+                'music_group_performances_by_role': performances_by_role,
+            }
+
+        # Read only when a fragment is rendered, not on a fragment cache hit
+        context.update(lazy_context(credits_context, ('performances_by_category', 'music_group_performances_by_role')))
         return context
 
 
@@ -222,7 +235,7 @@ class AlbumsListView(ListView):
             return self.paginate_by
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().select_related('listing')
         letter = self.request.GET.get("letter")
         if letter:
             # Filter albums starting with selected letter
@@ -239,7 +252,7 @@ class AlbumsListView(ListView):
         return context
 
 
-class AlbumDetailView(DetailView):
+class AlbumDetailView(ConditionalDetailMixin, DetailView):
     model = Album
     template_name = 'album.html'
     context_object_name = 'album'
@@ -251,23 +264,11 @@ class AlbumDetailView(DetailView):
         # Get related album songs ordered by their order field
         album_songs = AlbumSong.objects.filter(album=album).select_related('song').order_by('order')
 
-        genres = album.genres_list()
-        languages = album.languages_list()
-        contributors_by_category = album.contributors_by_category()
-        groups_by_role = album.groups_by_role()
-
-        genre_label = "Genre" if genres.count() == 1 else "Genres"
-        language_label = "Language" if languages.count() == 1 else "Languages"
-
+        # Aggregates come from the precomputed album summary instead of re-joining songs and performances,
+        # read only when a fragment is rendered, not on a fragment cache hit
+        context.update(lazy_context(lambda: album_summary_context(get_album_summary(album)), ALBUM_SUMMARY_KEYS))
         context.update({
             'album_songs': album_songs,
-            'total_duration': album.total_duration(),
-            'genres': genres,
-            'genre_label': genre_label,
-            'languages': languages,
-            'language_label': language_label,
-            'contributors_by_category': contributors_by_category,
-            'groups_by_role': groups_by_role,
             'album_artists': album.artist.all(),
             'album_music_groups': album.music_group.all(),
         })
@@ -282,30 +283,18 @@ class AlbumCreateView(PermissionRequiredMixin, CreateView):
     permission_required = 'viewer.add_album'
 
     def form_valid(self, form):
-        # Save album and handle cover image upload
-        self.object = form.save(commit=False)
-
-        if self.request.FILES.get('cover_image'):
-            self.object.cover_image = self.request.FILES['cover_image']
+        # Save album and handle cover image upload, album and tracklist are written in one transaction
+        with transaction.atomic():
+            self.object = form.save(commit=False)
 
-        self.object.save()
-        form.save_m2m()  # Save many-to-many relations
+            if self.request.FILES.get('cover_image'):
+                self.object.cover_image = self.request.FILES['cover_image']
 
-        songs = form.cleaned_data.get('songs', [])
-        if not songs:
-            form.add_error('songs', 'At least one song must be selected.')
-            return self.form_invalid(form)
+            self.object.save()
+            form.save_m2m()  # Save many-to-many relations
 
-        # Remove existing album-song links before recreating
-        AlbumSong.objects.filter(album=self.object).delete()
-
-        # Create AlbumSong relations with ordering
-        for index, song in enumerate(songs, start=1):
-            AlbumSong.objects.create(
-                album=self.object,
-                song=song,
-                order=index
-            )
+            # Only the differences against the current tracklist are written
+            sync_album_tracklist(self.object, form.cleaned_data['songs'])
 
         return redirect(self.get_success_url())
 
@@ -318,30 +307,18 @@ class AlbumUpdateView(PermissionRequiredMixin, UpdateView):
     permission_required = 'viewer.change_album'
 
     def form_valid(self, form):
-        # Update album and handle cover image upload
-        self.object = form.save(commit=False)
-
-        if self.request.FILES.get('cover_image'):
-            self.object.cover_image = self.request.FILES['cover_image']
-
-        self.object.save()
-        form.save_m2m()
+        # Update album and handle cover image upload, album and tracklist are written in one transaction
+        with transaction.atomic():
+            self.object = form.save(commit=False)
 
-        songs = form.cleaned_data.get('songs', [])
-        if not songs:
-            form.add_error('songs', 'At least one song must be selected.')
-            return self.form_invalid(form)
+            if self.request.FILES.get('cover_image'):
+                self.object.cover_image = self.request.FILES['cover_image']
 
-        # Remove existing album-song links before recreating
-        AlbumSong.objects.filter(album=self.object).delete()
+            self.object.save()
+            form.save_m2m()  # Save many-to-many relations
 
-        # Create AlbumSong relations with ordering
-        for index, song in enumerate(songs, start=1):
-            AlbumSong.objects.create(
-                album=self.object,
-                song=song,
-                order=index
-            )
+            # Only the differences against the current tracklist are written
+            sync_album_tracklist(self.object, form.cleaned_data['songs'])
 
         return redirect(self.get_success_url())
 
@@ -354,16 +331,16 @@ class AlbumDeleteView(PermissionRequiredMixin, DeleteView):
 
 
 class AlbumSongOrderUpdateView(PermissionRequiredMixin, View):
+    """Reorder album tracks, from the album page form or as JSON {"songs": [song_pk, ...]} in the new order."""
     permission_required = 'viewer.change_albumsong'
 
-    @method_decorator(require_POST)
-    def post(self, request, album_pk):
-        album = get_object_or_404(Album, pk=album_pk)
-        album_songs = list(AlbumSong.objects.filter(album=album))
-        max_order = len(album_songs)
+    def wants_json(self, request):
+        return request.content_type == 'application/json'
 
+    def get_form_orders(self, request, album_songs):
         new_orders = {}
         errors = []
+        max_order = len(album_songs)
 
         # Validate new order values from POST data
         for album_song in album_songs:
@@ -386,20 +363,52 @@ class AlbumSongOrderUpdateView(PermissionRequiredMixin, View):
         orders_list = list(new_orders.values())
         if len(orders_list) != len(set(orders_list)):
             errors.append("Duplicate order numbers are not allowed.")
+        return new_orders, errors
+
+    def get_json_orders(self, request, album_songs):
+        try:
+            song_pks = json.loads(request.body)['songs']
+            song_pks = [int(pk) for pk in song_pks]
+        except (ValueError, TypeError, KeyError):
+            return {}, ["Expected a JSON object with a list of song ids under 'songs'."]
+
+        # The list must contain every song of the album exactly once
+        if sorted(song_pks) != sorted(album_song.song_id for album_song in album_songs):
+            return {}, ["The song list must contain every song of the album exactly once."]
+        return {song_pk: order for order, song_pk in enumerate(song_pks, start=1)}, []
+
+    @method_decorator(require_POST)
+    def post(self, request, album_pk):
+        album = get_object_or_404(Album, pk=album_pk)
+        # Titles are needed for the error messages, fetched in the same query
+        album_songs = list(AlbumSong.objects.filter(album=album).select_related('song'))
+
+        if self.wants_json(request):
+            new_orders, errors = self.get_json_orders(request, album_songs)
+        else:
+            new_orders, errors = self.get_form_orders(request, album_songs)
 
         if errors:
+            if self.wants_json(request):
+                return JsonResponse({'errors': errors}, status=400)
             for error in errors:
                 messages.error(request, error)
             return redirect('album', pk=album.pk)
 
-        # Save new orders atomically
+        # Save new orders atomically, only changed rows are written
+        current_max = max((album_song.order or 0 for album_song in album_songs), default=0)
+        changed = []
+        for album_song in album_songs:
+            new_order = new_orders.get(album_song.song_id)
+            if new_order is not None and new_order != album_song.order:
+                album_song.order = new_order
+                changed.append(album_song)
         with transaction.atomic():
-            for album_song in album_songs:
-                new_order = new_orders.get(album_song.song.pk)
-                if new_order is not None and new_order != album_song.order:
-                    album_song.order = new_order
-                    album_song.save()
+            apply_track_orders(changed, current_max)
 
+        if self.wants_json(request):
+            ordered = sorted(album_songs, key=lambda album_song: album_song.order)
+            return JsonResponse({'songs': [album_song.song_id for album_song in ordered]})
         messages.success(request, "Song order updated successfully.")
         return redirect('album', pk=album.pk)
 
@@ -408,6 +417,67 @@ class AlbumSongOrderUpdateView(PermissionRequiredMixin, View):
 class ContributorsListView(TemplateView):
     template_name = 'contributors.html'
     paginate_per_column = 5  # Default items per column
+    # Context prefix, role category (None = contributors without any performance) and page GET parameter
+    columns = [
+        ('performers', 'performer', 'page_performer'),
+        ('producers', 'producer', 'page_producer'),
+        ('writers', 'writer', 'page_writer'),
+        ('publishers', 'publisher', 'page_publisher'),
+        ('others', 'other', 'page_other'),
+        ('without_role', None, 'page_without_role'),
+    ]
+
+    def get_contributors_queryset(self, letter):
+        qs = Contributor.objects.all()
+        if letter:
+            qs = qs.filter(
+                Q(first_name__istartswith=letter) |
+                Q(last_name__istartswith=letter) |
+                Q(stage_name__istartswith=letter)
+            )
+        return qs
+
+    def get_category_counts(self, qs):
+        # Single grouped query counting distinct contributors per role category
+        rows = qs.values(category=F('song_performances__contributor_role__category')).annotate(
+            contributors_count=Count('pk', distinct=True)
+        ).order_by()
+        return {row['category']: row['contributors_count'] for row in rows}
+
+    def get_categorized_pages(self, qs, pages):
+        # Single query returning the requested page of every column. Each contributor gets a dense rank within
+        # its category (duplicate performance rows share the rank), shifted by the page offset of that category.
+        offsets = Case(
+            *[
+                When(**({'category__isnull': True} if category is None else {'category': category}),
+                     then=Value(page.start_index() - 1))
+                for category, page in pages.items()
+            ],
+            default=Value(-self.paginate_per_column - 1),
+            output_field=IntegerField(),
+        )
+        return (
+            qs.annotate(category=F('song_performances__contributor_role__category'))
+            .annotate(position=Window(
+                DenseRank(),
+                partition_by=F('category'),
+                order_by=[F('last_name').asc(), F('first_name').asc(), F('pk').asc()],
+            ))
+            .annotate(page_position=F('position') - offsets)
+            .filter(page_position__range=(1, self.paginate_per_column))
+            .distinct()
+            .order_by('category', 'position')
+        )
+
+    def get_role_names(self, contributor_ids):
+        # Single query for role names of all contributors shown on the page
+        role_names = {}
+        rows = SongPerformance.objects.filter(
+            contributor_id__in=contributor_ids, contributor_role__isnull=False
+        ).values_list('contributor_id', 'contributor_role__name').distinct()
+        for contributor_id, role_name in rows:
+            role_names.setdefault(contributor_id, set()).add(role_name)
+        return role_names
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -419,78 +489,46 @@ class ContributorsListView(TemplateView):
             self.paginate_per_column = int(self.request.GET.get('paginate_per_column', self.paginate_per_column))
         except (ValueError, TypeError):
             pass  # Use default if invalid
-
-        def get_paginated_contributors(category, page_param):
-            # Query contributors by category with prefetching roles
-            qs = Contributor.objects.all().prefetch_related('song_performances__contributor_role')
-            if category == 'without_role':
-                qs = qs.exclude(song_performances__isnull=False)
-            else:
-                qs = qs.filter(song_performances__contributor_role__category=category)
-
-            if letter:
-                qs = qs.filter(
-                    Q(first_name__istartswith=letter) |
-                    Q(last_name__istartswith=letter) |
-                    Q(stage_name__istartswith=letter)
-                )
-
-            qs = qs.distinct().order_by('last_name', 'first_name')
-
-            paginator = Paginator(qs, self.paginate_per_column)
-            page_number = self.request.GET.get(page_param)
-            page_obj = paginator.get_page(page_number)
-
+        if self.paginate_per_column < 1:
+            self.paginate_per_column = 5
+
+        qs = self.get_contributors_queryset(letter)
+        counts = self.get_category_counts(qs)
+
+        # Paginators only need the counts, the page rows are loaded by one query for all columns
+        pages = {}
+        for _, category, page_param in self.columns:
+            paginator = Paginator(range(counts.get(category, 0)), self.paginate_per_column)
+            page_obj = paginator.get_page(self.request.GET.get(page_param))
+            page_obj.object_list = []
+            pages[category] = page_obj
+
+        contributors = list(self.get_categorized_pages(qs, pages)) if any(counts.values()) else []
+        role_names = self.get_role_names([contributor.pk for contributor in contributors]) if contributors else {}
+        for contributor in contributors:
             # Add role_names attribute listing roles as a string
-            for contributor in page_obj.object_list:
-                roles = contributor.song_performances.values_list('contributor_role__name', flat=True).distinct()
-                contributor.role_names = ', '.join(sorted(set(roles))) if roles else '—'
-
-            return page_obj, paginator
-
-        # Get paginated contributors for all categories
-        performers_page_obj, performers_paginator = get_paginated_contributors('performer', 'page_performer')
-        producers_page_obj, producers_paginator = get_paginated_contributors('producer', 'page_producer')
-        writers_page_obj, writers_paginator = get_paginated_contributors('writer', 'page_writer')
-        publishers_page_obj, publishers_paginator = get_paginated_contributors('publisher', 'page_publisher')
-        others_page_obj, others_paginator = get_paginated_contributors('other', 'page_other')
-        without_role_page_obj, without_role_paginator = get_paginated_contributors('without_role', 'page_without_role')
+            roles = role_names.get(contributor.pk)
+            contributor.role_names = ', '.join(sorted(roles)) if roles else '—'
+            pages[contributor.category].object_list.append(contributor)
 
         context.update({
             'letter': letter,
             'alphabet': list("ABCDEFGHIJKLMNOPQRSTUVWXYZ"),
             'paginate_per_column': self.paginate_per_column,
             'pagination_options': [5, 10, 20],
-
-            'performers': performers_page_obj.object_list,
-            'performers_page_obj': performers_page_obj,
-            'performers_paginator': performers_paginator,
-
-            'producers': producers_page_obj.object_list,
-            'producers_page_obj': producers_page_obj,
-            'producers_paginator': producers_paginator,
-
-            'writers': writers_page_obj.object_list,
-            'writers_page_obj': writers_page_obj,
-            'writers_paginator': writers_paginator,
-
-            'publishers': publishers_page_obj.object_list,
-            'publishers_page_obj': publishers_page_obj,
-            'publishers_paginator': publishers_paginator,
-
-            'others': others_page_obj.object_list,
-            'others_page_obj': others_page_obj,
-            'others_paginator': others_paginator,
-
-            'without_role': without_role_page_obj.object_list,
-            'without_role_page_obj': without_role_page_obj,
-            'without_role_paginator': without_role_paginator,
         })
+        for name, category, _ in self.columns:
+            page_obj = pages[category]
+            context.update({
+                name: page_obj.object_list,
+                f'{name}_page_obj': page_obj,
+                f'{name}_paginator': page_obj.paginator,
+            })
 
         return context
 
 
-class ContributorDetailView(DetailView):
+class ContributorDetailView(ConditionalDetailMixin, DetailView):
     template_name = 'contributor.html'
     model = Contributor
     context_object_name = 'contributor'
@@ -503,11 +541,13 @@ class ContributorDetailView(DetailView):
         song_performances = SongPerformance.objects.filter(contributor=contributor).select_related('song',
                                                                                                    'contributor_role')
 
-        # Group performances by contributor role category
-        songs_by_category = {}
-        for perf in song_performances:
-            category = perf.contributor_role.category if perf.contributor_role else 'other'
-            songs_by_category.setdefault(category, []).append(perf)
+        # Group performances by contributor role category, only when a fragment is rendered
+        def performances_context():
+            songs_by_category = {}
+            for perf in song_performances:
+                category = perf.contributor_role.category if perf.contributor_role else 'other'
+                songs_by_category.setdefault(category, []).append(perf)
+            return {'songs_by_category': songs_by_category}
 
         # Fetch other related data
         songs = contributor.songs.all()
@@ -518,9 +558,9 @@ class ContributorDetailView(DetailView):
             'songs': songs,
             'albums': albums,
             'memberships': memberships,
-            'songs_by_category': songs_by_category,
             'song_performances': song_performances,
         })
+        context.update(lazy_context(performances_context, ('songs_by_category',)))
 
         return context
 
@@ -561,6 +601,7 @@ class ContributorRolesListView(AlphabetOrderPaginationMixin, ListView):
     default_order_field = 'name'
     paginate_options = [10, 20, 50, 100]
     default_paginate_by = 10
+    cache_models = (ContributorRole, SongPerformance)
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -569,8 +610,9 @@ class ContributorRolesListView(AlphabetOrderPaginationMixin, ListView):
         return qs
 
 
-class ContributorRoleDetailView(AlphabetOrderPaginationRelatedMixin, DetailView):
+class ContributorRoleDetailView(ConditionalDetailMixin, AlphabetOrderPaginationRelatedMixin, DetailView):
     model = ContributorRole
+    etag_models = (Contributor, SongPerformance)
     template_name = 'contributor-role.html'
     context_object_name = 'contributor_role'
     default_order_field = 'last_name'  # order contributors by last name
@@ -735,7 +777,7 @@ class MusicGroupsListView(ListView):
         return context
 
 
-class MusicGroupDetailView(DetailView):
+class MusicGroupDetailView(ConditionalDetailMixin, DetailView):
     template_name = 'music-group.html'
     model = MusicGroup
     context_object_name = 'music_group'
@@ -816,6 +858,7 @@ class MusicGroupRolesListView(AlphabetOrderPaginationMixin, ListView):
     context_object_name = 'page_obj'
     default_order_field = 'name'
     paginate_by = 10
+    cache_models = (MusicGroupRole, SongPerformance)
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -829,8 +872,9 @@ class MusicGroupRolesListView(AlphabetOrderPaginationMixin, ListView):
         return qs
 
 
-class MusicGroupRoleDetailView(DetailView):
+class MusicGroupRoleDetailView(ConditionalDetailMixin, DetailView):
     model = MusicGroupRole
+    etag_models = (MusicGroup, SongPerformance)
     template_name = "music-group-role.html"
     context_object_name = "music_group_role"
 
@@ -874,11 +918,19 @@ class CountriesListView(AlphabetOrderPaginationMixin, ListView):
     context_object_name = 'countries'
     default_order_field = 'name'  # adjust to your Country model field
     default_paginate_by = 10
+    cache_models = (Country, Contributor, MusicGroup)
+
+    def get_queryset(self):
+        # Badge counts in the same query, the rows are cached with the page
+        return super().get_queryset().annotate(
+            artists_and_music_groups_count=Count('contributors', distinct=True) + Count('music_groups', distinct=True)
+        )
 
 
-class CountryDetailView(DetailView):
+class CountryDetailView(ConditionalDetailMixin, DetailView):
     template_name = 'country.html'
     model = Country
+    etag_models = (Contributor, MusicGroup)
     context_object_name = 'country'
 
 
@@ -916,6 +968,10 @@ class LanguagesListView(AlphabetOrderPaginationMixin, ListView):
     context_object_name = 'languages'
     paginate_by = 10
     default_order_field = "name"
+    cache_models = (Language, Song)
+
+    def get_queryset(self):
+        return super().get_queryset().annotate(songs_count=Count('songs'))
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -924,8 +980,9 @@ class LanguagesListView(AlphabetOrderPaginationMixin, ListView):
         return context
 
 
-class LanguageDetailView(AlphabetOrderPaginationRelatedMixin, DetailView):
+class LanguageDetailView(ConditionalDetailMixin, AlphabetOrderPaginationRelatedMixin, DetailView):
     model = Language
+    etag_models = SONG_LIST_MODELS
     template_name = "language.html"
     context_object_name = "language"
     default_order_field = "title"  # order songs by title
@@ -933,7 +990,7 @@ class LanguageDetailView(AlphabetOrderPaginationRelatedMixin, DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Use reverse FK: song_set for related songs
-        songs_qs = self.object.songs
+        songs_qs = self.object.songs.select_related('listing')
         page_obj = self.filter_order_paginate_queryset(songs_qs)
 
         context["songs"] = page_obj
@@ -978,6 +1035,10 @@ class GenresListView(AlphabetOrderPaginationMixin, ListView):
     context_object_name = 'genres'
     paginate_by = 10
     default_order_field = "name"
+    cache_models = (Genre, Song.genre.through)
+
+    def get_queryset(self):
+        return super().get_queryset().annotate(songs_count=Count('song'))
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -986,18 +1047,22 @@ class GenresListView(AlphabetOrderPaginationMixin, ListView):
         return context
 
 
-class GenreDetailView(AlphabetOrderPaginationRelatedMixin, DetailView):
+class GenreDetailView(ConditionalDetailMixin, AlphabetOrderPaginationRelatedMixin, DetailView):
     model = Genre
+    etag_models = SONG_LIST_MODELS + (Song.genre.through,)
     template_name = "genre.html"
     context_object_name = "genre"
     default_order_field = "title"  # order songs by title
+    cursor_pagination = True  # no COUNT(*)/OFFSET on large catalogs
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        songs_qs = self.object.song_set.all()
+        songs_qs = self.object.song_set.select_related('listing')
         page_obj = self.filter_order_paginate_queryset(songs_qs)
 
         context["songs"] = page_obj
+        context["page_obj"] = page_obj
+        context["is_paginated"] = page_obj.has_other_pages()
         context["paginate_options"] = self.paginate_options
         context["alphabet"] = self.get_alphabet()
         return context
@@ -1031,6 +1096,59 @@ class GenreDeleteView(PermissionRequiredMixin, DeleteView):
     permission_required = 'viewer.delete_genre'
 
 
+# Catalog export and import
+class CatalogExportView(PermissionRequiredMixin, View):
+    """Stream the catalog as JSONL or CSV, ?kind=songs&kind=albums&format=jsonl"""
+
+    def get_kinds(self):
+        kinds = self.request.GET.getlist('kind') or list(EXPORTS)
+        return [kind for kind in kinds if kind in EXPORTS]
+
+    def get_permission_required(self):
+        # View permission for every exported model
+        return [f'viewer.view_{EXPORTS[kind][0]._meta.model_name}' for kind in self.get_kinds()]
+
+    def get(self, request):
+        kinds = self.get_kinds()
+        export_format = request.GET.get('format', 'jsonl')
+        chunk_size = 2000
+        if not kinds or export_format not in FORMATS:
+            return HttpResponse("Unknown export kind or format.", status=400)
+
+        if export_format == 'csv':
+            if len(kinds) != 1:
+                return HttpResponse("CSV export needs exactly one kind.", status=400)
+            lines = iter_csv(kinds[0], chunk_size)
+            content_type, filename = 'text/csv', f'{kinds[0]}.csv'
+        else:
+            lines = iter_jsonl(kinds, chunk_size)
+            content_type, filename = 'application/x-ndjson', 'catalog.jsonl'
+
+        # Rows are read chunk by chunk while the response is being sent
+        response = StreamingHttpResponse(lines, content_type=f'{content_type}; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class CatalogImportView(PermissionRequiredMixin, View):
+    """Create songs, albums and their credits from one JSON batch, see viewer.imports for the format."""
+    permission_required = [
+        'viewer.add_contributor', 'viewer.add_musicgroup', 'viewer.add_song', 'viewer.add_album',
+        'viewer.add_albumsong', 'viewer.add_songperformance',
+    ]
+
+    def post(self, request):
+        try:
+            data = json.loads(request.body)
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            return JsonResponse({'errors': [{'message': "Invalid JSON."}]}, status=400)
+        try:
+            created = import_catalog(data)
+        except CatalogImportError as error:
+            return JsonResponse({'errors': error.errors}, status=400)
+        return JsonResponse({'created': created}, status=201)
+
+
 # SEARCH Views
 def search_view(request):
     query = request.GET.get('q', '').strip()
@@ -1038,57 +1156,118 @@ def search_view(request):
     external_songs = []
 
     if query:
-        # Local search results for songs
-        songs = Song.objects.filter(title__icontains=query)
-
-        # External MusicBrainz results, always shown
-        url = "https://musicbrainz.org/ws/2/recording"
-        params = {
-            "query": query,
-            "fmt": "json",
-            "limit": 10
-        }
-        headers = {
-            "User-Agent": "MusicLibrary/1.0 ( your-email@example.com )"
-        }
-        try:
-            response = requests.get(url, params=params, headers=headers, timeout=5)
-            if response.status_code == 200:
-                data = response.json()
-                for rec in data.get("recordings", []):
-                    external_songs.append({
-                        "title": rec.get("title"),
-                        "artist": rec["artist-credit"][0]["name"] if rec.get("artist-credit") else "Unknown"
-                    })
-        except requests.RequestException:
-            # Ignore external API errors silently
-            pass
+        # Local search results for songs, best match first
+        songs = search_index.search(query, 'song', limit=SEARCH_RESULTS_LIMIT)
+        prefetch_related_objects(songs, 'listing')
+
+        # External MusicBrainz results come from the cache, on a miss the page loads them with HTMX
+        external_songs = cached_external_songs(query)
 
     context = {
         'query': query,
         'songs': songs,
+        'songs_truncated': len(songs) == SEARCH_RESULTS_LIMIT,
         'external_songs': external_songs
     }
     return render(request, 'search_results.html', context)
 
 
+async def search_external_view(request):
+    """HTMX fragment with MusicBrainz results, the request runs off the main thread."""
+    query = request.GET.get('q', '').strip()
+    external_songs = await sync_to_async(lookup_external_songs, thread_sensitive=False)(query)
+    # Rendered without the request, the fragment needs no context processors
+    html = render_to_string('search_external_results.html', {'external_songs': external_songs})
+    return HttpResponse(html)
+
+
 def search_suggestions(request):
     query = request.GET.get('q', '').strip()
     context = {'query': query}
 
-    if query:
-        # Limit local search suggestions for songs, albums, and contributors
-        songs = Song.objects.filter(title__icontains=query)[:5]
-        albums = Album.objects.filter(title__icontains=query)[:3]
-        contributors = Contributor.objects.filter(
-            Q(stage_name__icontains=query) |
-            Q(first_name__icontains=query) |
-            Q(last_name__icontains=query)
-        )[:3]
-    else:
-        songs = albums = contributors = []
-
-    context.update({'songs': songs, 'albums': albums, 'contributors': contributors})
+    # Suggestions come from the in-memory typeahead index, no database queries per keystroke
+    suggestions = {kind: [] for kind in ('song', 'album', 'contributor', 'genre', 'country', 'language')}
+    for suggestion in typeahead_index.suggest(query, limit=12, kinds=suggestions):
+        suggestions[suggestion.kind].append(suggestion)
+
+    context.update({
+        'songs': suggestions['song'][:5],
+        'albums': suggestions['album'][:3],
+        'contributors': suggestions['contributor'][:3],
+        'genres': suggestions['genre'][:3],
+        'countries': suggestions['country'][:3],
+        'languages': suggestions['language'][:3],
+    })
     html = render_to_string("search_dropdown.html", context)
     return HttpResponse(html)
 
+
+def search_suggestions_api(request):
+    """JSON typeahead suggestions, the navbar dropdown renders them without a template round trip."""
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = min(max(int(request.GET.get('limit', 8)), 1), 20)
+    except ValueError:
+        limit = 8
+    results = [
+        {
+            'kind': suggestion.kind,
+            'id': suggestion.pk,
+            'label': suggestion.label,
+            'url': reverse(suggestion.kind, args=[suggestion.pk]),
+        }
+        for suggestion in typeahead_index.suggest(query, limit=limit)
+    ]
+    return JsonResponse({'query': query, 'results': results})
+
+
+# Read-only JSON API
+def _api_query(request, resource):
+    return ApiQuery(get_resource(resource), request.GET)
+
+
+def _api_etag(request, resource, pk=None):
+    try:
+        query = _api_query(request, resource)
+    except ApiError:
+        return None
+    return api_etag(query, request.path, request.META.get('QUERY_STRING', ''))
+
+
+def _api_page_link(request, cursor_param, cursor):
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params.pop('after', None)
+    params.pop('before', None)
+    params[cursor_param] = cursor
+    return f"{request.path}?{params.urlencode()}"
+
+
+@require_safe
+@condition(etag_func=_api_etag)
+def api_list(request, resource):
+    """Page of a resource, `fields` selects columns, `include` embeds relations, `after`/`before` are cursors."""
+    try:
+        query = _api_query(request, resource)
+    except ApiError as error:
+        return JsonResponse({'errors': error.messages}, status=error.status)
+    page = query.page()
+    return JsonResponse({
+        'data': [query.serialize(obj) for obj in page],
+        'next': _api_page_link(request, 'after', page.next_cursor()),
+        'previous': _api_page_link(request, 'before', page.previous_cursor()),
+    })
+
+
+@require_safe
+@condition(etag_func=_api_etag)
+def api_detail(request, resource, pk):
+    try:
+        query = _api_query(request, resource)
+    except ApiError as error:
+        return JsonResponse({'errors': error.messages}, status=error.status)
+    obj = query.queryset().filter(pk=pk).first()
+    if obj is None:
+        return JsonResponse({'errors': [f"No {resource} with id {pk}."]}, status=404)
+    return JsonResponse({'data': query.serialize(obj)})